@@ -0,0 +1,296 @@
+# analyses/continuation.py
+"""
+Metodi di continuazione per analisi pushover con rami softening.
+
+Il problema è R(u, lam) = F_const + lam * F_ref - f_int(u) = 0 con lam
+incognito. Ad ogni passo si aggiunge un vincolo e si esegue un'unica
+sequenza di Newton (metodo di bordatura: due soluzioni per iterazione,
+K du_R = R e K du_F = F_ref, con la stessa fattorizzazione):
+
+    'displacement'  controllo di spostamento su un DOF (Delta u_c prescritto)
+    'arc_length'    arc-length cilindrico/sferico di Riks-Crisfield
+                    ||Delta u||^2 + psi^2 Delta lam^2 (F_ref.F_ref) = Delta l^2
+
+Entrambi seguono il ramo post-picco (lam decrescente) senza cicli di
+tentativi sul moltiplicatore. In caso di mancata convergenza il passo
+viene ripetuto con incremento dimezzato (cutback).
+
+Il modello fornisce:
+    internal_force(u) -> f_int(u)
+    tangent(u)        -> matrice tangente (oppure linear_solve(u, rhs))
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .solvers import LinearSolver
+
+logger = logging.getLogger(__name__)
+
+CONTINUATION_METHODS = ('displacement', 'arc_length')
+
+
+@dataclass
+class ContinuationOptions:
+    """Opzioni per la continuazione"""
+    method: str = 'displacement'
+    control_dof: int = 0              # DOF di controllo (spostamento in sommità)
+    target_displacement: float = 0.0  # spostamento finale del DOF di controllo
+    n_steps: int = 100                # passi nominali fino al target
+    max_steps: Optional[int] = None   # passi massimi, cutback inclusi (default 3 * n_steps)
+    tol: float = 1e-6                 # tolleranza relativa su ||R|| / ||F_ref||
+    max_iter: int = 25
+    psi: float = 0.0                  # peso del carico nel vincolo (0 = cilindrico)
+    desired_iter: int = 5             # arc-length: iterazioni obiettivo per adattare Delta l
+    max_cutbacks: int = 6
+    tangent_each_iteration: bool = True  # False: tangente di inizio passo (Newton modificato)
+
+    def __post_init__(self):
+        if self.method not in CONTINUATION_METHODS:
+            raise ValueError(f"Metodo di continuazione non riconosciuto: {self.method}")
+
+
+class ContinuationSolver:
+    """Controllo di spostamento / arc-length condiviso tra i modelli"""
+
+    def __init__(self, options: ContinuationOptions,
+                 linear_solver: Optional[LinearSolver] = None):
+        self.options = options
+        self.linear_solver = linear_solver or LinearSolver()
+
+    def run(self, internal_force: Callable[[np.ndarray], np.ndarray],
+            tangent: Optional[Callable[[np.ndarray], object]],
+            F_ref: np.ndarray, u0: np.ndarray, lam0: float = 0.0,
+            F_const: Optional[np.ndarray] = None,
+            on_step: Optional[Callable[[Dict], bool]] = None,
+            linear_solve: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None) -> Dict:
+        """
+        Traccia il percorso di equilibrio fino allo spostamento target.
+
+        Args:
+            internal_force: f_int(u)
+            tangent: K_T(u) (ignorata se linear_solve è fornita)
+            F_ref: Pattern di carico scalato da lam
+            u0, lam0: Stato iniziale in equilibrio
+            F_const: Carichi costanti (es. verticali)
+            on_step: Chiamata dopo ogni passo convergente con
+                     {'step', 'u', 'lambda', 'iterations'}; False interrompe
+            linear_solve: Risoluzione K_T(u) x = rhs alternativa (rhs (n,) o (n, 2))
+
+        Returns:
+            Dict con 'u', 'lambda', 'converged', 'path' (lambda, u_c,
+            iterazioni per passo), 'n_solves' e 'stop_reason'.
+        """
+        opts = self.options
+        F_ref = np.asarray(F_ref, dtype=float)
+        F_const = np.zeros_like(F_ref) if F_const is None else np.asarray(F_const, dtype=float)
+        c = opts.control_dof
+        ref_norm = max(float(np.linalg.norm(F_ref)), 1e-30)
+        FF = float(F_ref @ F_ref)
+
+        if linear_solve is None:
+            def linear_solve(u, rhs):
+                return self.linear_solver.solve(tangent(u), rhs)
+
+        u = np.array(u0, dtype=float)
+        lam = float(lam0)
+        u_start_c = u[c]
+        remaining = opts.target_displacement - u_start_c
+        du_step = remaining / max(1, opts.n_steps)
+        max_steps = opts.max_steps or 3 * opts.n_steps
+
+        arc = None
+        arc_max = None
+        prev_du = None
+        prev_dlam = 0.0
+        path: List[Dict] = []
+        n_solves = 0
+        stop_reason = 'max_steps'
+        converged = True
+
+        for step in range(max_steps):
+            if abs(u[c] - opts.target_displacement) <= 1e-12 * max(1.0, abs(remaining)):
+                stop_reason = 'target'
+                break
+            cutbacks = 0
+            scale = 1.0
+            while True:
+                if opts.method == 'displacement':
+                    # Non oltrepassare il target
+                    to_go = opts.target_displacement - u[c]
+                    inc = du_step * scale
+                    if abs(inc) > abs(to_go):
+                        inc = to_go
+                    attempt = self._displacement_step(internal_force, linear_solve, F_ref,
+                                                      F_const, u, lam, c, inc, ref_norm)
+                else:
+                    attempt = self._arc_length_step(internal_force, linear_solve, F_ref,
+                                                    F_const, u, lam, c, du_step, arc,
+                                                    scale, prev_du, prev_dlam, FF, ref_norm)
+                n_solves += attempt['solves']
+                if attempt['converged']:
+                    break
+                if cutbacks >= opts.max_cutbacks:
+                    break
+                cutbacks += 1
+                scale *= 0.5
+                logger.info(f"Passo {step + 1} non convergente, riduzione incremento ({scale:.3g})")
+
+            if not attempt['converged']:
+                logger.warning(f"Continuazione interrotta al passo {step + 1}")
+                # Riporta il modello all'ultimo stato in equilibrio
+                internal_force(u)
+                converged = False
+                stop_reason = 'no_convergence'
+                break
+
+            prev_du = attempt['u'] - u
+            prev_dlam = attempt['lambda'] - lam
+            u, lam = attempt['u'], attempt['lambda']
+            if opts.method == 'arc_length':
+                arc = attempt['arc']
+                if arc_max is None:
+                    arc_max = arc  # Delta l nominale: risoluzione di n_steps passi
+                # Adatta la lunghezza d'arco al numero di iterazioni
+                ratio = np.sqrt(opts.desired_iter / max(1, attempt['iterations']))
+                arc = min(arc * float(np.clip(ratio, 0.5, 2.0)), arc_max)
+                # Avvicinamento al target: Delta l stimato dall'ultimo passo
+                to_go = abs(opts.target_displacement - u[c])
+                if to_go > 0 and abs(prev_du[c]) > 0:
+                    arc = min(arc, float(np.linalg.norm(prev_du)) * to_go / abs(prev_du[c]))
+
+            path.append({'lambda': lam, 'u_control': float(u[c]),
+                         'iterations': attempt['iterations'], 'cutbacks': cutbacks})
+            if on_step is not None and on_step({'step': step, 'u': u, 'lambda': lam,
+                                                'iterations': attempt['iterations']}) is False:
+                stop_reason = 'callback'
+                break
+            if (opts.method == 'arc_length'
+                    and (u[c] - opts.target_displacement) * np.sign(remaining) >= 0):
+                stop_reason = 'target'
+                break
+
+        if stop_reason == 'max_steps' and \
+                abs(u[c] - opts.target_displacement) <= 1e-9 * max(1.0, abs(remaining)):
+            stop_reason = 'target'
+
+        return {
+            'u': u,
+            'lambda': lam,
+            'converged': converged,
+            'path': path,
+            'n_solves': n_solves,
+            'stop_reason': stop_reason,
+            'method': opts.method
+        }
+
+    def _converged(self, R: np.ndarray, ref_norm: float) -> bool:
+        return float(np.linalg.norm(R)) <= self.options.tol * ref_norm
+
+    def _bordered_solve(self, linear_solve, u, R, F_ref):
+        """Risolve K [du_R, du_F] = [R, F_ref] con una sola fattorizzazione"""
+        sol = np.asarray(linear_solve(u, np.column_stack([R, F_ref])), dtype=float)
+        sol = sol.reshape(len(R), 2)
+        return sol[:, 0], sol[:, 1]
+
+    def _displacement_step(self, internal_force, linear_solve, F_ref, F_const,
+                           u_start, lam_start, c, inc, ref_norm) -> Dict:
+        """Passo a spostamento imposto sul DOF c (incremento inc)"""
+        opts = self.options
+        u = u_start.copy()
+        lam = lam_start
+        solves = 0
+        du_target = inc
+        u_tangent = u
+        for it in range(opts.max_iter + 1):
+            R = F_const + lam * F_ref - internal_force(u)
+            if it > 0 and self._converged(R, ref_norm):
+                return {'converged': True, 'u': u, 'lambda': lam,
+                        'iterations': it, 'solves': solves}
+            if it == opts.max_iter:
+                break
+            if opts.tangent_each_iteration:
+                u_tangent = u
+            du_R, du_F = self._bordered_solve(linear_solve, u_tangent, R, F_ref)
+            solves += 1
+            if not (np.all(np.isfinite(du_R)) and np.all(np.isfinite(du_F))) or du_F[c] == 0:
+                break
+            # Vincolo: Delta u_c accumulato nel passo = du_target
+            d_lam = (du_target - du_R[c]) / du_F[c]
+            du = du_R + d_lam * du_F
+            u = u + du
+            lam += d_lam
+            # Iterazioni successive: Delta u_c resta fisso
+            du_target = 0.0
+        return {'converged': False, 'u': u, 'lambda': lam,
+                'iterations': opts.max_iter, 'solves': solves}
+
+    def _arc_length_step(self, internal_force, linear_solve, F_ref, F_const,
+                         u_start, lam_start, c, du_nominal, arc, scale,
+                         prev_du, prev_dlam, FF, ref_norm) -> Dict:
+        """Passo arc-length di Crisfield con predittore tangente"""
+        opts = self.options
+        psi2 = opts.psi ** 2
+        solves = 0
+
+        # Predittore
+        R0 = F_const + lam_start * F_ref - internal_force(u_start)
+        du_R, du_F = self._bordered_solve(linear_solve, u_start, R0, F_ref)
+        solves += 1
+        if not (np.all(np.isfinite(du_R)) and np.all(np.isfinite(du_F))):
+            return {'converged': False, 'solves': solves}
+        if arc is None:
+            # Primo passo: Delta l che produce l'incremento nominale su u_c
+            d_lam0 = du_nominal / du_F[c] if du_F[c] != 0 else 1.0
+            arc = abs(d_lam0) * np.sqrt(du_F @ du_F + psi2 * FF)
+        arc = arc * scale
+
+        denom = np.sqrt(du_F @ du_F + psi2 * FF)
+        if denom == 0:
+            return {'converged': False, 'solves': solves}
+        d_lam = arc / denom
+        # Segno: continuità con il passo precedente (o verso del target)
+        if prev_du is not None:
+            if (du_F @ prev_du + psi2 * prev_dlam * FF) < 0:
+                d_lam = -d_lam
+        elif du_nominal * du_F[c] < 0:
+            d_lam = -d_lam
+        Du = d_lam * du_F
+        Dlam = d_lam
+        u = u_start + Du
+        lam = lam_start + Dlam
+        u_tangent = u
+
+        for it in range(1, opts.max_iter + 1):
+            R = F_const + lam * F_ref - internal_force(u)
+            if self._converged(R, ref_norm):
+                return {'converged': True, 'u': u, 'lambda': lam, 'arc': arc,
+                        'iterations': it, 'solves': solves}
+            if opts.tangent_each_iteration:
+                u_tangent = u
+            du_R, du_F = self._bordered_solve(linear_solve, u_tangent, R, F_ref)
+            solves += 1
+            if not (np.all(np.isfinite(du_R)) and np.all(np.isfinite(du_F))):
+                break
+
+            # Vincolo quadratico su Delta lam
+            Du_R = Du + du_R
+            a = du_F @ du_F + psi2 * FF
+            b = 2.0 * (Du_R @ du_F + psi2 * Dlam * FF)
+            cc = Du_R @ Du_R + psi2 * Dlam ** 2 * FF - arc ** 2
+            disc = b * b - 4.0 * a * cc
+            if a == 0 or disc < 0:
+                break
+            sq = np.sqrt(disc)
+            roots = ((-b + sq) / (2.0 * a), (-b - sq) / (2.0 * a))
+            # Radice con angolo minimo rispetto all'incremento corrente
+            best = max(roots, key=lambda r: (Du_R + r * du_F) @ Du + psi2 * (Dlam + r) * Dlam * FF)
+            Du = Du_R + best * du_F
+            Dlam += best
+            u = u_start + Du
+            lam = lam_start + Dlam
+
+        return {'converged': False, 'solves': solves}
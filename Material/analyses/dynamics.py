@@ -0,0 +1,990 @@
+# analyses/dynamics.py
+"""
+Integrazione nel tempo per analisi dinamiche lineari.
+
+NewmarkIntegrator risolve M a + C v + K u = P(t) con il metodo di Newmark
+(accelerazione media, beta=0.25, gamma=0.5 di default). La rigidezza
+efficace K + a1 C + a0 M viene fattorizzata una sola volta:
+    'sparse'  fattorizzazione sparsa (LinearSolver: Cholesky/LU con riordino)
+    'dense'   cho_factor su matrice densa (modelli molto piccoli)
+    'auto'    densa fino a DENSE_DOF_LIMIT DOF, sparsa oltre
+
+Il termine noto di ogni passo usa vettori di coefficienti precalcolati
+sullo stato [u, v, a]; con smorzamento di Rayleigh C non viene formata
+e bastano i prodotti con M e K.
+
+Più accelerogrammi sullo stesso modello (batch_ground_motions) avanzano
+insieme: a ogni passo un'unica soluzione con una matrice di termini noti
+(una colonna per record); i record possono essere ripartiti su un pool
+di processi, ciascuno con la propria fattorizzazione.
+
+Le storie del telaio (frame_time_history) possono essere restituite come
+liste (formato storico), array NumPy compatti (float32, sottoinsieme di
+DOF, decimazione), soli picchi calcolati durante l'integrazione, oppure
+scritte su file .npy memory-mapped (HistoryWriter).
+
+ModalIntegrator risolve lo stesso problema per sovrapposizione modale:
+ogni oscillatore modale è integrato con la ricorrenza esatta per carico
+lineare a tratti (Nigam-Jennings), applicata come filtro IIR del
+secondo ordine sull'intera storia; la ricombinazione u = Phi q si limita
+ai DOF richiesti.
+
+Le storie non lineari con cerniere isteretiche (integrator='nonlinear')
+sono nel modulo nonlinear_dynamics.
+
+Unità: forze in kN, lunghezze in m. Le masse del telaio (M_global, in kg)
+sono convertite in t (MASS_SCALE) nella riduzione ai DOF liberi
+(time_history_model), per cui tutti gli integratori e lo smorzamento di
+Rayleigh lavorano con masse coerenti con le rigidezze in kN/m.
+"""
+
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from scipy.signal import lfilter
+from scipy.sparse import csr_matrix
+
+from .solvers import LinearSolver, matrix_version
+
+logger = logging.getLogger(__name__)
+
+DENSE_DOF_LIMIT = 200
+# Masse del modello in kg -> t (kN·s²/m), coerenti con rigidezze in kN/m
+MASS_SCALE = 1e-3
+INTEGRATOR_SOLVERS = ('auto', 'dense', 'sparse')
+HISTORY_OUTPUTS = ('lists', 'arrays', 'peaks', 'memmap')
+HISTORY_FIELDS = ('displacements', 'velocities', 'accelerations')
+
+
+def newmark_coefficients(dt: float, beta: float = 0.25, gamma: float = 0.5) -> Tuple[float, ...]:
+    """Coefficienti a0..a5 della forma canonica di Newmark"""
+    a0 = 1.0 / (beta * dt * dt)
+    a1 = gamma / (beta * dt)
+    a2 = 1.0 / (beta * dt)
+    a3 = 1.0 / (2.0 * beta) - 1.0
+    a4 = gamma / beta - 1.0
+    a5 = dt * (gamma / (2.0 * beta) - 1.0)
+    return a0, a1, a2, a3, a4, a5
+
+
+def factorize_effective(K_eff: csr_matrix, solver: str,
+                        linear_solver: LinearSolver) -> Callable[[np.ndarray], np.ndarray]:
+    """Funzione di soluzione per K_eff: cho_factor (LU se non definita) o LinearSolver"""
+    if solver == 'dense':
+        from scipy.linalg import cho_factor, cho_solve
+        K_dense = K_eff.toarray()
+        try:
+            factor = cho_factor(K_dense, check_finite=False)
+            return lambda rhs: cho_solve(factor, rhs, check_finite=False)
+        except np.linalg.LinAlgError:
+            from scipy.linalg import lu_factor, lu_solve
+            factor = lu_factor(K_dense, check_finite=False)
+            return lambda rhs: lu_solve(factor, rhs, check_finite=False)
+    return linear_solver.factorize(K_eff).solve
+
+
+class NewmarkIntegrator:
+    """
+    Integratore di Newmark con rigidezza efficace fattorizzata una volta.
+
+    Args:
+        K, M: Matrici di rigidezza e massa (sparse o dense) sui DOF liberi
+        dt: Passo temporale
+        C: Matrice di smorzamento esplicita, oppure
+        rayleigh: (alpha0, alpha1) con C = alpha0 M + alpha1 K (C non formata)
+        solver: 'auto', 'dense' o 'sparse'
+        linear_solver: LinearSolver per il percorso sparso
+    """
+
+    def __init__(self, K, M, dt: float, C=None,
+                 rayleigh: Optional[Tuple[float, float]] = None,
+                 beta: float = 0.25, gamma: float = 0.5, solver: str = 'auto',
+                 linear_solver: Optional[LinearSolver] = None):
+        if solver not in INTEGRATOR_SOLVERS:
+            raise ValueError(f"Solver di integrazione non riconosciuto: {solver}")
+        if C is None and rayleigh is None:
+            rayleigh = (0.0, 0.0)
+        self.K = csr_matrix(K)
+        self.M = csr_matrix(M)
+        self.C = csr_matrix(C) if C is not None else None
+        self.rayleigh = rayleigh
+        self.dt = dt
+        self.beta = beta
+        self.gamma = gamma
+        self.n = self.K.shape[0]
+        self.linear_solver = linear_solver or LinearSolver(ordering='amd')
+
+        a0, a1, a2, a3, a4, a5 = newmark_coefficients(dt, beta, gamma)
+        self._a = (a0, a1, a2, a3, a4, a5)
+        # Coefficienti su [u, v, a] per i prodotti con M e con C
+        c_m = np.array([a0, a2, a3])
+        c_c = np.array([a1, a4, a5])
+        if self.C is None:
+            alpha0, alpha1 = rayleigh
+            # C = alpha0 M + alpha1 K: termini di C ripartiti su M e K
+            self._operators = ((self.M, c_m + alpha0 * c_c), (self.K, alpha1 * c_c))
+            C_eff = alpha0 * self.M + alpha1 * self.K
+        else:
+            self._operators = ((self.M, c_m), (self.C, c_c))
+            C_eff = self.C
+        self._operators = tuple((A, c) for A, c in self._operators if np.any(c != 0))
+
+        K_eff = (self.K + a1 * C_eff + a0 * self.M).tocsr()
+        if solver == 'auto':
+            solver = 'dense' if self.n <= DENSE_DOF_LIMIT else 'sparse'
+        self.solver = solver
+        self._solve = self._factorize(K_eff)
+        logger.debug(f"Newmark: {self.n} DOF, fattorizzazione {self.solver}")
+
+    def _factorize(self, K_eff: csr_matrix):
+        return factorize_effective(K_eff, self.solver, self.linear_solver)
+
+    def step(self, u: np.ndarray, v: np.ndarray, a: np.ndarray,
+             P: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Avanza di un passo dallo stato (u, v, a) con carico P al nuovo istante.
+        Stati e carichi (n,) oppure (n, n_rec) per più record insieme.
+        """
+        a0, _, a2, a3, _, _ = self._a
+        rhs = np.array(P, dtype=float, copy=True)
+        for A, (cu, cv, ca) in self._operators:
+            rhs += A @ (cu * u + cv * v + ca * a)
+        u_new = self._solve(rhs)
+        a_new = a0 * (u_new - u) - a2 * v - a3 * a
+        v_new = v + self.dt * ((1.0 - self.gamma) * a + self.gamma * a_new)
+        return u_new, v_new, a_new
+
+    def integrate_ground_motion(self, acc: np.ndarray, influence: np.ndarray,
+                                u0: Optional[np.ndarray] = None,
+                                v0: Optional[np.ndarray] = None,
+                                a0: Optional[np.ndarray] = None
+                                ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Risposta a un'accelerazione alla base: P_i = -acc[i] * M r.
+
+        Returns:
+            (u, v, a) di forma (n_steps, n) nei DOF dell'integratore
+        """
+        acc = np.asarray(acc, dtype=float)
+        n_steps = len(acc)
+        Mr = self.M @ np.asarray(influence, dtype=float)
+        u = np.zeros((n_steps, self.n))
+        v = np.zeros((n_steps, self.n))
+        a = np.zeros((n_steps, self.n))
+        if u0 is not None:
+            u[0] = u0
+        if v0 is not None:
+            v[0] = v0
+        if a0 is not None:
+            a[0] = a0
+        for i in range(1, n_steps):
+            u[i], v[i], a[i] = self.step(u[i - 1], v[i - 1], a[i - 1], -acc[i] * Mr)
+        return u, v, a
+
+    def integrate_ground_motions(self, records: np.ndarray, influence: np.ndarray,
+                                 control_dof: int,
+                                 drift_dofs: Optional[Sequence[int]] = None,
+                                 shear: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+                                 lengths: Optional[Sequence[int]] = None,
+                                 on_step: Optional[Callable] = None
+                                 ) -> Dict[str, np.ndarray]:
+        """
+        Più accelerogrammi insieme (una colonna di carico per record), senza
+        conservare le storie: per ogni record si tengono i picchi e lo stato
+        allo step critico (massimo |u| nel DOF di controllo).
+
+        Args:
+            records: Accelerazioni (n_rec, n_steps), record più corti completati con zeri
+            influence: Vettore di influenza r (P_i = -acc_i M r)
+            control_dof: DOF di controllo per lo step critico
+            drift_dofs: DOF su cui valutare il massimo spostamento (default tutti)
+            shear: (k, c, m) con taglio alla base V = k.u + c.v + m.a
+            lengths: Passi effettivi di ciascun record (i picchi ignorano il
+                completamento con zeri); default tutti n_steps
+            on_step: Chiamata on_step(i, u, v, a) a ogni passo (stati (n, n_rec)),
+                ad es. per scrivere le storie con HistoryWriter
+
+        Returns:
+            Dict di array (n_rec,): critical_step, control_peak, max_displacement,
+            max_velocity, max_acceleration, max_drift_displacement, base_shear_critical,
+            max_base_shear; u_critical, v_critical, a_critical di forma (n_rec, n)
+        """
+        records = np.atleast_2d(np.asarray(records, dtype=float))
+        n_rec, n_steps = records.shape
+        Mr = self.M @ np.asarray(influence, dtype=float)
+        drift_dofs = np.arange(self.n) if drift_dofs is None else np.asarray(drift_dofs, dtype=int)
+
+        u = np.zeros((self.n, n_rec))
+        v = np.zeros((self.n, n_rec))
+        a = np.zeros((self.n, n_rec))
+        out = {
+            'critical_step': np.zeros(n_rec, dtype=int),
+            'control_peak': np.zeros(n_rec),
+            'max_displacement': np.zeros(n_rec),
+            'max_velocity': np.zeros(n_rec),
+            'max_acceleration': np.zeros(n_rec),
+            'max_drift_displacement': np.zeros(n_rec),
+            'base_shear_critical': np.zeros(n_rec),
+            'max_base_shear': np.zeros(n_rec),
+            'u_critical': np.zeros((n_rec, self.n)),
+            'v_critical': np.zeros((n_rec, self.n)),
+            'a_critical': np.zeros((n_rec, self.n)),
+        }
+        lengths = np.full(n_rec, n_steps) if lengths is None else np.asarray(lengths, dtype=int)
+        # Massimi elemento per elemento, ridotti per record solo alla fine
+        peaks = [np.zeros((self.n, n_rec)) for _ in range(3)]
+        ctrl_abs = np.zeros(n_rec)
+        full = int(lengths.min())
+        if on_step is not None:
+            on_step(0, u, v, a)
+        for i in range(1, n_steps):
+            u, v, a = self.step(u, v, a, -np.outer(Mr, records[:, i]))
+            if on_step is not None:
+                on_step(i, u, v, a)
+            if i < full:
+                for peak, x in zip(peaks, (u, v, a)):
+                    np.maximum(peak, np.abs(x), out=peak)
+                ctrl = np.abs(u[control_dof])
+            else:
+                # Oltre la fine di un record (completamento con zeri) i picchi non cambiano
+                active = i < lengths
+                for peak, x in zip(peaks, (u, v, a)):
+                    peak[:, active] = np.maximum(peak[:, active], np.abs(x[:, active]))
+                ctrl = np.where(active, np.abs(u[control_dof]), 0.0)
+            if shear is not None:
+                Vb = shear[0] @ u + shear[1] @ v + shear[2] @ a
+                if i >= full:
+                    Vb = np.where(active, Vb, 0.0)
+                np.maximum(out['max_base_shear'], np.abs(Vb), out=out['max_base_shear'])
+            # Aggiorna lo stato critico solo per i record con nuovo picco
+            grow = ctrl > ctrl_abs
+            if np.any(grow):
+                ctrl_abs[grow] = ctrl[grow]
+                out['critical_step'][grow] = i
+                out['control_peak'][grow] = u[control_dof, grow]
+                out['u_critical'][grow] = u[:, grow].T
+                out['v_critical'][grow] = v[:, grow].T
+                out['a_critical'][grow] = a[:, grow].T
+                if shear is not None:
+                    out['base_shear_critical'][grow] = np.abs(Vb[grow])
+        out['max_displacement'] = peaks[0].max(axis=0)
+        out['max_velocity'] = peaks[1].max(axis=0)
+        out['max_acceleration'] = peaks[2].max(axis=0)
+        out['max_drift_displacement'] = peaks[0][drift_dofs].max(axis=0)
+        return out
+
+
+def nigam_jennings_coefficients(omega: np.ndarray, xi: np.ndarray, dt: float
+                                ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Coefficienti della ricorrenza esatta per carico lineare a tratti
+    (massa unitaria, rigidezza omega^2):
+        [q, qd]_{i+1} = A [q, qd]_i + B0 p_i + B1 p_{i+1}
+
+    Per modi sovrasmorzati (xi > 1, frequenti con Rayleigh sui modi alti)
+    le stesse espressioni valgono in aritmetica complessa (sin -> sinh).
+
+    Returns:
+        A (k, 2, 2), B0 (k, 2), B1 (k, 2) per i k oscillatori
+    """
+    w = np.atleast_1d(np.asarray(omega, dtype=float))
+    z = np.broadcast_to(np.asarray(xi, dtype=float), w.shape).copy()
+    if np.any(w <= 0.0) or np.any(z < 0.0):
+        raise ValueError("Ricorrenza Nigam-Jennings: richiesti omega > 0 e xi >= 0")
+    # Smorzamento critico: espressioni singolari, si scosta xi di poco
+    z[np.abs(z - 1.0) < 1e-6] = 1.0 - 1e-6
+    k = w * w
+    sq = np.sqrt((1.0 - z * z).astype(complex))
+    wd = w * sq
+    e = np.exp(-z * w * dt)
+    s = np.sin(wd * dt)
+    c = np.cos(wd * dt)
+    zs = z / sq
+
+    A = np.empty(w.shape + (2, 2), dtype=complex)
+    A[:, 0, 0] = e * (zs * s + c)
+    A[:, 0, 1] = e * s / wd
+    A[:, 1, 0] = -e * w / sq * s
+    A[:, 1, 1] = e * (c - zs * s)
+
+    B0 = np.empty(w.shape + (2,), dtype=complex)
+    B1 = np.empty(w.shape + (2,), dtype=complex)
+    B0[:, 0] = (2.0 * z / (w * dt)
+                + e * (((1.0 - 2.0 * z * z) / (wd * dt) - zs) * s
+                       - (1.0 + 2.0 * z / (w * dt)) * c)) / k
+    B1[:, 0] = (1.0 - 2.0 * z / (w * dt)
+                + e * ((2.0 * z * z - 1.0) / (wd * dt) * s + 2.0 * z / (w * dt) * c)) / k
+    B0[:, 1] = (-1.0 / dt + e * ((w / sq + z / (dt * sq)) * s + c / dt)) / k
+    B1[:, 1] = (1.0 - e * (zs * s + c)) / (k * dt)
+    return A.real, B0.real, B1.real
+
+
+def modal_response(omega: np.ndarray, xi: Union[float, np.ndarray],
+                   load: np.ndarray, dt: float
+                   ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Risposta degli oscillatori modali (massa unitaria) a partire da quiete.
+
+    La ricorrenza di Nigam-Jennings x_{i+1} = A x_i + w_i, con
+    w_i = B0 p_i + B1 p_{i+1}, equivale per ogni modo a un filtro IIR
+    del secondo ordine (denominatore z^2 - tr(A) z + det(A)) applicato
+    all'intera storia con lfilter.
+
+    Args:
+        omega: Pulsazioni (k,)
+        xi: Smorzamenti modali (scalare o (k,))
+        load: Carichi modali p(t) di forma (n_steps, k)
+        dt: Passo temporale
+
+    Returns:
+        (q, qd, qdd) di forma (n_steps, k); qdd = p - 2 xi omega qd - omega^2 q
+    """
+    omega = np.atleast_1d(np.asarray(omega, dtype=float))
+    xi = np.broadcast_to(np.asarray(xi, dtype=float), omega.shape)
+    p = np.asarray(load, dtype=float).reshape(-1, omega.size)
+    A, B0, B1 = nigam_jennings_coefficients(omega, xi, dt)
+
+    # w_i = B0 p_i + B1 p_{i+1}; l'ultimo passo non ha successore
+    p_next = np.zeros_like(p)
+    p_next[:-1] = p[1:]
+    w1 = B0[:, 0] * p + B1[:, 0] * p_next
+    w2 = B0[:, 1] * p + B1[:, 1] * p_next
+
+    q = np.empty_like(p)
+    qd = np.empty_like(p)
+    for j in range(omega.size):
+        a11, a12, a21, a22 = A[j].ravel()
+        den = [1.0, -(a11 + a22), a11 * a22 - a12 * a21]
+        q[:, j] = (lfilter([0.0, 1.0, -a22], den, w1[:, j])
+                   + lfilter([0.0, 0.0, a12], den, w2[:, j]))
+        qd[:, j] = (lfilter([0.0, 0.0, a21], den, w1[:, j])
+                    + lfilter([0.0, 1.0, -a11], den, w2[:, j]))
+    qdd = p - 2.0 * xi * omega * qd - omega * omega * q
+    return q, qd, qdd
+
+
+class ModalIntegrator:
+    """
+    Storia temporale per sovrapposizione modale.
+
+    Args:
+        omega: Pulsazioni dei modi (k,)
+        modes: Forme modali (n, k) normalizzate rispetto a M (phi^T M phi = 1)
+        M: Matrice di massa (per i fattori di partecipazione phi^T M r)
+        xi: Smorzamento modale (scalare o per modo)
+    """
+
+    def __init__(self, omega, modes, M, xi: Union[float, Sequence[float]] = 0.05):
+        self.omega = np.atleast_1d(np.asarray(omega, dtype=float))
+        self.modes = np.asarray(modes, dtype=float).reshape(-1, self.omega.size)
+        self.M = csr_matrix(M)
+        self.xi = np.broadcast_to(np.asarray(xi, dtype=float), self.omega.shape).copy()
+        self.n, self.n_modes = self.modes.shape
+        logger.debug(f"Sovrapposizione modale: {self.n} DOF, {self.n_modes} modi")
+
+    def participation(self, influence: np.ndarray) -> np.ndarray:
+        """Fattori di partecipazione Gamma = phi^T M r"""
+        return self.modes.T @ (self.M @ np.asarray(influence, dtype=float))
+
+    def modal_ground_motion(self, acc: np.ndarray, dt: float, influence: np.ndarray
+                            ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Coordinate modali (q, qd, qdd) per l'accelerazione alla base acc"""
+        acc = np.asarray(acc, dtype=float)
+        load = -np.outer(acc, self.participation(influence))
+        return modal_response(self.omega, self.xi, load, dt)
+
+    def integrate_ground_motion(self, acc: np.ndarray, dt: float, influence: np.ndarray,
+                                dofs: Optional[Sequence[int]] = None
+                                ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Risposta relativa (u, v, a) ricombinata sui DOF richiesti.
+
+        Returns:
+            (u, v, a) di forma (n_steps, len(dofs)); tutti i DOF se dofs è None
+        """
+        q, qd, qdd = self.modal_ground_motion(acc, dt, influence)
+        phi = self.modes if dofs is None else self.modes[np.asarray(dofs, dtype=int)]
+        return q @ phi.T, qd @ phi.T, qdd @ phi.T
+
+
+class HistoryWriter:
+    """
+    Storie (spostamenti, velocità, accelerazioni) su un sottoinsieme di
+    colonne dello stato, ogni `every` passi, in memoria o su file .npy
+    memory-mapped nella cartella `path`.
+
+    Args:
+        n_steps: Passi dell'analisi
+        columns: Indici nello stato da conservare (-1 = DOF vincolato, valore nullo)
+        every: Decimazione (si conservano i passi 0, every, 2*every, ...)
+        dtype: Tipo degli array (es. np.float32)
+        path: Cartella per displacements.npy, velocities.npy, accelerations.npy
+    """
+
+    def __init__(self, n_steps: int, columns: Sequence[int], every: int = 1,
+                 dtype=np.float64, path: Optional[str] = None):
+        self.every = max(1, int(every))
+        self.steps = np.arange(0, n_steps, self.every)
+        columns = np.asarray(columns, dtype=int)
+        self._take = np.clip(columns, 0, None)
+        self._mask = (columns >= 0).astype(float)
+        self.path = path
+        shape = (self.steps.size, columns.size)
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self.arrays = [np.lib.format.open_memmap(os.path.join(path, f"{field}.npy"),
+                                                     mode='w+', dtype=dtype, shape=shape)
+                           for field in HISTORY_FIELDS]
+        else:
+            self.arrays = [np.zeros(shape, dtype=dtype) for _ in HISTORY_FIELDS]
+
+    def __call__(self, i: int, u: np.ndarray, v: np.ndarray, a: np.ndarray) -> None:
+        """Scrive il passo i (stati (n,) o (n, 1)) se previsto dalla decimazione"""
+        if i % self.every:
+            return
+        row = i // self.every
+        for array, x in zip(self.arrays, (u, v, a)):
+            array[row] = np.ravel(x)[self._take] * self._mask
+
+    def write_rows(self, rows: slice, u: np.ndarray, v: np.ndarray, a: np.ndarray) -> None:
+        """Scrive un blocco di righe già ristretto alle colonne e decimato"""
+        for array, x in zip(self.arrays, (u, v, a)):
+            array[rows] = x
+
+    def finish(self) -> Dict[str, np.ndarray]:
+        """Array per campo; su disco vengono riaperti in sola lettura"""
+        if not self.path:
+            return dict(zip(HISTORY_FIELDS, self.arrays))
+        for array in self.arrays:
+            array.flush()
+        del self.arrays
+        return {field: np.load(os.path.join(self.path, f"{field}.npy"), mmap_mode='r')
+                for field in HISTORY_FIELDS}
+
+
+def _ground_motion_chunk(args) -> Dict[str, np.ndarray]:
+    """Lavoro di un processo: fattorizzazione propria e blocco di record"""
+    (K, M, dt, rayleigh, beta, gamma, solver,
+     records, lengths, influence, control_dof, drift_dofs, shear) = args
+    newmark = NewmarkIntegrator(K, M, dt, rayleigh=rayleigh, beta=beta, gamma=gamma, solver=solver)
+    return newmark.integrate_ground_motions(records, influence, control_dof, drift_dofs, shear, lengths)
+
+
+def batch_ground_motions(K, M, dt: float, records, influence: np.ndarray, control_dof: int,
+                         rayleigh: Tuple[float, float] = (0.0, 0.0),
+                         drift_dofs: Optional[Sequence[int]] = None,
+                         shear: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+                         beta: float = 0.25, gamma: float = 0.5, solver: str = 'auto',
+                         n_workers: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Insieme di accelerogrammi sullo stesso modello lineare.
+
+    Con n_workers None (o 1) K_eff è fattorizzata una volta e tutti i record
+    avanzano insieme; altrimenti i record sono ripartiti in n_workers blocchi
+    su un ProcessPoolExecutor (una fattorizzazione per processo).
+
+    Args:
+        records: Lista di accelerogrammi (anche di lunghezza diversa) o array (n_rec, n_steps)
+
+    Returns:
+        Dict di array per record (vedi NewmarkIntegrator.integrate_ground_motions)
+        più 'n_steps' (lunghezza di ciascun record) e 'n_workers'
+    """
+    records_list = [np.asarray(r, dtype=float).ravel() for r in records]
+    if not records_list:
+        raise ValueError("Nessun accelerogramma fornito")
+    lengths = np.array([r.size for r in records_list], dtype=int)
+    acc = np.zeros((len(records_list), int(lengths.max())))
+    for j, r in enumerate(records_list):
+        acc[j, :r.size] = r
+
+    n_workers = max(1, min(int(n_workers or 1), len(records_list)))
+    K = csr_matrix(K)
+    M = csr_matrix(M)
+    if n_workers == 1:
+        newmark = NewmarkIntegrator(K, M, dt, rayleigh=rayleigh, beta=beta, gamma=gamma, solver=solver)
+        out = newmark.integrate_ground_motions(acc, influence, control_dof, drift_dofs, shear, lengths)
+    else:
+        # Blocchi bilanciati per numero di passi (record ordinati per lunghezza)
+        order = np.argsort(-lengths, kind='stable')
+        chunks = [np.sort(order[w::n_workers]) for w in range(n_workers)]
+        jobs = [(K, M, dt, rayleigh, beta, gamma, solver, acc[c][:, :int(lengths[c].max())],
+                 lengths[c], influence, control_dof, drift_dofs, shear) for c in chunks]
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            parts: List[Dict[str, np.ndarray]] = list(pool.map(_ground_motion_chunk, jobs))
+        position = np.concatenate(chunks)
+        out = {}
+        for key in parts[0]:
+            merged = np.concatenate([part[key] for part in parts])
+            out[key] = np.empty_like(merged)
+            out[key][position] = merged
+    out['n_steps'] = lengths
+    out['n_workers'] = n_workers
+    logger.debug(f"Batch accelerogrammi: {len(records_list)} record, {n_workers} processi")
+    return out
+
+
+# ============================================================================
+# STORIE TEMPORALI SU TELAIO EQUIVALENTE
+# ============================================================================
+
+def frame_fixed_nodes(frame) -> List[int]:
+    """Nodi incastrati: vincoli come dict {nodo: tipo} o lista di dict"""
+    constraints = frame.constraints
+    if isinstance(constraints, dict):
+        return [nid for nid, c in constraints.items() if c == 'fixed']
+    return [c['node'] for c in constraints if c.get('type') == 'fixed']
+
+
+def frame_node_y(frame, node_id: int) -> float:
+    """Quota del nodo: coordinate come dict {'x', 'y'} o array [x, y]"""
+    coords = frame.nodes[node_id]
+    return float(coords['y']) if isinstance(coords, dict) else float(coords[1])
+
+
+def frame_element_forces(frame, u: np.ndarray) -> List[Dict]:
+    """Forze interne negli elementi per lo spostamento globale u"""
+    for elem in frame.elements:
+        dof_i = frame.node_dofs[elem.i_node]
+        dof_j = frame.node_dofs[elem.j_node]
+        u_elem = np.concatenate([u[dof_i], u[dof_j]])
+        elem.compute_internal_forces(u_elem)
+    return [e.forces for e in frame.elements]
+
+
+def convert_accelerogram(accelerogram, accel_units: str = 'mps2') -> np.ndarray:
+    """Accelerogramma in m/s² ('g', 'gal' o 'mps2')"""
+    if accel_units.lower() in ('g', 'grav'):
+        return np.asarray(accelerogram, dtype=float) * 9.80665
+    if accel_units.lower() in ('gal',):
+        return np.asarray(accelerogram, dtype=float) * 0.01  # 1 Gal = 0.01 m/s^2
+    return np.asarray(accelerogram, dtype=float)
+
+
+def rayleigh_coefficients(Kff, Mff, omegas: Optional[np.ndarray] = None,
+                          xi: float = 0.05, modal_solver=None) -> Tuple[float, float]:
+    """
+    Smorzamento di Rayleigh (ξ=5%) sui primi due modi ridotti: (alpha0, alpha1)
+
+    Senza omegas i due modi sono calcolati con shift-invert dal servizio
+    modale (modal_solver, es. quello del telaio, riusa i risultati già noti).
+    """
+    try:
+        if omegas is not None:
+            w = np.sort(omegas)
+        else:
+            if modal_solver is None:
+                from .modal import ModalSolver
+                modal_solver = ModalSolver()
+            w = modal_solver.solve(Kff, Mff, 2)['omega']
+        w1 = float(w[0])
+        w2 = float(w[1]) if len(w) > 1 else float(w[0]) * 1.5
+    except Exception:
+        w1, w2 = 2*np.pi*1.0, 2*np.pi*3.0  # fallback realistico per muratura
+
+    # Protezione contro divisione per zero
+    den = (w1 + w2) if (w1 + w2) > 1e-12 else 1e-12
+    alpha0 = 2*xi*w1*w2/den   # coeff. massa
+    alpha1 = 2*xi/den         # coeff. rigidezza
+    return alpha0, alpha1
+
+
+def frame_dynamic_cache(frame) -> Dict:
+    """
+    Cache delle storie temporali sul telaio (modelli ridotti e integratori),
+    valida finché K_global e M_global sono gli stessi oggetti non modificati.
+    """
+    K, M = frame.K_global, frame.M_global
+    key = (matrix_version(K), None if M is None else matrix_version(M))
+    cache = getattr(frame, '_dynamic_cache', None)
+    if cache is None or cache['K'] is not K or cache['M'] is not M or cache['key'] != key:
+        cache = {'K': K, 'M': M, 'key': key, 'models': {}, 'integrators': OrderedDict()}
+        frame._dynamic_cache = cache
+    return cache
+
+
+def time_history_model(frame, excitation_dir: str = 'y') -> Dict:
+    """
+    Parte comune alle storie temporali singole e batch: riduzione ai DOF
+    liberi, influenza, DOF di copertura e righe del taglio alla base.
+    Mff e M_base sono in t (MASS_SCALE). Il risultato è riusato finché il
+    modello non cambia.
+    """
+    cache = frame_dynamic_cache(frame)
+    dir_key = 'x' if excitation_dir.lower().startswith('x') else 'y'
+    if dir_key not in cache['models']:
+        cache['models'][dir_key] = _time_history_model(frame, excitation_dir)
+    return cache['models'][dir_key]
+
+
+def _time_history_model(frame, excitation_dir: str) -> Dict:
+    from scipy.sparse import eye as speye
+
+    # Direzione coerente per tutto (0=X, 1=Y)
+    dir_idx = 0 if excitation_dir.lower().startswith('x') else 1
+    n = len(frame.nodes) * 3
+
+    K = frame.K_global.tocsr()
+    M = frame.M_global.tocsr() if frame.M_global is not None else (speye(n, format='csr') * 1000.0)
+    M = (MASS_SCALE * M).tocsr()
+
+    # ---- Riduzione ai DOF liberi (come nella modale)
+    fixed_nodes = frame_fixed_nodes(frame)
+    fixed = []
+    for node_id in fixed_nodes:
+        fixed.extend(frame.node_dofs[node_id])
+    fixed = np.array(sorted(set(fixed)), dtype=int)
+    free = np.setdiff1d(np.arange(n), fixed).astype(int)
+
+    if free.size == 0:
+        raise RuntimeError("Nessun DOF libero per l'analisi dinamica.")
+
+    # ---- Vettore di influenza ridotto (solo traslazioni)
+    r = np.zeros(n)
+    r[dir_idx::3] = 1.0
+
+    # Nodo di copertura (sempre quello con Y max, ma DOF dipende da direzione)
+    node_ids = sorted(frame.nodes.keys())
+    y_coords = np.array([frame_node_y(frame, i) for i in node_ids])
+    roof_node = node_ids[int(np.argmax(y_coords))]
+    roof_dof = frame.node_dofs[roof_node][dir_idx]
+
+    # ---- Taglio alla base: somma delle reazioni nella direzione coerente
+    # (righe di K_cf e M_cf dei DOF di base, F_c = 0)
+    base_dofs = [frame.node_dofs[nid][dir_idx] for nid in fixed_nodes]
+    K_base = np.asarray(K[base_dofs][:, free].sum(axis=0)).ravel()
+    M_base = np.asarray(M[base_dofs][:, free].sum(axis=0)).ravel()
+
+    return {
+        'n': n, 'dir_idx': dir_idx, 'free': free, 'fixed': fixed,
+        'Kff': K[free][:, free].tocsr(), 'Mff': M[free][:, free].tocsr(),
+        'rf': r[free], 'roof_dof': roof_dof,
+        'drift_dofs': np.arange(dir_idx, n, 3),
+        'K_base': K_base, 'M_base': M_base,
+        'height': frame._get_building_height()
+    }
+
+
+def _frame_modes(frame, model: Dict, n_modes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Autocoppie di frame.solve_modal sui DOF liberi, normalizzate rispetto a Mff"""
+    n, free, Mff = model['n'], model['free'], model['Mff']
+    modal = frame.solve_modal(n_modes)
+    # solve_modal lavora sulle masse in kg: stessi modi, ω² scalato di 1/MASS_SCALE
+    omegas = 2*np.pi*np.asarray(modal['frequencies'], dtype=float) / np.sqrt(MASS_SCALE)
+    phi = np.asarray(modal['mode_shapes'], dtype=float).reshape(n, -1)[free]
+    phi = np.nan_to_num(phi, nan=0.0, posinf=0.0, neginf=0.0)
+    m_modal = np.einsum('ij,ij->j', phi, Mff @ phi)
+    # Scarta modi degeneri (DOF senza massa, pulsazioni non finite)
+    keep = np.isfinite(omegas) & (omegas > 1e-8) & (m_modal > 1e-12 * max(m_modal.max(), 1e-300))
+    if not np.any(keep):
+        raise RuntimeError("Analisi modale senza modi validi per la sovrapposizione.")
+    # Normalizzazione rispetto a Mff (i modi di solve_modal sono sul modello completo)
+    return omegas[keep], phi[:, keep] / np.sqrt(m_modal[keep])
+
+
+def history_dofs(frame, model: Dict, output_dofs=None) -> np.ndarray:
+    """
+    DOF globali delle storie: None (tutti), 'storeys' (DOF nella direzione
+    del sisma del primo nodo di ogni quota sopra la base, copertura inclusa)
+    o lista esplicita di DOF.
+    """
+    if output_dofs is None:
+        return np.arange(model['n'])
+    if isinstance(output_dofs, str):
+        if output_dofs != 'storeys':
+            raise ValueError(f"DOF di output non riconosciuti: {output_dofs}")
+        fixed_nodes = set(frame_fixed_nodes(frame))
+        levels: Dict[float, int] = {}
+        for nid in sorted(frame.nodes.keys()):
+            if nid in fixed_nodes:
+                continue
+            levels.setdefault(round(frame_node_y(frame, nid), 6), nid)
+        return np.array([frame.node_dofs[levels[y]][model['dir_idx']] for y in sorted(levels)],
+                        dtype=int)
+    return np.asarray(output_dofs, dtype=int)
+
+
+def _modal_peaks(q: np.ndarray, qd: np.ndarray, qdd: np.ndarray, phi: np.ndarray,
+                 drift_dofs: np.ndarray, chunk: int = 2048) -> Tuple[float, float, float, float]:
+    """Massimi |u|, |v|, |a| su tutti i DOF e |u| sui DOF di drift, ricombinando a blocchi"""
+    peaks = np.zeros(4)
+    for start in range(0, q.shape[0], chunk):
+        block = slice(start, start + chunk)
+        u = q[block] @ phi.T
+        peaks[0] = max(peaks[0], float(np.abs(u).max(initial=0.0)))
+        peaks[1] = max(peaks[1], float(np.abs(qd[block] @ phi.T).max(initial=0.0)))
+        peaks[2] = max(peaks[2], float(np.abs(qdd[block] @ phi.T).max(initial=0.0)))
+        peaks[3] = max(peaks[3], float(np.abs(u[:, drift_dofs]).max(initial=0.0)))
+    return tuple(peaks)
+
+
+def frame_time_history(frame, accelerogram, dt: float, excitation_dir: str = 'y',
+                       accel_units: str = 'mps2', integrator: str = 'auto',
+                       n_modes: int = 12, output_dofs=None,
+                       output: str = 'lists', output_dtype='float64',
+                       output_every: int = 1, output_path: Optional[str] = None,
+                       beta: float = 0.25, gamma: float = 0.5,
+                       nonlinear_options=None) -> Dict:
+    """
+    Storia temporale del telaio (Rayleigh ξ=5% sui DOF liberi) con forze
+    interne e taglio alla base allo step critico.
+
+    I massimi (max_displacement, max_velocity, max_acceleration, max_drift)
+    e lo step critico sono calcolati durante l'integrazione su tutti i DOF e
+    su tutti i passi, indipendentemente dalle storie conservate.
+
+    Args:
+        integrator: 'sparse', 'dense', 'auto' (Newmark, K_eff fattorizzata una
+            volta) o 'modal' (sovrapposizione dei primi n_modes modi di
+            solve_modal con la ricorrenza di Nigam-Jennings) o 'nonlinear'
+            (Newmark con Newton-Raphson e cerniere isteretiche, modulo
+            nonlinear_dynamics; carichi verticali applicati prima del sisma)
+        output_dofs: DOF delle storie (None = tutti, 'storeys' o lista, vedi history_dofs)
+        output: 'lists' (liste Python, formato storico), 'arrays' (array NumPy),
+            'peaks' (nessuna storia) o 'memmap' (.npy in output_path)
+        output_dtype: Tipo degli array conservati (es. 'float32')
+        output_every: Decimazione delle storie conservate
+        output_path: Cartella dei file .npy per output='memmap'
+        nonlinear_options: NonlinearDynamicsOptions (o dict) per 'nonlinear'
+    """
+    if output not in HISTORY_OUTPUTS:
+        raise ValueError(f"Output time-history non riconosciuto: {output}")
+    if output == 'memmap' and not output_path:
+        raise ValueError("Output 'memmap' richiede output_path")
+    acc = convert_accelerogram(accelerogram, accel_units).ravel()
+    n_steps = len(acc)
+    if n_steps == 0:
+        raise ValueError("Accelerogramma richiesto per analisi time-history")
+
+    model = time_history_model(frame, excitation_dir)
+    n, free = model['n'], model['free']
+    Kff, Mff, rf = model['Kff'], model['Mff'], model['rf']
+    roof_dof, drift_dofs = model['roof_dof'], model['drift_dofs']
+
+    omegas = None
+    if integrator == 'modal':
+        omegas, phi = _frame_modes(frame, model, n_modes)
+    alpha0, alpha1 = rayleigh_coefficients(Kff, Mff, omegas,
+                                           modal_solver=getattr(frame, 'modal_solver', None))
+
+    out_dofs = history_dofs(frame, model, output_dofs)
+    index = np.full(n, -1, dtype=int);  index[free] = np.arange(free.size)
+    writer = None
+    if output != 'peaks':
+        columns = out_dofs if integrator == 'modal' else index[out_dofs]
+        writer = HistoryWriter(n_steps, columns, every=output_every, dtype=np.dtype(output_dtype),
+                               path=output_path if output == 'memmap' else None)
+
+    if integrator == 'modal':
+        # ---- Sovrapposizione modale: coordinate modali con la ricorrenza
+        # esatta, ricombinazione solo sui DOF richiesti
+        xi_modes = alpha0/(2*omegas) + alpha1*omegas/2
+        modal_int = ModalIntegrator(omegas, phi, Mff, xi=xi_modes)
+        q, qd, qdd = modal_int.modal_ground_motion(acc, dt, rf)
+        phi_full = np.zeros((n, phi.shape[1]));  phi_full[free] = phi
+
+        i_crit = int(np.argmax(np.abs(q @ phi_full[roof_dof])))
+        u_crit = phi_full @ q[i_crit]
+        v_crit = phi_full @ qd[i_crit]
+        a_crit = phi_full @ qdd[i_crit]
+        max_u, max_v, max_a, max_u_drift = _modal_peaks(q, qd, qdd, phi_full, drift_dofs)
+        if writer is not None:
+            phi_out = phi_full[out_dofs].T
+            steps = writer.steps
+            for start in range(0, steps.size, 2048):
+                rows = slice(start, start + 2048)
+                sel = steps[rows]
+                writer.write_rows(rows, q[sel] @ phi_out, qd[sel] @ phi_out, qdd[sel] @ phi_out)
+        solver_name = 'modal'
+    elif integrator == 'nonlinear':
+        # ---- Newmark con equilibrio di Newton e cerniere isteretiche:
+        # K_eff rifattorizzata solo quando cambia l'insieme delle cerniere attive
+        from .nonlinear_dynamics import (HINGE_COMPONENTS, NonlinearDynamicsOptions,
+                                         NonlinearNewmark)
+        if isinstance(nonlinear_options, dict):
+            nonlinear_options = NonlinearDynamicsOptions(**nonlinear_options)
+        newmark = NonlinearNewmark(frame, model, dt, (alpha0, alpha1), nonlinear_options,
+                                   beta=beta, gamma=gamma)
+        drift_f = index[drift_dofs]
+        peaks = newmark.integrate_ground_motion(acc, rf, int(index[roof_dof]),
+                                                drift_f[drift_f >= 0], on_step=writer)
+        i_crit = int(peaks['critical_step'])
+        u_crit = np.zeros(n);  u_crit[free] = peaks['u_critical']
+        v_crit = np.zeros(n);  v_crit[free] = peaks['v_critical']
+        a_crit = np.zeros(n);  a_crit[free] = peaks['a_critical']
+        max_u = peaks['max_displacement']
+        max_v = peaks['max_velocity']
+        max_a = peaks['max_acceleration']
+        max_u_drift = peaks['max_drift_displacement']
+        solver_name = 'nonlinear'
+    else:
+        # ---- Newmark sui DOF liberi: K_eff fattorizzata una volta, Rayleigh
+        # senza formare C; picchi e stato critico calcolati al volo, storie
+        # (eventuali) scritte passo per passo dal writer
+        # Integratore (e fattorizzazione di K_eff) riusato tra analisi sullo stesso modello
+        integrators = frame_dynamic_cache(frame)['integrators']
+        key = (dt, alpha0, alpha1, beta, gamma, integrator)
+        newmark = integrators.get(key)
+        if newmark is None:
+            newmark = NewmarkIntegrator(Kff, Mff, dt, rayleigh=(alpha0, alpha1),
+                                        beta=beta, gamma=gamma, solver=integrator)
+            integrators[key] = newmark
+            while len(integrators) > 4:
+                integrators.popitem(last=False)
+        drift_f = index[drift_dofs]
+        peaks = newmark.integrate_ground_motions(acc[None, :], rf, int(index[roof_dof]),
+                                                 drift_f[drift_f >= 0], on_step=writer)
+        i_crit = int(peaks['critical_step'][0])
+        u_crit = np.zeros(n);  u_crit[free] = peaks['u_critical'][0]
+        v_crit = np.zeros(n);  v_crit[free] = peaks['v_critical'][0]
+        a_crit = np.zeros(n);  a_crit[free] = peaks['a_critical'][0]
+        max_u = float(peaks['max_displacement'][0])
+        max_v = float(peaks['max_velocity'][0])
+        max_a = float(peaks['max_acceleration'][0])
+        max_u_drift = float(peaks['max_drift_displacement'][0])
+        solver_name = newmark.solver
+
+    # ---- Forze interne e taglio alla base allo step critico
+    # (K_cf u_f + C_cf v_f + M_cf a_f, C via Rayleigh sugli stessi alpha0/alpha1)
+    if integrator == 'nonlinear':
+        # Forze dallo stato delle cerniere, non da K u
+        element_forces_crit = peaks['element_forces_critical']
+        for elem, forces in zip(frame.elements, element_forces_crit):
+            elem.forces.update(forces)
+        Vb_crit = peaks['base_shear_critical']
+    else:
+        element_forces_crit = frame_element_forces(frame, u_crit)
+        K_base, M_base = model['K_base'], model['M_base']
+        C_base = alpha0*M_base + alpha1*K_base
+        Vb_crit = abs(float(K_base @ u_crit[free] + C_base @ v_crit[free] + M_base @ a_crit[free]))
+
+    # Drift massimo coerente con direzione (0::3 per X, 1::3 per Y)
+    max_drift = max_u_drift / max(model['height'], 1e-6)
+
+    results = {
+        'max_drift': max_drift,
+        'max_acceleration': max_a,
+        'max_velocity': max_v,
+        'max_displacement': max_u,
+        'integrator': solver_name,
+        'critical_step': {
+            'index': int(i_crit),
+            'time': float(i_crit * dt),
+            'roof_displacement': float(u_crit[roof_dof]),
+            'base_shear': float(Vb_crit),
+            'element_forces': element_forces_crit,
+            'displacements': u_crit.tolist()
+        }
+    }
+    if writer is not None:
+        histories = writer.finish()
+        times = writer.steps * dt
+        if output == 'lists':
+            results['time'] = times.tolist()
+            results.update({field: values.tolist() for field, values in histories.items()})
+        else:
+            results['time'] = times
+            results.update(histories)
+    results['output'] = output
+    if output_dofs is not None:
+        results['output_dofs'] = out_dofs.tolist()
+    if output_every > 1:
+        results['output_every'] = int(output_every)
+    if output == 'memmap':
+        results['output_path'] = output_path
+    if integrator == 'modal':
+        results['modal'] = {
+            'n_modes': int(len(omegas)),
+            'periods': (2*np.pi/omegas).tolist(),
+            'damping': xi_modes.tolist(),
+            'participation': modal_int.participation(rf).tolist()
+        }
+    if integrator == 'nonlinear':
+        results['nonlinear'] = {
+            'hinges': peaks['hinges'],
+            'n_hinges': len(peaks['hinges']),
+            'released': peaks['released'],
+            'n_yield_events': int(peaks['n_yield_events']),
+            'max_base_shear': float(peaks['max_base_shear']),
+            'components': list(HINGE_COMPONENTS),
+            'plastic_deformation': peaks['plastic_deformation'].tolist(),
+            'max_plastic_deformation': peaks['max_plastic_deformation'].tolist(),
+            'stats': peaks['stats']
+        }
+    return results
+
+
+def frame_time_history_batch(frame, accelerograms, dt: float, excitation_dir: str = 'y',
+                             accel_units: str = 'mps2', integrator: str = 'auto',
+                             n_workers: Optional[int] = None,
+                             beta: float = 0.25, gamma: float = 0.5) -> Dict:
+    """
+    Insieme di accelerogrammi (es. 7-30 record per sito, NTC §3.2.3.6) sullo
+    stesso telaio: riduzione, Rayleigh e K_eff calcolati una volta, record
+    avanzati insieme con termini noti multipli (o ripartiti su n_workers processi).
+
+    Returns:
+        Tabella 'records' (una riga per record: drift e taglio di picco, step
+        critico) e statistiche dell'insieme (medie e massimi)
+    """
+    if isinstance(accelerograms, np.ndarray) and accelerograms.ndim == 1:
+        accelerograms = [accelerograms]
+    records = [convert_accelerogram(acc, accel_units) for acc in accelerograms]
+    if not records or any(rec.size == 0 for rec in records):
+        raise ValueError("Accelerogrammi richiesti per analisi time-history batch")
+
+    model = time_history_model(frame, excitation_dir)
+    n, free = model['n'], model['free']
+    alpha0, alpha1 = rayleigh_coefficients(model['Kff'], model['Mff'],
+                                           modal_solver=getattr(frame, 'modal_solver', None))
+    K_base, M_base = model['K_base'], model['M_base']
+    shear = (K_base, alpha0*M_base + alpha1*K_base, M_base)
+
+    # DOF di controllo e di drift negli indici ridotti
+    index = np.full(n, -1, dtype=int);  index[free] = np.arange(free.size)
+    control = int(index[model['roof_dof']])
+    drift_f = index[model['drift_dofs']]
+    drift_f = drift_f[drift_f >= 0]
+
+    peaks = batch_ground_motions(model['Kff'], model['Mff'], dt, records, model['rf'],
+                                 control, rayleigh=(alpha0, alpha1), drift_dofs=drift_f,
+                                 shear=shear, beta=beta, gamma=gamma,
+                                 solver=integrator, n_workers=n_workers)
+
+    height = max(model['height'], 1e-6)
+    table = []
+    for j in range(len(records)):
+        i_crit = int(peaks['critical_step'][j])
+        table.append({
+            'record': j,
+            'n_steps': int(peaks['n_steps'][j]),
+            'max_drift': float(peaks['max_drift_displacement'][j]) / height,
+            'max_displacement': float(peaks['max_displacement'][j]),
+            'max_velocity': float(peaks['max_velocity'][j]),
+            'max_acceleration': float(peaks['max_acceleration'][j]),
+            'max_base_shear': float(peaks['max_base_shear'][j]),
+            'critical_step': {
+                'index': i_crit,
+                'time': float(i_crit * dt),
+                'roof_displacement': float(peaks['control_peak'][j]),
+                'base_shear': float(peaks['base_shear_critical'][j])
+            }
+        })
+
+    drifts = np.array([row['max_drift'] for row in table])
+    shears = np.array([row['max_base_shear'] for row in table])
+    return {
+        'records': table,
+        'n_records': len(table),
+        'n_workers': int(peaks['n_workers']),
+        # Con almeno 7 record si possono usare gli effetti medi (NTC §7.3.5)
+        'mean_max_drift': float(drifts.mean()),
+        'max_max_drift': float(drifts.max()),
+        'mean_max_base_shear': float(shears.mean()),
+        'max_max_base_shear': float(shears.max()),
+        'rayleigh': {'alpha0': float(alpha0), 'alpha1': float(alpha1)}
+    }
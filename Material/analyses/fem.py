@@ -1,18 +1,348 @@
 # analyses/fem.py
 import numpy as np
 import logging
-from typing import Dict, List, Tuple, Optional
-from scipy.sparse import lil_matrix, csr_matrix
-from scipy.sparse.linalg import spsolve
+from collections.abc import Mapping
+from typing import Callable, Dict, List, Tuple, Optional, Sequence
+from scipy.sparse import csr_matrix, coo_matrix, diags
 from dataclasses import dataclass
 from ..materials import MaterialProperties
 from ..constitutive import ConstitutiveModel
 from ..enums import ConstitutiveLaw
 from ..geometry import GeometryPier  # Usato per esempio, ma adattabile
 from ..utils import logger  # Assumi logger da utils
+from ..utils import split_q4_elements
+from .solvers import LinearSolver, mark_modified, matrix_version
+from .nonlinear import NonlinearOptions, NonlinearSolver
 
 logger = logging.getLogger(__name__)
 
+# Quadratura di Gauss 2x2 per Q4 (stesso ordine di FEMElement.element_stiffness)
+Q4_GAUSS_POINTS = np.array([
+    [-1/np.sqrt(3), -1/np.sqrt(3)],
+    [1/np.sqrt(3), -1/np.sqrt(3)],
+    [1/np.sqrt(3), 1/np.sqrt(3)],
+    [-1/np.sqrt(3), 1/np.sqrt(3)]
+])
+Q4_GAUSS_WEIGHTS = np.ones(4)
+
+
+def q4_reference_derivatives(points: np.ndarray = Q4_GAUSS_POINTS) -> np.ndarray:
+    """
+    Derivate delle funzioni di forma Q4 sul quadrato di riferimento.
+    
+    Returns:
+        Array (n_gp, 2, 4): [g, 0] = dN/dxi, [g, 1] = dN/deta
+    """
+    xi = points[:, 0][:, None]
+    eta = points[:, 1][:, None]
+    sx = np.array([-1.0, 1.0, 1.0, -1.0])
+    sy = np.array([-1.0, -1.0, 1.0, 1.0])
+    dN_dxi = 0.25 * sx * (1 + sy * eta)
+    dN_deta = 0.25 * sy * (1 + sx * xi)
+    return np.stack([dN_dxi, dN_deta], axis=1)
+
+
+def q4_shape_functions(points: np.ndarray) -> np.ndarray:
+    """Funzioni di forma Q4 nei punti di riferimento: array (n_pt, 4)"""
+    xi = points[:, 0][:, None]
+    eta = points[:, 1][:, None]
+    sx = np.array([-1.0, 1.0, 1.0, -1.0])
+    sy = np.array([-1.0, -1.0, 1.0, 1.0])
+    return 0.25 * (1 + sx * xi) * (1 + sy * eta)
+
+
+# Valutate una sola volta per il quadrilatero di riferimento
+_Q4_DN_REF = q4_reference_derivatives()
+Q4_CENTROID = np.zeros((1, 2))
+
+
+def q4_batch_kinematics(coords: np.ndarray,
+                        dN_ref: np.ndarray = _Q4_DN_REF) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Matrici B e determinanti jacobiani per un blocco di elementi Q4.
+    
+    Args:
+        coords: Coordinate nodali (n_elem, 4, 2)
+        dN_ref: Derivate di riferimento (n_gp, 2, 4)
+        
+    Returns:
+        B (n_elem, n_gp, 3, 8), detJ (n_elem, n_gp)
+    """
+    # J[e, g, a, b] = sum_n dN_a(g)[n] * x_b[e, n]
+    J = np.einsum('gan,enb->egab', dN_ref, coords)
+    detJ = np.linalg.det(J)
+    if np.any(detJ <= 0):
+        bad = np.argwhere(detJ <= 0)[0]
+        raise ValueError(f"Jacobian determinant non-positive: {detJ[tuple(bad)]} "
+                         f"(elemento {bad[0]})")
+    invJ = np.linalg.inv(J)
+    # [dN/dx, dN/dy] = invJ @ [dN/dxi, dN/deta]
+    dN_xy = np.einsum('egab,gbn->egan', invJ, dN_ref)
+    
+    n_elem, n_gp = detJ.shape
+    B = np.zeros((n_elem, n_gp, 3, 8))
+    B[:, :, 0, 0::2] = dN_xy[:, :, 0]  # epsilon_x = du/dx
+    B[:, :, 1, 1::2] = dN_xy[:, :, 1]  # epsilon_y = dv/dy
+    B[:, :, 2, 0::2] = dN_xy[:, :, 1]  # gamma_xy = du/dy + dv/dx
+    B[:, :, 2, 1::2] = dN_xy[:, :, 0]
+    return B, detJ
+
+
+def plane_stress_D(E: np.ndarray, nu: np.ndarray) -> np.ndarray:
+    """Matrici costitutive di piano stress per array di moduli (..., 3, 3)"""
+    E = np.asarray(E, dtype=float)
+    nu = np.asarray(nu, dtype=float)
+    c = E / (1 - nu**2)
+    D = np.zeros(E.shape + (3, 3))
+    D[..., 0, 0] = c
+    D[..., 1, 1] = c
+    D[..., 0, 1] = c * nu
+    D[..., 1, 0] = c * nu
+    D[..., 2, 2] = c * (1 - nu) / 2
+    return D
+
+
+def graded_axis(length: float, n: int, edges: Optional[List[float]] = None,
+                refine_levels: int = 0, grading: float = 0.5) -> np.ndarray:
+    """
+    Coordinate di una direzione della griglia strutturata.
+
+    Senza raffinamento restituisce n intervalli uniformi. Con refine_levels > 0
+    le linee di griglia vengono allineate ai bordi delle aperture (edges) e
+    infittite geometricamente verso di essi: a distanza h*grading^k, k=1..levels,
+    con h passo della griglia uniforme.
+    """
+    coords = np.linspace(0.0, length, n + 1)
+    if refine_levels <= 0 or not edges:
+        return coords
+
+    h = length / n
+    edges = np.asarray(edges, dtype=float)
+    edges = edges[(edges > 0.0) & (edges < length)]
+    offsets = h * grading ** np.arange(1, refine_levels + 1)
+    extra = (edges[:, None] + np.concatenate([-offsets, offsets])[None, :]).ravel()
+    extra = extra[(extra > 0.0) & (extra < length)]
+
+    coords = np.sort(np.concatenate([coords, edges, extra]))
+    # Elimina linee quasi coincidenti (conserva gli estremi e i bordi)
+    tol = 1e-9 * max(length, 1.0) + 0.5 * h * grading ** refine_levels
+    keep = np.ones(coords.size, dtype=bool)
+    fixed = np.isclose(coords[:, None], np.concatenate([[0.0, length], edges])[None, :],
+                       atol=1e-12).any(axis=1)
+    last = 0
+    for i in range(1, coords.size):
+        if coords[i] - coords[last] < tol:
+            if fixed[i] and not fixed[last]:
+                keep[last] = False
+                last = i
+            else:
+                keep[i] = False
+        else:
+            last = i
+    return coords[keep]
+
+
+def structured_q4_mesh(x: np.ndarray, y: np.ndarray,
+                       openings: Optional[List[Dict]] = None) -> Dict:
+    """
+    Mesh Q4 strutturata su griglia tensoriale x × y con rimozione delle aperture.
+
+    Le celle che si sovrappongono a un'apertura sono scartate con un'unica
+    maschera; i nodi non usati da alcun elemento vengono rimossi e i
+    rimanenti rinumerati in modo contiguo (ordine riga per riga).
+
+    Returns:
+        Dict con 'coords' (n_nodes, 2), 'connectivity' (n_elem, 4) in ordine
+        antiorario, 'grid' (ny+1, nx+1) con l'indice compattato di ogni nodo
+        della griglia (-1 se rimosso) e 'cell_mask' (ny, nx).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    nx, ny = x.size - 1, y.size - 1
+
+    # Maschera delle celle attive: nessuna sovrapposizione con le aperture
+    active = np.ones((ny, nx), dtype=bool)
+    if openings:
+        ops = np.array([[op['x_start'], op['x_end'], op['y_start'], op['y_end']]
+                        for op in openings], dtype=float)
+        x0, x1 = x[:-1], x[1:]
+        y0, y1 = y[:-1], y[1:]
+        overlap_x = (x0[None, :] < ops[:, 1:2]) & (x1[None, :] > ops[:, 0:1])  # (n_op, nx)
+        overlap_y = (y0[None, :] < ops[:, 3:4]) & (y1[None, :] > ops[:, 2:3])  # (n_op, ny)
+        active = ~(overlap_y[:, :, None] & overlap_x[:, None, :]).any(axis=0)
+
+    # Connettività sulla numerazione completa della griglia
+    full_ids = np.arange((ny + 1) * (nx + 1)).reshape(ny + 1, nx + 1)
+    conn = np.stack([full_ids[:-1, :-1], full_ids[:-1, 1:],
+                     full_ids[1:, 1:], full_ids[1:, :-1]], axis=-1)[active]
+
+    # Compattazione: solo i nodi referenziati dagli elementi
+    used = np.zeros(full_ids.size, dtype=bool)
+    used[conn.ravel()] = True
+    new_ids = np.full(full_ids.size, -1, dtype=np.int64)
+    new_ids[used] = np.arange(int(used.sum()))
+
+    X, Y = np.meshgrid(x, y)
+    coords = np.column_stack([X.ravel(), Y.ravel()])[used]
+
+    return {
+        'coords': coords,
+        'connectivity': new_ids[conn],
+        'grid': new_ids.reshape(ny + 1, nx + 1),
+        'cell_mask': active
+    }
+
+def principal_stresses(stress: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Tensioni principali di piano per array (..., 3) [sigma_x, sigma_y, tau_xy].
+    
+    Returns:
+        sigma_1 (massima), sigma_2 (minima) e angolo della direzione di
+        sigma_1 rispetto all'asse x [rad]
+    """
+    sx, sy, txy = stress[..., 0], stress[..., 1], stress[..., 2]
+    center = 0.5 * (sx + sy)
+    radius = np.sqrt((0.5 * (sx - sy))**2 + txy**2)
+    theta = 0.5 * np.arctan2(2 * txy, sx - sy)
+    return center + radius, center - radius, theta
+
+
+def von_mises_stress(stress: np.ndarray) -> np.ndarray:
+    """Tensione equivalente di von Mises in stato piano per array (..., 3)"""
+    sx, sy, txy = stress[..., 0], stress[..., 1], stress[..., 2]
+    return np.sqrt(sx**2 - sx * sy + sy**2 + 3 * txy**2)
+
+
+def spr_nodal_values(node_coords: np.ndarray, connectivity: np.ndarray,
+                     point_coords: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Recupero nodale per patch (superconvergent patch recovery, Zienkiewicz-Zhu).
+    
+    Per ogni nodo si interpolano ai minimi quadrati, con un polinomio lineare
+    in (x, y), i valori ai punti di valutazione degli elementi che lo
+    condividono; il valore nodale è il polinomio valutato nel nodo.
+    Tutte le patch sono assemblate e risolte in blocco.
+    
+    Args:
+        node_coords: Coordinate nodali (n_nodes, 2)
+        connectivity: Connettività in indici di riga (n_elem, 4)
+        point_coords: Coordinate dei punti di valutazione (n_elem, n_pt, 2)
+        values: Valori ai punti (n_elem, n_pt, n_comp)
+        
+    Returns:
+        Valori nodali (n_nodes, n_comp)
+    """
+    n_nodes = len(node_coords)
+    n_elem, n_pt, n_comp = values.shape
+    # Scala caratteristica per il condizionamento delle patch
+    span = np.ptp(node_coords, axis=0).max() if n_nodes else 1.0
+    h = max(span / max(np.sqrt(n_elem), 1.0), 1e-12)
+    
+    # Contributi (elemento, nodo locale, punto): polinomio relativo al nodo
+    d = (point_coords[:, None, :, :] - node_coords[connectivity][:, :, None, :]) / h
+    P = np.concatenate([np.ones(d.shape[:-1] + (1,)), d], axis=-1)   # (e, 4, p, 3)
+    PtP = np.einsum('eapi,eapj->eaij', P, P).reshape(-1, 9)
+    Ptv = np.einsum('eapi,epc->eaic', P, values).reshape(-1, 3 * n_comp)
+    
+    idx = connectivity.ravel()
+    A = np.zeros((n_nodes, 9))
+    b = np.zeros((n_nodes, 3 * n_comp))
+    np.add.at(A, idx, PtP)
+    np.add.at(b, idx, Ptv)
+    A = A.reshape(n_nodes, 3, 3)
+    b = b.reshape(n_nodes, 3, n_comp)
+    
+    # Patch degeneri (es. punti allineati): media semplice
+    used = np.bincount(idx, minlength=n_nodes) > 0
+    cond_ok = used.copy()
+    cond_ok[used] = np.linalg.cond(A[used]) < 1e10
+    result = np.zeros((n_nodes, n_comp))
+    if np.any(cond_ok):
+        result[cond_ok] = np.linalg.solve(A[cond_ok], b[cond_ok])[:, 0, :]
+    fallback = used & ~cond_ok
+    if np.any(fallback):
+        counts = A[fallback, 0, 0]
+        result[fallback] = b[fallback, 0, :] / counts[:, None]
+    return result
+
+
+class StressField:
+    """
+    Campo di tensioni per elemento e punto di valutazione (array).
+    
+    stress/strain hanno forma (n_elem, n_pt, 3) con componenti
+    [sigma_x, sigma_y, tau_xy] / [eps_x, eps_y, gamma_xy]; tensioni
+    principali, direzioni e von Mises sono calcolate in blocco. I valori
+    nodali (recupero SPR) sono un campo derivato calcolato al primo accesso.
+    """
+    
+    def __init__(self, node_coords: np.ndarray, connectivity: np.ndarray,
+                 point_coords: np.ndarray, strain: np.ndarray, stress: np.ndarray):
+        self.node_coords = node_coords
+        self.connectivity = connectivity
+        self.point_coords = point_coords
+        self.strain = strain
+        self.stress = stress
+        self.sigma_1, self.sigma_2, self.principal_angle = principal_stresses(stress)
+        self.von_mises = von_mises_stress(stress)
+        self._nodal: Optional[Dict] = None
+    
+    @property
+    def n_elements(self) -> int:
+        return self.stress.shape[0]
+    
+    @property
+    def element_stress(self) -> np.ndarray:
+        """Tensioni medie per elemento (n_elem, 3)"""
+        return self.stress.mean(axis=1)
+    
+    @property
+    def nodal(self) -> Dict:
+        """Campo nodale mediato per patch: 'stress' (n_nodes, 3) e derivati"""
+        if self._nodal is None:
+            stress_n = spr_nodal_values(self.node_coords, self.connectivity,
+                                        self.point_coords, self.stress)
+            s1, s2, theta = principal_stresses(stress_n)
+            self._nodal = {
+                'stress': stress_n,
+                'sigma_1': s1,
+                'sigma_2': s2,
+                'principal_angle': theta,
+                'von_mises': von_mises_stress(stress_n)
+            }
+        return self._nodal
+    
+    def to_dict(self, nodal: bool = False) -> Dict:
+        """Array per esportazione (GUI, report); nodal=True include il campo SPR"""
+        data = {
+            'point_coords': self.point_coords,
+            'stress': self.stress,
+            'strain': self.strain,
+            'sigma_1': self.sigma_1,
+            'sigma_2': self.sigma_2,
+            'principal_angle': self.principal_angle,
+            'von_mises': self.von_mises
+        }
+        if nodal:
+            data['nodal'] = self.nodal
+        return data
+    
+    def to_records(self) -> List[Dict]:
+        """Formato storico: un dict per elemento con valori al primo punto"""
+        s = self.stress[:, 0]
+        e = self.strain[:, 0]
+        vm = self.von_mises[:, 0]
+        return [{
+            'element_id': i,
+            'sigma_x': float(s[i, 0]),
+            'sigma_y': float(s[i, 1]),
+            'tau_xy': float(s[i, 2]),
+            'von_mises': float(vm[i]),
+            'strain_x': float(e[i, 0]),
+            'strain_y': float(e[i, 1]),
+            'gamma_xy': float(e[i, 2])
+        } for i in range(self.n_elements)]
+
 @dataclass
 class FEMElement:
     """Elemento FEM quadrilatero Q4 con supporto non lineare"""
@@ -185,147 +515,725 @@ class FEMElement:
         
         return f_int
 
+class ConstraintHandler:
+    """
+    Vincoli nodali per eliminazione dei DOF (o, in alternativa, penalità).
+    
+    Gli indici dei DOF liberi/vincolati sono calcolati una sola volta; K_ff
+    si estrae per slicing della CSR e, finché il pattern di K non cambia,
+    viene riutilizzata aggiornando solo il suo array dei dati.
+    
+    I vincoli lineari tra DOF (ties: slave -> [(master, coeff)], es. nodi
+    sospesi della mesh adattiva) sono eliminati con una trasformazione
+    u = T u_f: K_ff = T^T K T, F_f = T^T F.
+    """
+    
+    def __init__(self, n_dof: int, fixed_dofs: np.ndarray,
+                 method: str = 'elimination', penalty: float = 1e12,
+                 ties: Optional[Dict[int, List[Tuple[int, float]]]] = None):
+        if method not in ('elimination', 'penalty'):
+            raise ValueError(f"Metodo vincoli non riconosciuto: {method}")
+        if ties and method != 'elimination':
+            raise ValueError("I vincoli tra DOF (nodi sospesi) richiedono il metodo 'elimination'")
+        self.n_dof = n_dof
+        self.method = method
+        self.penalty = penalty
+        self.fixed = np.unique(np.asarray(fixed_dofs, dtype=np.int64))
+        free_mask = np.ones(n_dof, dtype=bool)
+        free_mask[self.fixed] = False
+        if ties:
+            free_mask[np.fromiter(ties.keys(), dtype=np.int64)] = False
+        self.free = np.flatnonzero(free_mask)
+        self.T = self._transformation(ties) if ties else None
+        self._K_ff: Optional[csr_matrix] = None
+        self._K_source: Optional[csr_matrix] = None
+        self._data_map: Optional[np.ndarray] = None
+        self._source_nnz = 0
+        self._source_version = 0
+        self._pattern: Optional[Dict] = None  # pattern di assemblaggio di riferimento
+    
+    @property
+    def n_free(self) -> int:
+        return len(self.free)
+    
+    def _transformation(self, ties: Dict[int, List[Tuple[int, float]]]) -> csr_matrix:
+        """Matrice T (n_dof, n_free); i master a loro volta vincolati sono risolti ricorsivamente"""
+        column = np.full(self.n_dof, -1, dtype=np.int64)
+        column[self.free] = np.arange(len(self.free))
+        fixed = set(self.fixed.tolist())
+        
+        def resolve(dof: int, coeff: float, depth: int = 0):
+            if dof in ties:
+                if depth > 32:
+                    raise ValueError(f"Vincoli tra DOF ciclici sul DOF {dof}")
+                for master, c in ties[dof]:
+                    yield from resolve(master, coeff * c, depth + 1)
+            elif dof not in fixed:
+                yield column[dof], coeff
+        
+        rows, cols, vals = list(self.free), list(range(len(self.free))), [1.0] * len(self.free)
+        for slave in ties:
+            for col, coeff in resolve(slave, 1.0):
+                rows.append(slave)
+                cols.append(col)
+                vals.append(coeff)
+        return coo_matrix((vals, (rows, cols)), shape=(self.n_dof, len(self.free))).tocsr()
+    
+    def reduce_matrix(self, K: csr_matrix) -> csr_matrix:
+        """Estrae K_ff; riusa la struttura se K ha lo stesso pattern dell'ultima chiamata"""
+        if self.T is not None:
+            if self._K_ff is None or K is not self._K_source \
+                    or matrix_version(K) != self._source_version:
+                self._K_ff = (self.T.T @ K @ self.T).tocsr()
+                self._K_source = K
+                self._source_version = matrix_version(K)
+            return self._K_ff
+        
+        if (self._K_ff is not None and K is self._K_source
+                and self._data_map is not None and len(K.data) == self._source_nnz):
+            if matrix_version(K) != self._source_version:
+                self._K_ff.data[:] = K.data[self._data_map]
+                self._source_version = matrix_version(K)
+                mark_modified(self._K_ff)
+            return self._K_ff
+        
+        K = K.tocsr()
+        # Slicing di una copia con dati = posizione+1 per ricavare la mappa
+        # dati(K) -> dati(K_ff) da riusare nelle chiamate successive
+        tracer = csr_matrix((np.arange(1, K.nnz + 1, dtype=float), K.indices, K.indptr),
+                            shape=K.shape)
+        tracer_ff = tracer[self.free][:, self.free].tocsr()
+        self._data_map = tracer_ff.data.astype(np.int64) - 1
+        self._K_ff = csr_matrix((K.data[self._data_map], tracer_ff.indices, tracer_ff.indptr),
+                                shape=tracer_ff.shape)
+        self._K_source = K
+        self._source_nnz = len(K.data)
+        self._source_version = matrix_version(K)
+        return self._K_ff
+    
+    def reduce_vector(self, F: np.ndarray) -> np.ndarray:
+        if self.T is not None:
+            return self.T.T @ F
+        return F[self.free]
+    
+    def restrict(self, u: np.ndarray) -> np.ndarray:
+        """Componenti libere di un vettore completo (es. stima iniziale)"""
+        return u[self.free]
+    
+    def expand(self, u_f: np.ndarray) -> np.ndarray:
+        """Vettore (o matrice di vettori) completo con zeri sui DOF vincolati"""
+        if self.T is not None:
+            return self.T @ u_f
+        u = np.zeros((self.n_dof,) + np.shape(u_f)[1:])
+        u[self.free] = u_f
+        return u
+    
+    def apply_penalty(self, K: csr_matrix, F: np.ndarray) -> Tuple[csr_matrix, np.ndarray]:
+        """Metodo della penalità senza conversioni LIL"""
+        p = np.zeros(self.n_dof)
+        p[self.fixed] = self.penalty
+        F_mod = F.copy()
+        F_mod[self.fixed] = 0
+        return (K + diags(p, format='csr')).tocsr(), F_mod
+
+
+class FEMMesh:
+    """
+    Contenitore compatto della mesh Q4.
+    
+    Coordinate (n_nodes, 2), connettività (n_elem, 4) in indici di riga,
+    DOF per elemento (n_elem, 8) e, per elemento, indici di materiale e
+    legame nelle tabelle `materials`/`laws`. I modelli costitutivi (con
+    stato) sono creati solo per gli elementi che li richiedono.
+    Gli inserimenti singoli sono accumulati e consolidati in blocco al
+    primo accesso agli array.
+    """
+    
+    def __init__(self):
+        self._node_ids = np.empty(0, dtype=np.int64)
+        self._coords = np.empty((0, 2))
+        self._connectivity = np.empty((0, 4), dtype=np.int64)
+        self._material_ids = np.empty(0, dtype=np.int64)
+        self._law_ids = np.empty(0, dtype=np.int64)
+        self._thickness = np.empty(0)
+        self.materials: List[MaterialProperties] = []
+        self.laws: List[ConstitutiveLaw] = []
+        self._models: Dict[int, ConstitutiveModel] = {}
+        self._pending_nodes: List[Tuple] = []
+        self._pending_elements: List[Tuple] = []
+        self._row_of: Dict[int, int] = {}  # id nodo -> riga
+        self._elem_dofs: Optional[np.ndarray] = None
+        self.version = 0  # incrementato ad ogni modifica della topologia
+    
+    # --- accesso agli array ---------------------------------------------
+    
+    @property
+    def node_ids(self) -> np.ndarray:
+        self._flush()
+        return self._node_ids
+    
+    @property
+    def coords(self) -> np.ndarray:
+        self._flush()
+        return self._coords
+    
+    @property
+    def connectivity(self) -> np.ndarray:
+        self._flush()
+        return self._connectivity
+    
+    @property
+    def material_ids(self) -> np.ndarray:
+        self._flush()
+        return self._material_ids
+    
+    @property
+    def law_ids(self) -> np.ndarray:
+        self._flush()
+        return self._law_ids
+    
+    @property
+    def thickness(self) -> np.ndarray:
+        self._flush()
+        return self._thickness
+    
+    @property
+    def n_nodes(self) -> int:
+        return len(self._row_of)
+    
+    @property
+    def n_elements(self) -> int:
+        return len(self._connectivity) + len(self._pending_elements)
+    
+    @property
+    def elem_dofs(self) -> np.ndarray:
+        """DOF globali (n_elem, 8): numerazione per id nodo crescente, (ux, uy) per nodo"""
+        self._flush()
+        if self._elem_dofs is None:
+            rank = np.empty(len(self._node_ids), dtype=np.int64)
+            rank[np.argsort(self._node_ids, kind='stable')] = np.arange(len(self._node_ids))
+            node_dofs = 2 * rank[self._connectivity]
+            self._elem_dofs = np.stack([node_dofs, node_dofs + 1], axis=-1).reshape(-1, 8)
+        return self._elem_dofs
+    
+    def elem_coords(self) -> np.ndarray:
+        """Coordinate dei nodi di ogni elemento (n_elem, 4, 2)"""
+        return self.coords[self.connectivity]
+    
+    # --- costruzione -----------------------------------------------------
+    
+    def add_nodes(self, node_ids: Sequence[int], coords: np.ndarray) -> None:
+        """Aggiunge (o ridefinisce) nodi in blocco"""
+        node_ids = np.asarray(node_ids, dtype=np.int64).ravel()
+        coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        self._flush()
+        new = np.array([int(n) not in self._row_of for n in node_ids], dtype=bool)
+        for n, xy in zip(node_ids[~new], coords[~new]):
+            self._coords[self._row_of[int(n)]] = xy  # stessa semantica del dict storico
+        if np.any(new):
+            start = len(self._node_ids)
+            self._row_of.update(zip(node_ids[new].tolist(), range(start, start + int(new.sum()))))
+            self._node_ids = np.concatenate([self._node_ids, node_ids[new]])
+            self._coords = np.concatenate([self._coords, coords[new]])
+            self._touch()
+    
+    def add_node(self, node_id: int, x: float, y: float) -> None:
+        node_id = int(node_id)
+        if node_id in self._row_of:
+            self._flush()
+            self._coords[self._row_of[node_id]] = (x, y)
+            return
+        self._row_of[node_id] = len(self._row_of)
+        self._pending_nodes.append((node_id, x, y))
+        self._touch()
+    
+    def add_elements(self, node_ids: np.ndarray, material: MaterialProperties,
+                     law: ConstitutiveLaw = ConstitutiveLaw.LINEAR,
+                     thickness: float = 1.0) -> None:
+        """Aggiunge in blocco elementi Q4 (node_ids di forma (m, 4)) con stesse proprietà"""
+        node_ids = np.asarray(node_ids, dtype=np.int64).reshape(-1, 4)
+        self._flush()
+        rows = self.rows_of(node_ids)
+        m = len(rows)
+        self._connectivity = np.concatenate([self._connectivity, rows])
+        self._material_ids = np.concatenate(
+            [self._material_ids, np.full(m, self._table_index(self.materials, material))])
+        self._law_ids = np.concatenate(
+            [self._law_ids, np.full(m, self._table_index(self.laws, law))])
+        self._thickness = np.concatenate([self._thickness, np.full(m, float(thickness))])
+        self._touch()
+    
+    def add_element(self, node_ids: Sequence[int], material: MaterialProperties,
+                    law: ConstitutiveLaw, thickness: float,
+                    model: Optional[ConstitutiveModel] = None) -> int:
+        """Aggiunge un elemento (accumulato); restituisce il suo indice"""
+        index = self.n_elements
+        self._pending_elements.append((tuple(int(n) for n in node_ids), material, law, thickness))
+        if model is not None:
+            self._models[index] = model
+        self._touch()
+        return index
+    
+    def set_elements(self, connectivity: np.ndarray, material_ids: np.ndarray,
+                     law_ids: np.ndarray, thickness: np.ndarray) -> None:
+        """Sostituisce tutti gli elementi (connettività in indici di riga); azzera lo stato costitutivo"""
+        self._flush()
+        self._connectivity = np.asarray(connectivity, dtype=np.int64).reshape(-1, 4)
+        self._material_ids = np.asarray(material_ids, dtype=np.int64)
+        self._law_ids = np.asarray(law_ids, dtype=np.int64)
+        self._thickness = np.asarray(thickness, dtype=float)
+        self._models = {}
+        self._touch()
+    
+    def rows_of(self, node_ids: np.ndarray) -> np.ndarray:
+        """Indici di riga per id nodo (array di qualunque forma)"""
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        try:
+            return np.fromiter((self._row_of[n] for n in node_ids.ravel().tolist()),
+                               dtype=np.int64, count=node_ids.size).reshape(node_ids.shape)
+        except KeyError as e:
+            raise ValueError(f"Nodo {e.args[0]} non definito")
+    
+    def has_node(self, node_id: int) -> bool:
+        return int(node_id) in self._row_of
+    
+    def node_coords(self, node_id: int) -> np.ndarray:
+        return self.coords[self._row_of[int(node_id)]]
+    
+    # --- proprietà per elemento -------------------------------------------
+    
+    def constitutive_model(self, e: int) -> ConstitutiveModel:
+        """Modello costitutivo (con stato) dell'elemento e, creato al primo uso"""
+        model = self._models.get(e)
+        if model is None:
+            material = self.materials[self.material_ids[e]]
+            model = material.get_constitutive_law(self.laws[self.law_ids[e]])
+            self._models[e] = model
+        return model
+    
+    def element(self, e: int) -> 'FEMElement':
+        """Vista FEMElement dell'elemento e (condivide il modello costitutivo)"""
+        elem = FEMElement.__new__(FEMElement)
+        elem.nodes = self.node_ids[self.connectivity[e]].tolist()
+        elem.material = self.materials[self.material_ids[e]]
+        elem.constitutive_law = self.laws[self.law_ids[e]]
+        elem.thickness = float(self.thickness[e])
+        elem._model = self.constitutive_model(e)
+        return elem
+    
+    # --- interni ---------------------------------------------------------
+    
+    @staticmethod
+    def _table_index(table: List, item) -> int:
+        for i, existing in enumerate(table):
+            if existing is item:
+                return i
+        table.append(item)
+        return len(table) - 1
+    
+    def _touch(self) -> None:
+        self._elem_dofs = None
+        self.version += 1
+    
+    def _flush(self) -> None:
+        """Consolida gli inserimenti singoli negli array"""
+        if self._pending_nodes:
+            ids, xs, ys = zip(*self._pending_nodes)
+            self._pending_nodes = []
+            self._node_ids = np.concatenate([self._node_ids, np.array(ids, dtype=np.int64)])
+            self._coords = np.concatenate([self._coords, np.column_stack([xs, ys])])
+        if self._pending_elements:
+            pending, self._pending_elements = self._pending_elements, []
+            conn = np.array([p[0] for p in pending], dtype=np.int64).reshape(-1, 4)
+            self._connectivity = np.concatenate([self._connectivity, self.rows_of(conn)])
+            self._material_ids = np.concatenate([self._material_ids, np.array(
+                [self._table_index(self.materials, p[1]) for p in pending], dtype=np.int64)])
+            self._law_ids = np.concatenate([self._law_ids, np.array(
+                [self._table_index(self.laws, p[2]) for p in pending], dtype=np.int64)])
+            self._thickness = np.concatenate([self._thickness,
+                                              np.array([p[3] for p in pending], dtype=float)])
+    
+    def __getstate__(self):
+        self._flush()
+        return self.__dict__.copy()
+
+
+class _NodeView(Mapping):
+    """Vista dict-like id nodo -> coordinate sopra FEMMesh (compatibilità)"""
+    
+    def __init__(self, mesh: FEMMesh):
+        self._mesh = mesh
+    
+    def __getitem__(self, node_id) -> np.ndarray:
+        if not self._mesh.has_node(node_id):
+            raise KeyError(node_id)
+        return self._mesh.node_coords(node_id)
+    
+    def __contains__(self, node_id) -> bool:
+        return self._mesh.has_node(node_id)
+    
+    def __iter__(self):
+        return iter(self._mesh.node_ids.tolist())
+    
+    def __len__(self) -> int:
+        return self._mesh.n_nodes
+
+
 class FEMModel:
     """Modello FEM 2D completo con supporto non lineare"""
     def __init__(self):
-        self.nodes: Dict[int, np.ndarray] = {}  # id -> [x, y]
-        self.elements: List[FEMElement] = []
+        self.mesh = FEMMesh()  # nodi ed elementi come array
+        self._elements_view: Optional[Tuple[FEMElement, ...]] = None
+        self._elements_version = -1
         self.constraints: List[Dict] = []  # {'node': id, 'dofs': [0,1] for ux,uy}
         self.loads: Dict[int, np.ndarray] = {}  # node_id -> [Fx, Fy]
         self.K_global: csr_matrix = None
         self.dof_map: Dict[int, Tuple[int, int]] = {}  # node_id -> (dof_x, dof_y)
+        self._assembly_pattern: Optional[Dict] = None  # cache topologia per assemblaggio COO
+        self.use_batch_kernel: bool = True  # False: calcolo per elemento (verifica)
+        self.constraint_method: str = 'elimination'  # 'elimination' o 'penalty'
+        self._constraint_handler: Optional[ConstraintHandler] = None
+        self.linear_solver = LinearSolver(ordering='amd')  # riuso fattorizzazioni, DOF riordinati
+        self._K_is_initial = False  # K_global assemblata con u=None
+        self.last_nonlinear_report: Optional[Dict] = None
+        self.mesh_grid: Optional[Dict] = None  # linee di griglia dell'ultima generate_mesh
+        self.hanging_nodes: Dict[int, Tuple[int, int]] = {}  # nodo sospeso -> estremi del lato
+        self._edge_midpoints: Dict[Tuple[int, int], int] = {}  # (riga a, riga b) -> riga medio
+        self.adaptive_history: List[Dict] = []
         self._setup_dof_mapping()
     
+    @property
+    def nodes(self) -> Mapping:
+        """
+        Nodi come mappa id -> [x, y] (vista di sola lettura sugli array della
+        mesh): i nodi si aggiungono con add_node.
+        """
+        return _NodeView(self.mesh)
+    
+    @property
+    def elements(self) -> Tuple[FEMElement, ...]:
+        """
+        Elementi come tupla di FEMElement (viste create su richiesta, di sola
+        lettura): gli elementi si aggiungono con add_element, che li
+        inserisce nella mesh.
+        """
+        if self._elements_view is None or self._elements_version != self.mesh.version:
+            self._elements_view = tuple(self.mesh.element(e) for e in range(self.mesh.n_elements))
+            self._elements_version = self.mesh.version
+        return self._elements_view
+    
     def _setup_dof_mapping(self):
         """Inizializza la mappatura DOF - ricostruisce sempre per sincronizzazione"""
-        if self.nodes:
+        if self.mesh.n_nodes:
             # Ricostruisci sempre per garantire consistenza con i nodi attuali
-            self.dof_map = {}
-            for i, node_id in enumerate(sorted(self.nodes.keys())):
-                self.dof_map[int(node_id)] = (2*i, 2*i + 1)
+            ids = np.sort(self.mesh.node_ids).tolist()
+            self.dof_map = {node_id: (2*i, 2*i + 1) for i, node_id in enumerate(ids)}
     
     def add_node(self, node_id: int, x: float, y: float):
-        self.nodes[int(node_id)] = np.array([x, y])
+        self.mesh.add_node(node_id, x, y)
+        self._assembly_pattern = None  # topologia cambiata
         # dof_map viene ricostruito in assemble_global_stiffness
     
     def add_element(self, elem: FEMElement):
         # Verifica che tutti i nodi esistano
         for node_id in elem.nodes:
-            if int(node_id) not in self.nodes:
+            if not self.mesh.has_node(node_id):
                 raise ValueError(f"Nodo {node_id} non definito")
-        self.elements.append(elem)
+        self.mesh.add_element(elem.nodes, elem.material, elem.constitutive_law,
+                              elem.thickness, model=elem._model)
+        self._assembly_pattern = None  # topologia cambiata
     
     def add_constraint(self, node_id: int, dofs: List[int]):
-        if int(node_id) not in self.nodes:
+        if not self.mesh.has_node(node_id):
             raise ValueError(f"Nodo {node_id} non definito per vincolo")
         self.constraints.append({'node': int(node_id), 'dofs': dofs})
+        self._constraint_handler = None
     
     def add_load(self, node_id: int, Fx: float = 0.0, Fy: float = 0.0):
-        if int(node_id) not in self.nodes:
+        if not self.mesh.has_node(node_id):
             raise ValueError(f"Nodo {node_id} non definito per carico")
         self.loads[int(node_id)] = np.array([Fx, Fy])
     
     def generate_mesh(self, wall_data: Dict, material: MaterialProperties, 
-                     n_x: int = 10, n_y: int = 5, law: ConstitutiveLaw = ConstitutiveLaw.LINEAR):
-        """Genera mesh rettangolare semplice per parete, con handling aperture"""
+                     n_x: int = 10, n_y: int = 5, law: ConstitutiveLaw = ConstitutiveLaw.LINEAR,
+                     refine_openings: int = 0, grading: float = 0.5):
+        """
+        Genera mesh rettangolare strutturata per parete, con handling aperture.
+
+        Args:
+            refine_openings: Livelli di raffinamento graduato verso i bordi
+                             (e quindi gli spigoli) delle aperture; 0 = griglia uniforme
+            grading: Rapporto geometrico tra livelli successivi (0 < grading < 1)
+        """
         length = wall_data.get('length', 5.0)
         height = wall_data.get('height', 3.0)
         thickness = wall_data.get('thickness', 0.3)
         openings = wall_data.get('openings', [])  # Lista di {'x_start':, 'x_end':, 'y_start':, 'y_end':}
+
+        x_edges = [v for op in openings for v in (op['x_start'], op['x_end'])]
+        y_edges = [v for op in openings for v in (op['y_start'], op['y_end'])]
+        x = graded_axis(length, n_x, x_edges, refine_openings, grading)
+        y = graded_axis(height, n_y, y_edges, refine_openings, grading)
+
+        mesh = structured_q4_mesh(x, y, openings)
+
+        # Inserimento in blocco negli array della mesh
+        base = int(self.mesh.node_ids.max()) + 1 if self.mesh.n_nodes else 0
+        self.mesh.add_nodes(base + np.arange(len(mesh['coords'])), mesh['coords'])
+        self.mesh.add_elements(base + mesh['connectivity'], material, law, thickness)
+
+        # Vincoli alla base (fixed bottom), solo sui nodi effettivamente presenti
+        for node in mesh['grid'][0]:
+            if node >= 0:
+                self.constraints.append({'node': int(base + node), 'dofs': [0, 1]})  # ux=0, uy=0
+
+        self._assembly_pattern = None
+        self._constraint_handler = None
+        self.mesh_grid = {'x': x, 'y': y, 'grid': np.where(mesh['grid'] >= 0, mesh['grid'] + base, -1)}
+        logger.debug(f"Mesh strutturata {x.size - 1}x{y.size - 1}: "
+                     f"{len(mesh['coords'])} nodi, {len(mesh['connectivity'])} elementi")
+    
+    def _build_assembly_pattern(self) -> Dict:
+        """
+        Precalcola gli indici globali per l'assemblaggio vettorizzato.
         
-        dx = length / n_x
-        dy = height / n_y
-        
-        # Crea griglia di nodi
-        node_id = 0
-        node_grid = np.full((n_y + 1, n_x + 1), -1, dtype=int)
-        
-        for i in range(n_y + 1):
-            for j in range(n_x + 1):
-                x = j * dx
-                y = i * dy
-                self.add_node(node_id, x, y)
-                node_grid[i, j] = node_id
-                node_id += 1
-        
-        # Crea elementi evitando le aperture
-        for i in range(n_y):
-            for j in range(n_x):
-                # Verifica sovrapposizione con aperture
-                x_min = j * dx
-                x_max = (j + 1) * dx
-                y_min = i * dy
-                y_max = (i + 1) * dy
-                
-                overlap = False
-                for op in openings:
-                    if (x_min < op['x_end'] and x_max > op['x_start'] and
-                        y_min < op['y_end'] and y_max > op['y_start']):
-                        overlap = True
-                        break
-                
-                if not overlap:
-                    n1 = node_grid[i, j]
-                    n2 = node_grid[i, j + 1]
-                    n3 = node_grid[i + 1, j + 1]
-                    n4 = node_grid[i + 1, j]
-                    elem = FEMElement(nodes=[n1, n2, n3, n4], material=material, 
-                                    thickness=thickness, constitutive_law=law)
-                    self.add_element(elem)
-        
-        # Vincoli alla base (fixed bottom)
-        for j in range(n_x + 1):
-            bottom_node = node_grid[0, j]
-            self.add_constraint(bottom_node, [0, 1])  # ux=0, uy=0
+        Calcolato una sola volta per topologia di mesh (invalidato da
+        add_node/add_element): coordinate e DOF degli elementi come array,
+        indici riga/colonna COO e mappa di scatter COO -> dati CSR.
+        """
+        self._setup_dof_mapping()
+        n_dof = 2 * self.mesh.n_nodes
+        elem_dofs = self.mesh.elem_dofs
+        elem_coords = self.mesh.elem_coords()
+        
+        # Blocchi 8x8 in ordine riga-maggiore: rows[e, i, j] = dof_i, cols[e, i, j] = dof_j
+        rows = np.repeat(elem_dofs, 8, axis=1).ravel()
+        cols = np.tile(elem_dofs, (1, 8)).ravel()
+        
+        # Posizione di ogni contributo COO nell'array data della CSR canonica
+        keys, scatter = np.unique(rows * n_dof + cols, return_inverse=True)
+        
+        self._assembly_pattern = {
+            'n_dof': n_dof,
+            'elem_dofs': elem_dofs,
+            'elem_coords': elem_coords,
+            'rows': rows,
+            'cols': cols,
+            'scatter': scatter.ravel(),
+            'nnz': len(keys),
+            'mesh_version': self.mesh.version
+        }
+        return self._assembly_pattern
+    
+    def _get_assembly_pattern(self) -> Dict:
+        """Restituisce il pattern di assemblaggio, ricostruendolo se la topologia è cambiata"""
+        pattern = self._assembly_pattern
+        if pattern is None or pattern['mesh_version'] != self.mesh.version:
+            pattern = self._build_assembly_pattern()
+        return pattern
+    
+    def _element_properties(self, pattern: Dict) -> Dict:
+        """Proprietà per elemento come array (spessore, E, nu, legame lineare)"""
+        props = pattern.get('props')
+        if props is None:
+            mesh = self.mesh
+            props = {
+                'thickness': mesh.thickness.copy(),
+                'E': np.array([m.E for m in mesh.materials], dtype=float)[mesh.material_ids],
+                'nu': np.array([m.nu for m in mesh.materials], dtype=float)[mesh.material_ids],
+                'linear': np.array([law == ConstitutiveLaw.LINEAR for law in mesh.laws],
+                                   dtype=bool)[mesh.law_ids]
+            }
+            pattern['props'] = props
+        return props
+    
+    def _gauss_point_state(self, u: Optional[np.ndarray],
+                           points: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """B, detJ e deformazioni (n_elem, n_gp, 3) ai punti di Gauss (o points) di tutti gli elementi"""
+        pattern = self._get_assembly_pattern()
+        dN_ref = _Q4_DN_REF if points is None else q4_reference_derivatives(points)
+        B, detJ = q4_batch_kinematics(pattern['elem_coords'], dN_ref)
+        if u is None:
+            strain = np.zeros(B.shape[:2] + (3,))
+        else:
+            strain = np.einsum('egij,ej->egi', B, u[pattern['elem_dofs']])
+        return B, detJ, strain
+    
+    @staticmethod
+    def _equivalent_strain(strain: np.ndarray) -> np.ndarray:
+        return np.sqrt(strain[..., 0]**2 + strain[..., 1]**2 + 2 * strain[..., 2]**2)
+    
+    def tangent_D_batch(self, strain: np.ndarray) -> np.ndarray:
+        """
+        Matrici D tangenti (n_elem, n_gp, 3, 3), equivalenti a FEMElement.D_matrix.
+        
+        Gli elementi lineari sono calcolati interamente per array; per quelli
+        non lineari solo la valutazione scalare del legame costitutivo resta
+        per punto di Gauss.
+        """
+        props = self._element_properties(self._get_assembly_pattern())
+        n_elem, n_gp = strain.shape[:2]
+        E = np.repeat(props['E'][:, None], n_gp, axis=1)
+        nu = np.repeat(props['nu'][:, None], n_gp, axis=1)
+        
+        nonlinear = np.flatnonzero(~props['linear'])
+        if nonlinear.size:
+            strain_eq = self._equivalent_strain(strain)
+            for e in nonlinear:
+                model = self.mesh.constitutive_model(e)
+                E_mat = props['E'][e]
+                for g in range(n_gp):
+                    Et = model.tangent_modulus(strain_eq[e, g])
+                    E[e, g] = max(Et, 0.01 * E_mat)
+            nu[nonlinear] = np.minimum(nu[nonlinear], 0.45)
+        return plane_stress_D(E, nu)
+    
+    def stress_batch(self, strain: np.ndarray) -> np.ndarray:
+        """
+        Tensioni (n_elem, n_gp, 3) dal legame costitutivo, equivalenti a
+        FEMElement.internal_forces (stesso ordine di chiamata al modello).
+        """
+        props = self._element_properties(self._get_assembly_pattern())
+        stress = np.empty_like(strain)
+        
+        linear = props['linear']
+        if np.any(linear):
+            D_lin = plane_stress_D(props['E'][linear], props['nu'][linear])
+            stress[linear] = np.einsum('eij,egj->egi', D_lin, strain[linear])
+        
+        nonlinear = np.flatnonzero(~linear)
+        if nonlinear.size:
+            strain_eq = self._equivalent_strain(strain)
+            for e in nonlinear:
+                model = self.mesh.constitutive_model(e)
+                for g in range(strain.shape[1]):
+                    eq = strain_eq[e, g]
+                    sigma_eq = model.stress(eq)
+                    if eq > 1e-12:
+                        stress[e, g] = sigma_eq / eq * strain[e, g]
+                    else:
+                        stress[e, g] = 0.0
+        return stress
+    
+    def element_stiffness_batch(self, u: Optional[np.ndarray] = None) -> np.ndarray:
+        """Matrici di rigidezza di tutti gli elementi come array (n_elem, 8, 8)"""
+        pattern = self._get_assembly_pattern()
+        
+        if not self.use_batch_kernel:
+            # Percorso per elemento (riferimento per verifiche incrociate)
+            elem_dofs = pattern['elem_dofs']
+            elem_coords = pattern['elem_coords']
+            K_all = np.empty((len(self.elements), 8, 8))
+            for e, elem in enumerate(self.elements):
+                u_elem = None if u is None else u[elem_dofs[e]]
+                K_all[e] = elem.element_stiffness(elem_coords[e], u_elem)
+            return K_all
+        
+        props = self._element_properties(pattern)
+        B, detJ, strain = self._gauss_point_state(u)
+        D = self.tangent_D_batch(strain)
+        w = detJ * Q4_GAUSS_WEIGHTS[None, :] * props['thickness'][:, None]
+        return np.einsum('egia,egij,egjb,eg->eab', B, D, B, w)
+    
+    def internal_forces_batch(self, u: np.ndarray) -> np.ndarray:
+        """Forze interne di tutti gli elementi come array (n_elem, 8)"""
+        pattern = self._get_assembly_pattern()
+        
+        if not self.use_batch_kernel:
+            elem_dofs = pattern['elem_dofs']
+            elem_coords = pattern['elem_coords']
+            return np.array([elem.internal_forces(elem_coords[e], u[elem_dofs[e]])
+                             for e, elem in enumerate(self.elements)]).reshape(-1, 8)
+        
+        props = self._element_properties(pattern)
+        B, detJ, strain = self._gauss_point_state(u)
+        stress = self.stress_batch(strain)
+        w = detJ * Q4_GAUSS_WEIGHTS[None, :] * props['thickness'][:, None]
+        return np.einsum('egia,egi,eg->ea', B, stress, w)
     
     def assemble_global_stiffness(self, u: Optional[np.ndarray] = None):
-        """Assembla matrice di rigidezza globale"""
-        n_nodes = len(self.nodes)
-        n_dof = 2 * n_nodes
+        """
+        Assembla matrice di rigidezza globale (vettorizzato COO -> CSR).
         
-        self._setup_dof_mapping()
-        self.K_global = lil_matrix((n_dof, n_dof))
+        Il primo assemblaggio per una data topologia costruisce la CSR con una
+        sola chiamata coo_matrix(...).tocsr(); le chiamate successive (es.
+        iterazioni di Newton) riusano lo stesso pattern di sparsità e
+        aggiornano solo l'array dei dati.
+        """
+        pattern = self._get_assembly_pattern()
+        n_dof = pattern['n_dof']
+        self._K_is_initial = u is None
         
-        for elem in self.elements:
-            coords = np.array([self.nodes[int(n)] for n in elem.nodes])
-            elem_dofs = []
-            for n in elem.nodes:
-                elem_dofs.extend(self.dof_map[int(n)])
-            
-            u_elem = None if u is None else u[elem_dofs]
-            
-            try:
-                K_e = elem.element_stiffness(coords, u_elem)
-                
-                for i in range(8):
-                    for j in range(8):
-                        self.K_global[elem_dofs[i], elem_dofs[j]] += K_e[i, j]
-                        
-            except Exception as e:
-                logger.error(f"Errore nell'assemblaggio elemento: {e}")
-                raise
+        try:
+            K_all = self.element_stiffness_batch(u)
+        except Exception as e:
+            logger.error(f"Errore nell'assemblaggio elemento: {e}")
+            raise
         
-        self.K_global = self.K_global.tocsr()
+        K = self.K_global
+        if (K is not None and pattern.get('csr_owner') is K
+                and K.nnz == pattern['nnz']):
+            # Stesso pattern: riempi solo i dati CSR
+            K.data[:] = np.bincount(pattern['scatter'], weights=K_all.ravel(),
+                                    minlength=pattern['nnz'])
+            mark_modified(K)
+            return
+        
+        K = coo_matrix((K_all.ravel(), (pattern['rows'], pattern['cols'])),
+                       shape=(n_dof, n_dof)).tocsr()
+        K.sum_duplicates()  # forma canonica: indici ordinati, ordine coerente con scatter
+        pattern['csr_owner'] = K
+        self.K_global = K
     
-    def apply_boundary_conditions(self, K: csr_matrix, F: np.ndarray) -> Tuple[csr_matrix, np.ndarray]:
-        """Applica vincoli con metodo della penalità"""
-        penalty = 1e12
-        K_mod = K.copy().tolil()
-        F_mod = F.copy()
+    def get_constraint_handler(self) -> ConstraintHandler:
+        """
+        Gestore vincoli con indici DOF liberi/vincolati precalcolati.
         
-        for const in self.constraints:
-            node_dofs = self.dof_map[int(const['node'])]
-            for local_dof in const['dofs']:
-                global_dof = node_dofs[local_dof]
-                K_mod[global_dof, global_dof] += penalty
-                F_mod[global_dof] = 0
+        Con eliminazione vengono esclusi anche i DOF non collegati ad alcun
+        elemento (es. nodi interni alle aperture), privi di rigidezza.
+        """
+        pattern = self._get_assembly_pattern()
+        handler = self._constraint_handler
+        if (handler is not None and handler.n_dof == pattern['n_dof']
+                and handler.method == self.constraint_method
+                and handler._pattern is pattern):
+            return handler
+        
+        fixed = [self.dof_map[int(const['node'])][local_dof]
+                 for const in self.constraints for local_dof in const['dofs']]
+        if self.constraint_method == 'elimination':
+            connected = np.zeros(pattern['n_dof'], dtype=bool)
+            connected[pattern['elem_dofs'].ravel()] = True
+            orphans = np.flatnonzero(~connected)
+            if orphans.size:
+                logger.debug(f"{orphans.size} DOF non collegati a elementi eliminati")
+            fixed = np.concatenate([np.asarray(fixed, dtype=np.int64), orphans])
         
-        return K_mod.tocsr(), F_mod
+        ties = {}
+        for node, (a, b) in self.hanging_nodes.items():
+            for k in range(2):
+                ties[self.dof_map[node][k]] = [(self.dof_map[a][k], 0.5), (self.dof_map[b][k], 0.5)]
+        
+        handler = ConstraintHandler(pattern['n_dof'], fixed, method=self.constraint_method,
+                                    ties=ties)
+        handler._pattern = pattern
+        self._constraint_handler = handler
+        return handler
+    
+    def apply_boundary_conditions(self, K: csr_matrix, F: np.ndarray) -> Tuple[csr_matrix, np.ndarray]:
+        """Applica vincoli con metodo della penalità"""
+        self._setup_dof_mapping()
+        fixed = [self.dof_map[int(const['node'])][local_dof]
+                 for const in self.constraints for local_dof in const['dofs']]
+        handler = ConstraintHandler(K.shape[0], fixed, method='penalty')
+        return handler.apply_penalty(K, F)
     
     def assemble_load_vector(self) -> np.ndarray:
         """Assembla vettore dei carichi"""
-        n_dof = 2 * len(self.nodes)
+        n_dof = 2 * self.mesh.n_nodes
         F = np.zeros(n_dof)
+        if len(self.dof_map) != len(self.nodes):
+            self._setup_dof_mapping()
         
         for node_id, load in self.loads.items():
             dofs = self.dof_map[int(node_id)]
@@ -337,147 +1245,346 @@ class FEMModel:
     def compute_internal_forces(self, u: np.ndarray) -> np.ndarray:
         """Calcola forze interne per analisi non lineare"""
         n_dof = len(u)
-        f_int = np.zeros(n_dof)
-        
-        for elem in self.elements:
-            coords = np.array([self.nodes[int(n)] for n in elem.nodes])
-            elem_dofs = []
-            for n in elem.nodes:
-                elem_dofs.extend(self.dof_map[int(n)])
-            u_elem = u[elem_dofs]
-            
-            try:
-                f_e = elem.internal_forces(coords, u_elem)
-                f_int[elem_dofs] += f_e
-            except Exception as e:
-                logger.error(f"Errore nel calcolo forze interne elemento: {e}")
-                raise
+        pattern = self._get_assembly_pattern()
         
-        return f_int
+        try:
+            f_e = self.internal_forces_batch(u)
+        except Exception as e:
+            logger.error(f"Errore nel calcolo forze interne elemento: {e}")
+            raise
+        
+        return np.bincount(pattern['elem_dofs'].ravel(), weights=f_e.ravel(),
+                           minlength=n_dof)
     
-    def solve_linear(self) -> np.ndarray:
-        """Risolve sistema lineare"""
+    def solve_linear(self, F: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Risolve sistema lineare.
+        
+        Args:
+            F: Vettore dei carichi (n_dof,) o più casi di carico (n_dof, n_casi);
+               se None usa i carichi nodali del modello
+        """
         logger.info("Inizio risoluzione lineare FEM")
         
-        self.assemble_global_stiffness()
-        F = self.assemble_load_vector()
-        K_mod, F_mod = self.apply_boundary_conditions(self.K_global, F)
+        # La rigidezza iniziale si riusa (con la sua fattorizzazione) finché
+        # la topologia non cambia e non è stata sovrascritta da una tangente
+        if not self._K_is_initial or self._assembly_pattern is None \
+                or self._assembly_pattern.get('csr_owner') is not self.K_global:
+            self.assemble_global_stiffness()
+        if F is None:
+            F = self.assemble_load_vector()
+        handler = self.get_constraint_handler()
         
         # Verifica condizionamento
-        if K_mod.nnz == 0:
+        if self.K_global.nnz == 0:
             raise ValueError("Matrice di rigidezza vuota")
         
-        u = spsolve(K_mod, F_mod)
+        if handler.method == 'elimination':
+            K_ff = handler.reduce_matrix(self.K_global)
+            u = handler.expand(self.linear_solver.solve(K_ff, handler.reduce_vector(F)))
+        else:
+            K_mod, F_mod = handler.apply_penalty(self.K_global, F)
+            u = self.linear_solver.solve(K_mod, F_mod)
         logger.info("Risoluzione lineare completata")
         return u
     
-    def solve_nonlinear(self, tol: float = 1e-6, max_iter: int = 50) -> np.ndarray:
-        """Newton-Raphson per analisi non lineare"""
-        logger.info("Inizio risoluzione non lineare con Newton-Raphson")
+    def solve_nonlinear(self, tol: float = 1e-6, max_iter: int = 50,
+                        options: Optional[NonlinearOptions] = None,
+                        u0: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Analisi non lineare (Newton-Raphson e varianti).
         
-        F_ext = self.assemble_load_vector()
-        u = np.zeros(len(F_ext))
-        iter_count = 0
+        Args:
+            tol, max_iter: Tolleranza su ||R|| e iterazioni massime per passo
+                (usati se options è None)
+            options: Strategia (newton, modified_newton, initial_stiffness,
+                bfgs), line search e passi di carico con cutback
+            u0: Stima iniziale degli spostamenti (es. soluzione su mesh precedente)
+                
+        Il report per passo (iterazioni, fattorizzazioni, storia dei residui)
+        resta disponibile in self.last_nonlinear_report.
+        """
+        if options is None:
+            options = NonlinearOptions(tol=tol, max_iter=max_iter)
+        logger.info(f"Inizio risoluzione non lineare ({options.strategy})")
         
-        # Applica vincoli al vettore dei carichi esterni
-        _, F_ext = self.apply_boundary_conditions(csr_matrix((len(F_ext), len(F_ext))), F_ext)
+        handler = self.get_constraint_handler()
+        F_ext = self.assemble_load_vector()
+        n_dof = len(F_ext)
         
-        while iter_count < max_iter:
-            # Calcola forze interne e residuo
-            f_int = self.compute_internal_forces(u)
-            R = F_ext - f_int
+        if handler.method == 'elimination':
+            F_f = handler.reduce_vector(F_ext)
+            to_full = handler.expand
             
-            # Applica vincoli al residuo
-            for const in self.constraints:
-                node_dofs = self.dof_map[int(const['node'])]
-                for local_dof in const['dofs']:
-                    global_dof = node_dofs[local_dof]
-                    R[global_dof] = 0
-                    u[global_dof] = 0  # Mantieni spostamento nullo
+            def residual(x, lam):
+                return lam * F_f - handler.reduce_vector(self.compute_internal_forces(to_full(x)))
             
-            norm_R = np.linalg.norm(R)
-            logger.debug(f"Iterazione {iter_count}: ||R|| = {norm_R}")
+            def tangent(x):
+                # Stesso pattern: aggiorna solo i dati di K e K_ff
+                self.assemble_global_stiffness(to_full(x))
+                return handler.reduce_matrix(self.K_global)
             
-            if norm_R < tol:
-                logger.info(f"Convergenza raggiunta in {iter_count} iterazioni")
-                break
+            x0 = np.zeros(handler.n_free) if u0 is None else handler.restrict(u0)
+        else:
+            fixed = handler.fixed
             
-            # Assembla matrice tangente
-            self.assemble_global_stiffness(u)
-            K_mod, R_mod = self.apply_boundary_conditions(self.K_global, R)
+            def to_full(x):
+                return x
             
-            try:
-                du = spsolve(K_mod, R_mod)
-                u += du
-            except Exception as e:
-                logger.error(f"Errore nella risoluzione sistema lineare: {e}")
-                break
+            def residual(x, lam):
+                R = lam * F_ext - self.compute_internal_forces(x)
+                R[fixed] = 0
+                return R
+            
+            def tangent(x):
+                self.assemble_global_stiffness(x)
+                K_mod, _ = handler.apply_penalty(self.K_global, np.zeros(n_dof))
+                return K_mod
             
-            iter_count += 1
+            x0 = np.zeros(n_dof) if u0 is None else np.array(u0, dtype=float)
         
-        if iter_count >= max_iter:
-            logger.warning(f"Solver non lineare non convergente dopo {max_iter} iterazioni")
+        solver = NonlinearSolver(options, self.linear_solver)
+        report = solver.solve(residual, tangent, x0)
+        u = to_full(report.pop('u'))
+        self.last_nonlinear_report = report
+        
+        if report['converged']:
+            logger.info(f"Convergenza raggiunta: {report['total_iterations']} iterazioni, "
+                        f"{report['total_factorizations']} fattorizzazioni")
+        else:
+            logger.warning(f"Solver non lineare non convergente "
+                           f"(lambda={report['lambda']:.3f}, {report['total_iterations']} iterazioni)")
         
         return u
     
-    def compute_stresses(self, u: np.ndarray) -> List[Dict]:
-        """Calcola tensioni medie per elemento"""
-        stresses = []
-        
-        for elem_idx, elem in enumerate(self.elements):
-            coords = np.array([self.nodes[int(n)] for n in elem.nodes])
-            elem_dofs = []
-            for n in elem.nodes:
-                elem_dofs.extend(self.dof_map[int(n)])
-            u_elem = u[elem_dofs]
+    def load_mesh(self, mesh: Dict, material: MaterialProperties, thickness: float = 0.3,
+                  law: ConstitutiveLaw = ConstitutiveLaw.LINEAR, fix_bottom: bool = True):
+        """
+        Importa una mesh nel formato di utils.generate_mesh_Q4 / refine_mesh_adaptive.
+        
+        Gli elementi con material_id < 0 (vuoti delle aperture) sono esclusi;
+        i nodi sospesi eventualmente presenti ('hanging_nodes') sono vincolati.
+        """
+        ids = [int(n['id']) for n in mesh['nodes']]
+        self.mesh.add_nodes(ids, [[n['x'], n['y']] for n in mesh['nodes']])
+        solid = [e['nodes'] for e in mesh['elements']
+                 if e.get('type', 'Q4') == 'Q4' and e.get('material_id', 0) >= 0]
+        self.mesh.add_elements(np.array(solid, dtype=np.int64).reshape(-1, 4), material, law, thickness)
+        for node, (a, b) in mesh.get('hanging_nodes', {}).items():
+            self.hanging_nodes[int(node)] = (int(a), int(b))
+        if fix_bottom:
+            for node in mesh.get('node_sets', {}).get('bottom', []):
+                self.constraints.append({'node': int(node), 'dofs': [0, 1]})
+        self._assembly_pattern = None
+        self._constraint_handler = None
+    
+    def refine_elements(self, flagged) -> Dict:
+        """
+        Suddivide in 4 gli elementi selezionati (regola 1-irregolare).
+        
+        I nuovi nodi sui lati vincolati ereditano i vincoli comuni ai due
+        estremi; i nodi sospesi sono legati al lato con u = (u_a + u_b) / 2.
+        
+        Returns:
+            Dict con 'n_refined' e 'prolongation': matrice (n_dof_nuovi, n_dof_vecchi)
+            che interpola gli spostamenti sulla nuova mesh
+        """
+        mesh = self.mesh
+        n_old = mesh.n_nodes
+        old_dofs = 2 * n_old
+        split = split_q4_elements(mesh.coords, mesh.connectivity, flagged, self._edge_midpoints)
+        self._edge_midpoints = split['edge_midpoints']
+        
+        # Nuovi nodi con id successivi al massimo: i DOF esistenti non cambiano posizione
+        ids = mesh.node_ids
+        base = int(ids.max()) + 1
+        n_new = len(split['coords']) - n_old
+        new_ids = np.concatenate([ids, base + np.arange(n_new)])
+        mesh.add_nodes(new_ids[n_old:], split['coords'][n_old:])
+        parent = split['parent']
+        mesh.set_elements(split['connectivity'], mesh.material_ids[parent],
+                          mesh.law_ids[parent], mesh.thickness[parent])
+        
+        # Vincoli ereditati dai lati vincolati
+        constrained: Dict[int, set] = {}
+        for const in self.constraints:
+            constrained.setdefault(const['node'], set()).update(const['dofs'])
+        for row, parents in split['new_nodes'].items():
+            if len(parents) == 2:
+                a, b = (int(new_ids[p]) for p in parents)
+                common = constrained.get(a, set()) & constrained.get(b, set())
+                if common:
+                    self.constraints.append({'node': int(new_ids[row]), 'dofs': sorted(common)})
+        
+        self.hanging_nodes = {int(new_ids[h]): (int(new_ids[a]), int(new_ids[b]))
+                              for h, (a, b) in split['hanging'].items()}
+        self._assembly_pattern = None
+        self._constraint_handler = None
+        self._setup_dof_mapping()
+        
+        # Prolungamento: DOF esistenti invariati, nuovi nodi come media dei genitori
+        rank = np.empty(len(new_ids), dtype=np.int64)
+        rank[np.argsort(new_ids, kind='stable')] = np.arange(len(new_ids))
+        rows = list(range(old_dofs))
+        cols = list(range(old_dofs))
+        vals = [1.0] * old_dofs
+        for row, parents in split['new_nodes'].items():
+            w = 1.0 / len(parents)
+            for p in parents:
+                for k in range(2):
+                    rows.append(2 * rank[row] + k)
+                    cols.append(2 * rank[p] + k)
+                    vals.append(w)
+        prolongation = coo_matrix((vals, (rows, cols)), shape=(2 * mesh.n_nodes, old_dofs)).tocsr()
+        
+        logger.info(f"Raffinati {len(split['refined'])} elementi: "
+                    f"{mesh.n_elements} elementi, {len(self.hanging_nodes)} nodi sospesi")
+        return {'n_refined': len(split['refined']), 'prolongation': prolongation}
+    
+    def estimate_error(self, u: np.ndarray) -> Dict:
+        """
+        Stimatore d'errore di Zienkiewicz-Zhu in norma energetica.
+        
+        L'errore per elemento è l'energia della differenza tra le tensioni
+        recuperate (SPR, interpolate ai punti di Gauss) e quelle calcolate:
+        eta_e^2 = int (s* - s_h)^T D^-1 (s* - s_h) dA.
+        
+        Returns:
+            Dict con 'element_error' (eta_e), 'relative_error' globale,
+            'energy_norm' e lo StressField usato
+        """
+        field = self.compute_stress_field(u)
+        pattern = self._get_assembly_pattern()
+        props = self._element_properties(pattern)
+        _, detJ = q4_batch_kinematics(pattern['elem_coords'])
+        w = detJ * Q4_GAUSS_WEIGHTS[None, :] * props['thickness'][:, None]
+        
+        N = q4_shape_functions(Q4_GAUSS_POINTS)
+        sigma_star = np.einsum('gn,enc->egc', N, field.nodal['stress'][self.mesh.connectivity])
+        diff = sigma_star - field.stress
+        D_inv = np.linalg.inv(plane_stress_D(props['E'], props['nu']))
+        err2 = np.einsum('egi,eij,egj,eg->e', diff, D_inv, diff, w)
+        energy2 = np.einsum('egi,eij,egj,eg->e', field.stress, D_inv, field.stress, w)
+        
+        total = energy2.sum() + err2.sum()
+        return {
+            'element_error': np.sqrt(np.maximum(err2, 0.0)),
+            'relative_error': float(np.sqrt(err2.sum() / total)) if total > 0 else 0.0,
+            'energy_norm': float(np.sqrt(energy2.sum())),
+            'stress_field': field
+        }
+    
+    def solve_adaptive(self, apply_loads: Callable[['FEMModel'], None],
+                       target_error: float = 0.05, max_dofs: int = 20000,
+                       max_cycles: int = 8, theta: float = 0.5,
+                       nonlinear_options: Optional[NonlinearOptions] = None) -> np.ndarray:
+        """
+        Ciclo adattivo risolvi -> stima -> marca -> raffina.
+        
+        Args:
+            apply_loads: Funzione che (ri)applica i carichi al modello, chiamata
+                         ad ogni ciclo perché il raffinamento crea nuovi nodi
+            target_error: Errore relativo ZZ in norma energetica da raggiungere
+            max_dofs: Budget di DOF liberi
+            max_cycles: Numero massimo di raffinamenti
+            theta: Marcatura: elementi con eta_e >= theta * max(eta_e)
+            nonlinear_options: Se presenti analisi non lineare, con stima iniziale
+                               interpolata dalla soluzione del ciclo precedente
+                               
+        La storia (DOF, elementi, errore per ciclo) è in self.adaptive_history.
+        """
+        if self.constraint_method != 'elimination':
+            logger.warning("Raffinamento adattivo: uso vincoli per eliminazione")
+            self.constraint_method = 'elimination'
+        self.adaptive_history = []
+        u_guess = None
+        
+        for cycle in range(max_cycles + 1):
+            apply_loads(self)
+            if nonlinear_options is not None:
+                u = self.solve_nonlinear(options=nonlinear_options, u0=u_guess)
+            else:
+                u = self.solve_linear()
             
-            try:
-                # Punto centrale per media
-                xi, eta = 0.0, 0.0
-                B = elem.B_matrix(coords, xi, eta)
-                strain = B @ u_elem
-                
-                if elem.constitutive_law == ConstitutiveLaw.LINEAR:
-                    stress = elem.D_matrix() @ strain
-                    sigma_x, sigma_y, tau_xy = stress[0], stress[1], stress[2]
-                else:
-                    # Stress dal modello costitutivo non lineare
-                    strain_eq = np.sqrt(strain[0]**2 + strain[1]**2 + 2 * strain[2]**2)
-                    sigma_eq = elem._model.stress(strain_eq)
-                    if strain_eq > 1e-12:
-                        stress = sigma_eq / strain_eq * strain
-                    else:
-                        stress = np.zeros(3)
-                    sigma_x, sigma_y, tau_xy = stress[0], stress[1], stress[2]
-                
-                # Von Mises
-                von_mises = np.sqrt(sigma_x**2 - sigma_x*sigma_y + sigma_y**2 + 3*tau_xy**2)
-                
-                stresses.append({
-                    'element_id': elem_idx,
-                    'sigma_x': float(sigma_x),
-                    'sigma_y': float(sigma_y),
-                    'tau_xy': float(tau_xy),
-                    'von_mises': float(von_mises),
-                    'strain_x': float(strain[0]),
-                    'strain_y': float(strain[1]),
-                    'gamma_xy': float(strain[2])
-                })
-                
-            except Exception as e:
-                logger.error(f"Errore nel calcolo tensioni elemento {elem_idx}: {e}")
-                stresses.append({
-                    'element_id': elem_idx,
-                    'sigma_x': 0.0,
-                    'sigma_y': 0.0,
-                    'tau_xy': 0.0,
-                    'von_mises': 0.0,
-                    'strain_x': 0.0,
-                    'strain_y': 0.0,
-                    'gamma_xy': 0.0
-                })
-        
-        return stresses
+            estimate = self.estimate_error(u)
+            n_free = self.get_constraint_handler().n_free
+            eta = estimate['element_error']
+            self.adaptive_history.append({
+                'cycle': cycle,
+                'n_dof': n_free,
+                'n_elements': self.mesh.n_elements,
+                'relative_error': estimate['relative_error'],
+                'max_element_error': float(eta.max()) if eta.size else 0.0
+            })
+            logger.info(f"Ciclo adattivo {cycle}: {n_free} DOF, "
+                        f"errore stimato {estimate['relative_error']:.2%}")
+            
+            if estimate['relative_error'] <= target_error:
+                logger.info("Errore obiettivo raggiunto")
+                break
+            if cycle == max_cycles:
+                break
+            
+            flagged = np.flatnonzero(eta >= theta * eta.max())
+            # Ogni suddivisione aggiunge al più 5 nodi (10 DOF)
+            if n_free + 10 * len(flagged) > max_dofs:
+                logger.info(f"Budget di {max_dofs} DOF raggiunto")
+                break
+            info = self.refine_elements(flagged)
+            u_guess = info['prolongation'] @ u
+        
+        return u
+    
+    def compute_stress_field(self, u: np.ndarray, points: str = 'gauss') -> StressField:
+        """
+        Tensioni di tutti gli elementi come array.
+        
+        Args:
+            u: Spostamenti globali
+            points: 'gauss' (2x2 punti di Gauss) o 'centroid' (centro elemento)
+            
+        Returns:
+            StressField con tensioni (n_elem, n_pt, 3), principali, von Mises
+            e campo nodale SPR calcolato su richiesta
+        """
+        ref = Q4_GAUSS_POINTS if points == 'gauss' else Q4_CENTROID
+        pattern = self._get_assembly_pattern()
+        _, _, strain = self._gauss_point_state(u, ref)
+        stress = self.stress_batch(strain)
+        point_coords = np.einsum('pn,end->epd', q4_shape_functions(ref), pattern['elem_coords'])
+        return StressField(self.mesh.coords, self.mesh.connectivity, point_coords, strain, stress)
+    
+    def compute_stresses(self, u: np.ndarray) -> List[Dict]:
+        """Calcola tensioni medie per elemento (valori al centro, un dict per elemento)"""
+        return self.compute_stress_field(u, points='centroid').to_records()
+
+def _apply_top_loads(model: FEMModel, height: float, loads: Dict, tributary: bool = False) -> int:
+    """
+    Ripartisce i carichi orizzontale/verticale sui nodi della sommità.
+    
+    Con tributary=True la ripartizione è per larghezza di influenza (mesh non
+    uniformi o raffinate), altrimenti a quote uguali come in origine.
+    """
+    model.loads = {}
+    top_node_ids = [node_id for node_id, coords in model.nodes.items()
+                    if abs(coords[1] - height) < 1e-6]  # Nodi alla quota massima
+    if not top_node_ids:
+        return 0
+    
+    if tributary and len(top_node_ids) > 1:
+        top_node_ids.sort(key=lambda n: model.nodes[n][0])
+        x_top = np.array([model.nodes[n][0] for n in top_node_ids])
+        mid = 0.5 * (x_top[1:] + x_top[:-1])
+        widths = np.diff(np.concatenate([[x_top[0]], mid, [x_top[-1]]]))
+        weights = widths / widths.sum()
+    else:
+        weights = np.full(len(top_node_ids), 1.0 / len(top_node_ids))
+    
+    for node_id, w in zip(top_node_ids, weights):
+        model.add_load(node_id, Fx=loads.get('horizontal', 0.0) * w,
+                       Fy=loads.get('vertical', 0.0) * w)
+    return len(top_node_ids)
+
 
 def _analyze_fem(wall_data: Dict, material: MaterialProperties,
                  loads: Dict, options: Dict) -> Dict:
@@ -496,53 +1603,75 @@ def _analyze_fem(wall_data: Dict, material: MaterialProperties,
         
         # Crea modello e genera mesh
         model = FEMModel()
-        model.generate_mesh(wall_data, material, n_x, n_y, law)
+        model.constraint_method = options.get('constraint_method', 'elimination')
+        model.linear_solver = LinearSolver(ordering=options.get('dof_ordering', 'amd'))
+        model.generate_mesh(wall_data, material, n_x, n_y, law,
+                            refine_openings=options.get('refine_openings', 0),
+                            grading=options.get('mesh_grading', 0.5))
         
-        logger.info(f"Mesh generata: {len(model.nodes)} nodi, {len(model.elements)} elementi")
+        logger.info(f"Mesh generata: {model.mesh.n_nodes} nodi, {model.mesh.n_elements} elementi")
         
         # Applica carichi sui nodi superiori
-        length = wall_data.get('length', 5.0)
         height = wall_data.get('height', 3.0)
-        n_nodes_x = n_x + 1
-        
-        # Identifica nodi superiori correttamente
-        top_node_ids = []
-        for node_id, coords in model.nodes.items():
-            if abs(coords[1] - height) < 1e-6:  # Nodi alla quota massima
-                top_node_ids.append(node_id)
-        
-        if top_node_ids:
-            Fx_per_node = loads.get('horizontal', 0.0) / len(top_node_ids)
-            Fy_per_node = loads.get('vertical', 0.0) / len(top_node_ids)
-            
-            for node_id in top_node_ids:
-                model.add_load(node_id, Fx=Fx_per_node, Fy=Fy_per_node)
-        
-        logger.info(f"Applicati carichi su {len(top_node_ids)} nodi superiori")
+        adaptive = options.get('adaptive', False)
+        tributary = adaptive or options.get('refine_openings', 0) > 0
+        n_top = _apply_top_loads(model, height, loads, tributary)
+        logger.info(f"Applicati carichi su {n_top} nodi superiori")
         
         # Risoluzione
+        nonlinear_options = None
         if nonlinear:
+            nonlinear_options = NonlinearOptions(
+                strategy=options.get('nonlinear_strategy', 'newton'),
+                tol=options.get('tol', 1e-6),
+                max_iter=options.get('max_iter', 50),
+                tangent_interval=options.get('tangent_interval', 5),
+                line_search=options.get('line_search', False),
+                load_steps=options.get('load_steps', 1),
+                max_cutbacks=options.get('max_cutbacks', 5)
+            )
+        if adaptive:
+            logger.info("Risoluzione adattiva (raffinamento h)")
+            u = model.solve_adaptive(
+                lambda m: _apply_top_loads(m, height, loads, tributary=True),
+                target_error=options.get('target_error', 0.05),
+                max_dofs=options.get('max_dofs', 20000),
+                max_cycles=options.get('max_cycles', 8),
+                theta=options.get('refine_fraction', 0.5),
+                nonlinear_options=nonlinear_options
+            )
+        elif nonlinear:
             logger.info("Risoluzione non lineare")
-            u = model.solve_nonlinear()
+            u = model.solve_nonlinear(options=nonlinear_options)
         else:
             logger.info("Risoluzione lineare")
             u = model.solve_linear()
         
-        # Calcola tensioni
-        stresses = model.compute_stresses(u)
+        ordering_report = None
+        if options.get('report_ordering', False):
+            handler = model.get_constraint_handler()
+            K_report = (handler.reduce_matrix(model.K_global) if model.constraint_method == 'elimination'
+                        else model.apply_boundary_conditions(model.K_global, np.zeros(model.K_global.shape[0]))[0])
+            ordering_report = model.linear_solver.ordering_report(K_report)
+        
+        # Calcola tensioni (centro elemento, formato storico) e campo ai punti di Gauss
+        centroid_field = model.compute_stress_field(u, points='centroid')
+        stresses = centroid_field.to_records() if options.get('stress_records', True) else []
+        stress_field = model.compute_stress_field(u) if options.get('stress_field', True) else None
         
         # Verifica convergenza per non lineare
         converged = True
         if nonlinear:
             f_int = model.compute_internal_forces(u)
             f_ext = model.assemble_load_vector()
-            residual_norm = np.linalg.norm(f_ext - f_int)
+            free = model.get_constraint_handler().free
+            residual_norm = np.linalg.norm(f_ext[free] - f_int[free])
             converged = residual_norm < 1e-4
             logger.info(f"Residuo finale: {residual_norm}, Convergenza: {converged}")
         
         # Statistiche finali
         max_displacement = np.max(np.abs(u))
-        max_von_mises = max([s['von_mises'] for s in stresses]) if stresses else 0.0
+        max_von_mises = centroid_field.von_mises.max() if centroid_field.n_elements else 0.0
         
         results = {
             'method': 'FEM',
@@ -551,16 +1680,25 @@ def _analyze_fem(wall_data: Dict, material: MaterialProperties,
             'max_displacement': float(max_displacement),
             'stresses': stresses,
             'max_von_mises': float(max_von_mises),
-            'n_nodes': len(model.nodes),
-            'n_elements': len(model.elements),
+            'stress_field': (stress_field.to_dict(nodal=options.get('nodal_stresses', False))
+                             if stress_field is not None else None),
+            'node_coords': model.mesh.coords,
+            'connectivity': model.mesh.connectivity,
+            'n_nodes': model.mesh.n_nodes,
+            'n_elements': model.mesh.n_elements,
             'n_constraints': len(model.constraints),
             'n_loads': len(model.loads),
             'nonlinear_converged': converged,
+            'solver_report': model.last_nonlinear_report if nonlinear else None,
+            'nnz_L': model.linear_solver.stats['nnz_L'],
+            'ordering_report': ordering_report,
             'mesh_info': {
                 'n_x': n_x,
                 'n_y': n_y,
+                'refine_openings': options.get('refine_openings', 0),
                 'constitutive_law': law.value if hasattr(law, 'value') else str(law)
-            }
+            },
+            'adaptive_history': model.adaptive_history if adaptive else None
         }
         
         logger.info("Analisi FEM completata con successo")
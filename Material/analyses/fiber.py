@@ -11,6 +11,8 @@ from ..materials import MaterialProperties
 from ..constitutive import ConstitutiveModel
 from ..enums import ConstitutiveLaw
 from ..geometry import GeometryPier, GeometrySpandrel
+from .solvers import LinearSolver
+from .continuation import ContinuationOptions, ContinuationSolver
 from ..utils import calculate_damage_indices, extract_hysteretic_params, calculate_section_ductility, compare_constitutive_laws, distribute_vertical_loads
 
 logger = logging.getLogger(__name__)
@@ -314,6 +316,7 @@ class FiberModel:
         self.constraints: Dict[int, List[int]] = {}  # DOF vincolati
         self.dof_map: Dict[Tuple[int, int], int] = {}  # (node, local_dof) -> global_dof
         self.n_dof = 0
+        self.linear_solver = LinearSolver()
         
     def add_node(self, node_id: int, x: float, y: float) -> int:
         """Aggiunge nodo"""
@@ -385,7 +388,7 @@ class FiberModel:
         s = dy/L
         
         T = np.zeros((6, 6))
-        T[0:2, 0:2] = T[3:4, 3:4] = [[c, s], [-s, c]]
+        T[0:2, 0:2] = T[3:5, 3:5] = [[c, s], [-s, c]]
         T[2, 2] = T[5, 5] = 1.0
         return T
     
@@ -434,14 +437,14 @@ class FiberModel:
         return F
     
     def _extract_element_disp(self, elem: FiberElement) -> np.ndarray:
-        """Estrae spostamenti elemento da soluzione globale"""
+        """Estrae spostamenti elemento (riferimento locale) da soluzione globale"""
         u_elem = np.zeros(6)
         if hasattr(self, 'u_global'):
             dofs = self._element_dof(elem)
             for i, dof in enumerate(dofs):
                 if dof >= 0:
                     u_elem[i] = self.u_global[dof]
-        return u_elem
+        return self._rotation_matrix(elem) @ u_elem
     
     def apply_loads(self, loads: Dict) -> np.ndarray:
         """Applica carichi esterni e ritorna vettore forze"""
@@ -487,7 +490,7 @@ class FiberModel:
             K = self.assemble_stiffness()
             
             # Risolvi incremento
-            du = spsolve(K, R)
+            du = self.linear_solver.solve(K, R)
             
             # Aggiorna spostamenti
             self.u_global += du
@@ -501,8 +504,15 @@ class FiberModel:
         return False
     
     def pushover_analysis(self, vertical_loads: Dict, lateral_pattern: str = 'triangular',
-                         max_drift: float = 0.05, n_steps: int = 100) -> Dict:
-        """Analisi pushover completa"""
+                         max_drift: float = 0.05, n_steps: int = 100,
+                         control: str = 'legacy') -> Dict:
+        """
+        Analisi pushover completa.
+        
+        control: 'legacy' (ricerca iterativa di lambda per ogni spostamento),
+        'displacement' o 'arc_length' (continuazione con una sola sequenza
+        di Newton per passo, segue anche il ramo softening)
+        """
         logger.info("Inizio analisi pushover con modello a fibre")
         
         # Reset stato
@@ -533,6 +543,14 @@ class FiberModel:
         target_disp = max_drift * max(self.nodes[n][1] for n in self.nodes)
         disp_inc = target_disp / n_steps
         
+        if control != 'legacy':
+            self._continuation_pushover(F_vert, F_lat_ref, control_dof, target_disp,
+                                        n_steps, control, results)
+            if results['curve']:
+                results['performance_levels'] = self._extract_performance_levels(results['curve'])
+                results['damage_indices'] = calculate_damage_indices(results)
+            return results
+        
         for step in range(n_steps):
             # Controllo in spostamento
             target = (step + 1) * disp_inc
@@ -599,6 +617,44 @@ class FiberModel:
             
         return results
     
+    def _continuation_pushover(self, F_vert: np.ndarray, F_lat_ref: np.ndarray,
+                               control_dof: int, target_disp: float, n_steps: int,
+                               method: str, results: Dict) -> None:
+        """Pushover con controllo di spostamento o arc-length (modulo continuation)"""
+        height = max(self.nodes[n][1] for n in self.nodes)
+        
+        def internal_force(u):
+            self.u_global = u.copy()
+            return self.assemble_forces()
+        
+        def tangent(u):
+            # Lo stato delle sezioni corrisponde all'ultima chiamata a internal_force(u)
+            return self.assemble_stiffness()
+        
+        def record(state):
+            lam = state['lambda']
+            base_shear = sum(F_lat_ref[self.dof_map[(n, 0)]] * lam
+                             for n in self.nodes if (n, 0) in self.dof_map)
+            results['curve'].append({
+                'top_drift': state['u'][control_dof] / height,
+                'top_displacement': state['u'][control_dof],
+                'base_shear': base_shear,
+                'lambda': lam
+            })
+            results['convergence'].append(state['iterations'])
+            logger.info(f"Step {state['step'] + 1}: drift={results['curve'][-1]['top_drift']:.4f}, "
+                        f"V={base_shear:.1f}")
+            return True
+        
+        options = ContinuationOptions(method=method, control_dof=control_dof,
+                                      target_displacement=target_disp, n_steps=n_steps)
+        solver = ContinuationSolver(options, self.linear_solver)
+        outcome = solver.run(internal_force, tangent, F_lat_ref, self.u_global.copy(),
+                             F_const=F_vert, on_step=record)
+        results['continuation'] = {k: outcome[k] for k in ('method', 'converged', 'n_solves',
+                                                          'stop_reason')}
+        self.u_global = outcome['u']
+    
     def _lateral_pattern(self, pattern: str) -> np.ndarray:
         """Genera pattern di carico laterale"""
         F = np.zeros(self.n_dof)
@@ -915,7 +971,8 @@ def _analyze_fiber(wall_data: Dict, material: MaterialProperties,
         max_drift = options.get('max_drift', 0.05)
         n_steps = options.get('n_steps', 100)
         
-        pushover_results = model.pushover_analysis(vertical, pattern, max_drift, n_steps)
+        control = options.get('pushover_control', 'legacy')
+        pushover_results = model.pushover_analysis(vertical, pattern, max_drift, n_steps, control)
         results.update(pushover_results)
         
     elif analysis_type == 'cyclic':
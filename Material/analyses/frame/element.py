@@ -447,6 +447,24 @@ class FrameElement:
             
         return False
         
+    def reset_state(self):
+        """Riporta l'elemento allo stato elastico iniziale (rigidezza, cerniere, forze)"""
+        self.k_local = self.k_local_elastic.copy()
+        self.state = ElementState()
+        self.forces = {'N': 0.0, 'V': 0.0, 'M_i': 0.0, 'M_j': 0.0}
+        self.displacements = np.zeros(6)
+        self.force_history = []
+        self.displacement_history = []
+        for attr in ('hinge_i', 'hinge_j', 'shear_failure'):
+            self.__dict__.pop(attr, None)
+        
+    def set_material(self, material: MaterialProperties):
+        """Sostituisce il materiale ricalcolando rigidezza elastica e capacità"""
+        self.material = material
+        self.k_local_elastic = self._compute_local_stiffness()
+        self.capacities = self._compute_capacities()
+        self.reset_state()
+        
     def update_stiffness(self, reduction_factor: float = None):
         """
         Aggiorna la rigidezza per comportamento non lineare.
@@ -1,10 +1,15 @@
 # analyses/frame/model.py
+import copy
 import numpy as np
 import logging
 from typing import Dict, List, Tuple, Optional
-from scipy.sparse import lil_matrix, csr_matrix, eye
-from scipy.sparse.linalg import spsolve, eigsh
+from scipy.sparse import csr_matrix, coo_matrix, eye
 from .element import FrameElement
+from ..solvers import LinearSolver, LowRankSolver, mark_modified, matrix_version
+from ..continuation import ContinuationOptions, ContinuationSolver
+from ..recorders import Recorder, make_recorders
+from ..modal import ModalSolver, influence_vectors, participation
+from ..dynamics import frame_time_history, frame_time_history_batch
 from ...materials import MaterialProperties
 from scipy.interpolate import interp1d
 import matplotlib.pyplot as plt
@@ -15,7 +20,7 @@ logger = logging.getLogger(__name__)
 @dataclass
 class AnalysisOptions:
     """Opzioni per l'analisi del telaio"""
-    analysis_type: str = "pushover"  # "static", "modal", "pushover"
+    analysis_type: str = "pushover"  # "static", "modal", "pushover", "time_history", "time_history_batch"
     n_modes: int = 6
     lateral_pattern: str = "triangular"  # "triangular", "uniform", "modal"
     target_drift: float = 0.04
@@ -23,6 +28,19 @@ class AnalysisOptions:
     convergence_tolerance: float = 1e-6
     include_pdelta: bool = True
     include_material_nonlinearity: bool = True
+    # Aggiornamento rigidezza alla formazione delle cerniere:
+    # "reassemble" (rifattorizzazione) o "woodbury" (modifiche a basso rango)
+    hinge_update: str = "reassemble"
+    woodbury_max_rank: int = 60  # DOF modificati prima di rifattorizzare
+    # "incremental" (incremento fisso di carico), "event" (evento-evento),
+    # "displacement" o "arc_length" (continuazione, segue il ramo softening)
+    pushover_mode: str = "incremental"
+    n_steps: int = 100  # continuazione: passi nominali fino al drift target
+    min_strength_ratio: float = 0.5  # continuazione: arresto se V < ratio * V_max
+    # Stato per passo: "curve" (solo curva), "full", "every", "envelope", "npz"
+    record: str = "curve"
+    record_every: int = 1
+    record_path: Optional[str] = None  # cartella per record="npz"
     
 @dataclass
 class LoadCase:
@@ -58,6 +76,12 @@ class EquivalentFrame:
         self.node_dofs = {}  # Mappa nodo -> DOF globali
         self.performance_levels = PerformanceLevel.get_default_levels()
         self.analysis_history = []
+        self.linear_solver = LinearSolver(ordering='amd')  # riuso fattorizzazioni, DOF riordinati
+        self.modal_solver = ModalSolver()  # cache modale (condivisibile tra modelli simili)
+        self._K_constrained = None  # (K_global di riferimento, versione, K vincolata)
+        self._blocks: Optional[Dict] = None  # blocchi 6x6 globali, DOF e mappa di scatter
+        self._lowrank: Optional[LowRankSolver] = None  # attivo durante pushover "woodbury"
+        self._recorders: List[Recorder] = []  # recorder attivi durante il pushover
         
     def add_node(self, node_id: int, x: float, y: float):
         """Aggiunge nodo al telaio"""
@@ -98,63 +122,167 @@ class EquivalentFrame:
         }
         return constraint_types.get(dof_type, [])
             
+    def _element_dofs(self) -> np.ndarray:
+        """DOF globali di ogni elemento (n_elem, 6): [nodo i (u, v, theta), nodo j]"""
+        dofs = [self.node_dofs[elem.i_node] + self.node_dofs[elem.j_node] for elem in self.elements]
+        return np.array(dofs, dtype=np.int64).reshape(-1, 6)
+    
     def assemble_stiffness_matrix(self):
-        """Assembla matrice di rigidezza globale"""
+        """
+        Assembla matrice di rigidezza globale.
+        
+        I blocchi 6x6 globali degli elementi e i loro DOF sono conservati;
+        la CSR è costruita con un'unica chiamata COO e la mappa di scatter
+        COO -> dati CSR permette a _update_element_blocks di aggiornare sul
+        posto solo i blocchi degli elementi modificati (es. cerniere).
+        """
         n_nodes = len(self.nodes)
         n_dof = 3 * n_nodes
         
         # Crea mapping nodo -> DOF
         for i, node_id in enumerate(sorted(self.nodes.keys())):
             self.node_dofs[node_id] = [3*i, 3*i+1, 3*i+2]
-            
-        # Inizializza matrice sparsa
-        self.K_global = lil_matrix((n_dof, n_dof))
         
-        # Assembla contributi elementi
-        for elem in self.elements:
-            dof_i = self.node_dofs[elem.i_node]
-            dof_j = self.node_dofs[elem.j_node]
-            elem_dofs = dof_i + dof_j
-            
-            K_elem = elem.get_global_stiffness()
-            
-            # Aggiungi alla matrice globale
-            for i in range(6):
-                for j in range(6):
-                    self.K_global[elem_dofs[i], elem_dofs[j]] += K_elem[i, j]
-                    
-        # Converti a formato CSR per efficienza
-        self.K_global = self.K_global.tocsr()
+        elem_dofs = self._element_dofs()
+        K_blocks = np.array([elem.get_global_stiffness() for elem in self.elements],
+                            dtype=float).reshape(-1, 6, 6)
+        rows = np.repeat(elem_dofs, 6, axis=1).ravel()
+        cols = np.tile(elem_dofs, (1, 6)).ravel()
+        
+        # Posizione di ogni contributo nell'array data della CSR canonica
+        keys, scatter = np.unique(rows * n_dof + cols, return_inverse=True)
+        scatter = scatter.ravel()
+        data = np.bincount(scatter, weights=K_blocks.ravel(), minlength=len(keys))
+        indptr = np.searchsorted(keys // n_dof, np.arange(n_dof + 1))
+        self.K_global = csr_matrix((data, keys % n_dof, indptr), shape=(n_dof, n_dof))
+        
+        self._blocks = {
+            'n_dof': n_dof,
+            'dofs': elem_dofs,
+            'K': K_blocks,
+            'scatter': scatter.reshape(-1, 36),
+            'owner': self.K_global
+        }
         logger.info(f"Matrice di rigidezza assemblata: {n_dof}x{n_dof}")
-        
+    
+    def _update_element_blocks(self, element_indices) -> None:
+        """
+        Aggiorna sul posto K_global per i soli elementi indicati.
+        
+        Ricalcola i loro blocchi 6x6 e somma la differenza nell'array dei dati
+        della CSR (stesso pattern di sparsità); ricade sull'assemblaggio
+        completo se la matrice non è quella costruita dalla cache.
+        """
+        blocks = self._blocks
+        if blocks is None or blocks['owner'] is not self.K_global \
+                or blocks['K'].shape[0] != len(self.elements):
+            self.assemble_stiffness_matrix()
+            return
+        
+        idx = np.unique(np.asarray(list(element_indices), dtype=np.int64))
+        if idx.size == 0:
+            return
+        K_new = np.array([self.elements[e].get_global_stiffness() for e in idx]).reshape(-1, 6, 6)
+        delta = K_new - blocks['K'][idx]
+        np.add.at(self.K_global.data, blocks['scatter'][idx].ravel(), delta.ravel())
+        blocks['K'][idx] = K_new
+        mark_modified(self.K_global)
+        if self._lowrank is not None:
+            self._lowrank_update(blocks['dofs'][idx], delta)
+        logger.debug(f"Aggiornati {idx.size} blocchi elemento in K_global")
+    
+    def _lowrank_update(self, elem_dofs: np.ndarray, delta: np.ndarray) -> None:
+        """
+        Trasferisce al LowRankSolver la variazione dei blocchi elemento.
+        
+        I DOF vincolati sono esclusi: la penalità domina le loro equazioni
+        e la variazione non altera la soluzione.
+        """
+        rows = np.repeat(elem_dofs, 6, axis=1).ravel()
+        cols = np.tile(elem_dofs, (1, 6)).ravel()
+        vals = delta.ravel()
+        fixed = self._constrained_dofs()
+        keep = ~np.isin(rows, fixed) & ~np.isin(cols, fixed)
+        keep &= vals != 0.0
+        if not np.any(keep):
+            return
+        dofs, inverse = np.unique(np.concatenate([rows[keep], cols[keep]]), return_inverse=True)
+        n_keep = int(np.count_nonzero(keep))
+        D = np.zeros((len(dofs), len(dofs)))
+        np.add.at(D, (inverse[:n_keep], inverse[n_keep:]), vals[keep])
+        self._lowrank.update(dofs, D)
+    
+    def reset_state(self) -> None:
+        """
+        Riporta il modello allo stato elastico dopo pushover o storie non lineari.
+        
+        Solo i blocchi degli elementi con rigidezza modificata vengono
+        ripristinati in K_global: se nessuna cerniera si è formata K e le
+        sue fattorizzazioni restano valide.
+        """
+        changed = [i for i, elem in enumerate(self.elements)
+                   if not np.array_equal(elem.k_local, elem.k_local_elastic)]
+        for elem in self.elements:
+            elem.reset_state()
+        self._lowrank = None
+        self._recorders = []
+        if changed and self.K_global is not None:
+            self._update_element_blocks(changed)
+    
+    def update_material(self, material: MaterialProperties) -> None:
+        """
+        Nuovo materiale su tutti gli elementi con la stessa topologia: K è
+        aggiornata sul posto (stesso pattern di sparsità), M va riassemblata.
+        """
+        for elem in self.elements:
+            elem.set_material(material)
+        if self.K_global is None:
+            self.assemble_stiffness_matrix()
+        else:
+            self._update_element_blocks(range(len(self.elements)))
+    
+    def snapshot(self) -> 'EquivalentFrame':
+        """
+        Copia indipendente del modello nello stato corrente (cerniere comprese).
+        
+        Materiali e servizi di soluzione (linear_solver, modal_solver) sono
+        condivisi; cache delle storie temporali, recorder e aggiornamenti a
+        basso rango non sono copiati.
+        """
+        memo = {id(self.linear_solver): self.linear_solver,
+                id(self.modal_solver): self.modal_solver,
+                id(self._recorders): []}
+        for attr in ('_lowrank', '_dynamic_cache'):
+            if getattr(self, attr, None) is not None:
+                memo[id(getattr(self, attr))] = None
+        for elem in self.elements:
+            memo[id(elem.material)] = elem.material
+        return copy.deepcopy(self, memo)
+    
     def assemble_mass_matrix(self, floor_masses: Dict[int, float]):
-        """Assembla matrice delle masse"""
+        """Assembla matrice delle masse (masse nodali e blocchi elemento in un'unica COO)"""
         n_dof = self.K_global.shape[0]
-        self.M_global = lil_matrix((n_dof, n_dof))
         
-        # Masse concentrate ai nodi
+        # Masse concentrate ai nodi: traslazionali e rotazionale
+        # (momento d'inerzia polare con raggio giratorio stimato 1.0)
+        rows, vals = [], []
         for node_id, mass in floor_masses.items():
             if node_id in self.node_dofs:
-                dofs = self.node_dofs[node_id]
-                # Masse traslazionali
-                self.M_global[dofs[0], dofs[0]] = mass
-                self.M_global[dofs[1], dofs[1]] = mass
-                # Massa rotazionale (momento d'inerzia polare)
-                I_polar = mass * 1.0  # Raggio giratorio stimato
-                self.M_global[dofs[2], dofs[2]] = I_polar
-                
-        # Aggiungi masse distribuite degli elementi
-        for elem in self.elements:
-            elem_mass = elem.get_mass_matrix()
-            dof_i = self.node_dofs[elem.i_node]
-            dof_j = self.node_dofs[elem.j_node]
-            elem_dofs = dof_i + dof_j
-            
-            for i in range(6):
-                for j in range(6):
-                    self.M_global[elem_dofs[i], elem_dofs[j]] += elem_mass[i, j]
-                
-        self.M_global = self.M_global.tocsr()
+                rows.extend(self.node_dofs[node_id])
+                vals.extend([mass, mass, mass * 1.0])
+        rows = np.array(rows, dtype=np.int64)
+        vals = np.array(vals, dtype=float)
+        
+        # Masse distribuite degli elementi
+        elem_dofs = self._element_dofs()
+        M_blocks = np.array([elem.get_mass_matrix() for elem in self.elements],
+                            dtype=float).reshape(-1, 6, 6)
+        all_rows = np.concatenate([rows, np.repeat(elem_dofs, 6, axis=1).ravel()])
+        all_cols = np.concatenate([rows, np.tile(elem_dofs, (1, 6)).ravel()])
+        all_vals = np.concatenate([vals, M_blocks.ravel()])
+        
+        self.M_global = coo_matrix((all_vals, (all_rows, all_cols)), shape=(n_dof, n_dof)).tocsr()
+        self.M_global.sum_duplicates()
         logger.info("Matrice delle masse assemblata")
         
     def apply_constraints(self, K: csr_matrix, F: np.ndarray) -> Tuple[csr_matrix, np.ndarray]:
@@ -176,30 +304,44 @@ class EquivalentFrame:
                     
         return K_mod.tocsr(), F_mod
     
+    def _constrained_stiffness(self) -> csr_matrix:
+        """
+        K con vincoli e perturbazione di stabilità, ricostruita solo quando
+        K_global cambia così da riusarne la fattorizzazione.
+        """
+        cached = self._K_constrained
+        if cached is not None and cached[0] is self.K_global \
+                and cached[1] == matrix_version(self.K_global):
+            return cached[2]
+        
+        n_dof = self.K_global.shape[0]
+        K_mod, _ = self.apply_constraints(self.K_global, np.zeros(n_dof))
+        # Aggiungi piccola perturbazione per stabilità numerica
+        K_mod = (K_mod + eye(n_dof) * 1e-10).tocsr()
+        self._K_constrained = (self.K_global, matrix_version(self.K_global), K_mod)
+        return K_mod
+    
+    def _constrained_dofs(self) -> List[int]:
+        """DOF globali vincolati"""
+        dofs = []
+        for constraint in self.constraints:
+            node_id = constraint['node']
+            if node_id in self.node_dofs:
+                global_dofs = self.node_dofs[node_id]
+                dofs.extend(global_dofs[local_dof] for local_dof in constraint['dofs'])
+        return dofs
+    
     def solve_static(self, forces: Dict[int, np.ndarray]) -> Dict:
         """Risolve analisi statica lineare"""
         if self.K_global is None:
             self.assemble_stiffness_matrix()
         
         n_dof = self.K_global.shape[0]
-        F = np.zeros(n_dof)
-        
-        # Assembla vettore forze
-        for node_id, force in forces.items():
-            if node_id in self.node_dofs:
-                dofs = self.node_dofs[node_id]
-                F[dofs[0]] = force[0] if len(force) >= 1 else 0
-                F[dofs[1]] = force[1] if len(force) >= 2 else 0
-                F[dofs[2]] = force[2] if len(force) >= 3 else 0
-        
-        # Applica vincoli
-        K_mod, F_mod = self.apply_constraints(self.K_global, F)
+        F = self._force_vector(forces)
         
         # Risolvi sistema
         try:
-            # Aggiungi piccola perturbazione per stabilità numerica
-            K_mod = K_mod + eye(n_dof) * 1e-10
-            u = spsolve(K_mod, F_mod)
+            u = self._solve_displacements(F)
             
             # Verifica soluzione
             if np.any(np.isnan(u)) or np.any(np.isinf(u)):
@@ -220,7 +362,34 @@ class EquivalentFrame:
         # Calcola reazioni
         R = self.K_global @ u - F
         
-        # Calcola forze interne elementi
+        return {
+            'displacements': u,
+            'reactions': R,
+            'element_forces': self._element_forces(u),
+            'max_displacement': np.max(np.abs(u))
+        }
+    
+    def _force_vector(self, forces: Dict[int, np.ndarray]) -> np.ndarray:
+        """Vettore globale delle forze nodali [Fx, Fy, Mz]"""
+        F = np.zeros(self.K_global.shape[0])
+        for node_id, force in forces.items():
+            if node_id in self.node_dofs:
+                dofs = self.node_dofs[node_id]
+                F[dofs[0]] = force[0] if len(force) >= 1 else 0
+                F[dofs[1]] = force[1] if len(force) >= 2 else 0
+                F[dofs[2]] = force[2] if len(force) >= 3 else 0
+        return F
+    
+    def _solve_displacements(self, F: np.ndarray) -> np.ndarray:
+        """Spostamenti per la rigidezza corrente (vincoli applicati, senza correzioni)"""
+        F_mod = F.copy()
+        F_mod[self._constrained_dofs()] = 0
+        if self._lowrank is not None:
+            return self._lowrank.solve(F_mod)
+        return self.linear_solver.solve(self._constrained_stiffness(), F_mod)
+    
+    def _element_forces(self, u: np.ndarray) -> List[Dict]:
+        """Forze interne {N, V, M_i, M_j} di ogni elemento"""
         element_forces = []
         for elem in self.elements:
             try:
@@ -232,83 +401,90 @@ class EquivalentFrame:
             except Exception as e:
                 logger.error(f"Errore calcolo forze elemento: {e}")
                 element_forces.append({'N': 0, 'V': 0, 'M_i': 0, 'M_j': 0})
-        
-        return {
-            'displacements': u,
-            'reactions': R,
-            'element_forces': element_forces,
-            'max_displacement': np.max(np.abs(u))
-        }
+        return element_forces
         
     def solve_modal(self, n_modes: int = 6) -> Dict:
-        """Analisi modale per frequenze e modi di vibrare"""
+        """
+        Analisi modale per frequenze e modi di vibrare.
+        
+        Il problema è ridotto ai DOF liberi e risolto da self.modal_solver,
+        che riusa i risultati per matrici invariate e riparte dai modi
+        precedenti dopo piccole modifiche al modello.
+        """
         if self.K_global is None:
             self.assemble_stiffness_matrix()
             
         if self.M_global is None:
             raise ValueError("Matrice delle masse non definita")
             
-        # Applica vincoli
-        K_mod, _ = self.apply_constraints(self.K_global, np.zeros(self.K_global.shape[0]))
+        n_dof = self.K_global.shape[0]
+        fixed = np.array(sorted(set(self._constrained_dofs())), dtype=int)
+        free = np.setdiff1d(np.arange(n_dof), fixed)
         
-        # Risolvi problema agli autovalori generalizzato
+        # Risolvi problema agli autovalori generalizzato sui DOF liberi
         try:
-            eigenvalues, eigenvectors = eigsh(K_mod, k=min(n_modes, K_mod.shape[0]-2), 
-                                            M=self.M_global, sigma=0, which='LM')
-            
-            # Ordina per frequenza crescente
-            idx = eigenvalues.argsort()
-            eigenvalues = eigenvalues[idx]
-            eigenvectors = eigenvectors[:, idx]
-            
+            K_ff = self.K_global[free][:, free].tocsr()
+            M_ff = self.M_global.tocsr()[free][:, free].tocsr()
+            modal = self.modal_solver.solve(K_ff, M_ff, min(n_modes, n_dof - 2))
         except Exception as e:
             logger.error(f"Errore analisi modale: {e}")
             return {
                 'frequencies': np.zeros(n_modes),
                 'periods': np.zeros(n_modes),
-                'mode_shapes': np.zeros((self.K_global.shape[0], n_modes)),
+                'mode_shapes': np.zeros((n_dof, n_modes)),
                 'modal_masses': np.zeros(n_modes)
             }
         
         # Calcola frequenze e periodi
-        omega = np.sqrt(np.abs(eigenvalues))
+        omega = modal['omega']
         frequencies = omega / (2 * np.pi)
         periods = 1 / frequencies
         
-        # Calcola masse modali effettive
-        modal_masses = []
-        participation_factors = []
+        # Modi normalizzati rispetto alla massa, nulli sui DOF vincolati
+        eigenvectors = np.zeros((n_dof, omega.size))
+        eigenvectors[free] = modal['modes']
         
-        for i in range(len(eigenvalues)):
-            phi = eigenvectors[:, i]
-            # Normalizza rispetto alla massa
-            phi = phi / np.sqrt(phi.T @ self.M_global @ phi)
-            eigenvectors[:, i] = phi
-            
-            # Massa modale effettiva (direzione X)
-            r_x = np.zeros(len(phi))
-            r_x[::3] = 1  # DOF in X
-            L_x = phi.T @ self.M_global @ r_x
-            M_eff_x = L_x**2
-            modal_masses.append(M_eff_x)
-            participation_factors.append(L_x)
+        # Partecipazione X/Y: L = phi^T M r, massa efficace L^2 (modi M-normalizzati)
+        part = participation(modal['modes'], M_ff, influence_vectors(n_dof, exclude=fixed)[free])
+        ratios = part['mass_ratios']
             
         return {
             'frequencies': frequencies,
             'periods': periods,
             'mode_shapes': eigenvectors,
-            'modal_masses': modal_masses,
-            'participation_factors': participation_factors
+            'modal_masses': list(part['effective_masses'][:, 0]),
+            'participation_factors': list(part['L'][:, 0]),
+            'participation_factors_y': list(part['L'][:, 1]),
+            'effective_masses_y': list(part['effective_masses'][:, 1]),
+            'mass_participation_x': list(ratios[:, 0]),
+            'mass_participation_y': list(ratios[:, 1]),
+            'total_mass_participation_x': float(ratios[:, 0].sum()),
+            'total_mass_participation_y': float(ratios[:, 1].sum()),
+            'total_mass': {
+                'x_direction': float(part['total_masses'][0]),
+                'y_direction': float(part['total_masses'][1])
+            },
+            'solver': modal['method']
         }
         
     def pushover_analysis(self, lateral_pattern: str = "triangular", 
                          target_drift: float = 0.04,
-                         options: Optional[AnalysisOptions] = None) -> Dict:
-        """Analisi pushover completa con controllo di spostamento"""
+                         options: Optional[AnalysisOptions] = None,
+                         recorders: Optional[List[Recorder]] = None) -> Dict:
+        """
+        Analisi pushover completa con controllo di spostamento.
+        
+        results['steps'] contiene solo le grandezze scalari di ogni passo;
+        lo stato (spostamenti, reazioni, forze negli elementi) va ai
+        recorder (default da options.record) e i loro riepiloghi sono in
+        results['recorders'].
+        """
         
         if options is None:
             options = AnalysisOptions(lateral_pattern=lateral_pattern, 
                                     target_drift=target_drift)
+        if recorders is None:
+            recorders = make_recorders(options.record, options.record_path, options.record_every)
         
         results = {
             'steps': [],
@@ -329,13 +505,72 @@ class EquivalentFrame:
         # Altezza edificio
         H_tot = self._get_building_height()
         
+        # Storia delle cerniere
+        hinge_history = []
+        
+        # Modifiche di rigidezza a basso rango sulla fattorizzazione iniziale
+        if options.hinge_update == "woodbury":
+            if self.K_global is None:
+                self.assemble_stiffness_matrix()
+            self._lowrank = LowRankSolver(self.linear_solver, options.woodbury_max_rank)
+            self._lowrank.set_base(self._constrained_stiffness())
+        elif options.hinge_update != "reassemble":
+            raise ValueError(f"Aggiornamento cerniere non riconosciuto: {options.hinge_update}")
+        
+        self._recorders = list(recorders)
+        for recorder in self._recorders:
+            recorder.start({'n_dof': 3 * len(self.nodes), 'n_elements': len(self.elements)})
+        
+        try:
+            if options.pushover_mode == "event":
+                self._pushover_events(forces, H_tot, options, results, hinge_history)
+            elif options.pushover_mode == "incremental":
+                self._pushover_steps(forces, H_tot, options, results, hinge_history)
+            elif options.pushover_mode in ("displacement", "arc_length"):
+                self._pushover_continuation(forces, H_tot, options, results, hinge_history)
+            else:
+                raise ValueError(f"Modalità pushover non riconosciuta: {options.pushover_mode}")
+        finally:
+            if self._lowrank is not None:
+                results['solver_stats'] = dict(self._lowrank.stats)
+                self._lowrank = None
+            results['recorders'] = {rec.name: rec.finish() for rec in self._recorders}
+            self._recorders = []
+        
+        # Post-processing risultati
+        if len(results['curve']['V_base']) > 2:
+            # Bilinearizzazione
+            results['bilinear'] = self._bilinearize_pushover(results['curve'])
+            
+            # Punto di performance
+            results['performance_point'] = self._find_performance_point_N2(
+                results['curve'], results['bilinear']
+            )
+            
+            # Fattore di duttilità
+            if results['bilinear']:
+                delta_y = results['bilinear']['delta_y']
+                delta_u = results['curve']['delta_top'][-1]
+                results['ductility'] = delta_u / delta_y if delta_y > 0 else 1.0
+        
+        results['hinges'] = hinge_history
+        
+        return results
+        
+    def _record_step(self, results: Dict, step: Dict, solution: Dict) -> None:
+        """Aggiunge le grandezze scalari del passo e passa lo stato ai recorder"""
+        results['steps'].append(step)
+        for recorder in self._recorders:
+            recorder.record(step, solution)
+    
+    def _pushover_steps(self, forces: Dict[int, np.ndarray], H_tot: float,
+                        options: AnalysisOptions, results: Dict,
+                        hinge_history: List[Dict]) -> None:
+        """Passi di carico a incremento fisso, dimezzato alla formazione di cerniere"""
         # Incremento di carico
         lambda_increment = 0.01
         lambda_current = 0.0
         
-        # Storia delle cerniere
-        hinge_history = []
-        
         for step in range(options.max_iterations):
             lambda_current += lambda_increment
             
@@ -367,15 +602,14 @@ class EquivalentFrame:
                 results['curve']['delta_top'].append(delta_top)
                 results['curve']['drift'].append(drift)
                 
-                results['steps'].append({
+                self._record_step(results, {
                     'step': step,
                     'lambda': lambda_current,
-                    'solution': solution,
                     'hinges': hinges_formed,
                     'V_base': V_base,
                     'delta_top': delta_top,
                     'drift': drift
-                })
+                }, solution)
                 
                 # Verifica livelli di prestazione
                 for level in self.performance_levels:
@@ -402,26 +636,273 @@ class EquivalentFrame:
                 logger.error(f"Errore al passo {step}: {e}")
                 break
         
-        # Post-processing risultati
-        if len(results['curve']['V_base']) > 2:
-            # Bilinearizzazione
-            results['bilinear'] = self._bilinearize_pushover(results['curve'])
-            
-            # Punto di performance
-            results['performance_point'] = self._find_performance_point_N2(
-                results['curve'], results['bilinear']
-            )
-            
-            # Fattore di duttilità
-            if results['bilinear']:
-                delta_y = results['bilinear']['delta_y']
-                delta_u = results['curve']['delta_top'][-1]
-                results['ductility'] = delta_u / delta_y if delta_y > 0 else 1.0
+    def _pushover_events(self, forces: Dict[int, np.ndarray], H_tot: float,
+                         options: AnalysisOptions, results: Dict,
+                         hinge_history: List[Dict]) -> None:
+        """
+        Pushover evento-evento (analisi lineare sequenziale).
+        
+        Per ogni stato di rigidezza si risolve una sola volta il carico
+        unitario; le forze crescono linearmente con il moltiplicatore, per cui
+        l'incremento che porta il prossimo elemento alla capacità si ricava
+        dalle sole forze correnti (radice scalare, senza nuove soluzioni).
+        Si salta direttamente all'evento, si inserisce la cerniera e si
+        prosegue fino al drift target: la curva è esatta ai punti di rottura.
+        """
+        F_unit = self._force_vector(forces)
+        n_dof = len(F_unit)
+        u_tot = np.zeros(n_dof)
+        R_tot = np.zeros(n_dof)
+        f_tot = [{'N': 0.0, 'V': 0.0, 'M_i': 0.0, 'M_j': 0.0} for _ in self.elements]
+        lambda_current = 0.0
+        formed = set()  # (elemento, posizione) già plasticizzati
+        n_solves = 0
         
-        results['hinges'] = hinge_history
+        top_node = max(self.nodes.items(), key=lambda x: x[1][1])[0] if self.nodes else None
+        delta_target = options.target_drift * H_tot
         
-        return results
+        for step in range(options.max_iterations):
+            try:
+                u_unit = self._solve_displacements(F_unit)
+                n_solves += 1
+                if not np.all(np.isfinite(u_unit)):
+                    logger.warning("Soluzione evento-evento non finita, interruzione")
+                    break
+                R_unit = self.K_global @ u_unit - F_unit
+                f_unit = [dict(f) for f in self._element_forces(u_unit)]
+                
+                # Incremento per il drift target (spostamento in sommità lineare)
+                d_end = np.inf
+                if top_node is not None and H_tot > 0:
+                    dof_x = self.node_dofs[top_node][0]
+                    a, b = u_tot[dof_x], u_unit[dof_x]
+                    roots = [(sign * delta_target - a) / b for sign in (1.0, -1.0) if b != 0]
+                    roots = [r for r in roots if r >= 0]
+                    d_end = min(roots) if roots else np.inf
+                
+                # Prossimo evento: minimo incremento che porta un DCR a 1
+                d_event, events = self._next_hinge_events(f_tot, f_unit, formed, d_end)
+                if not np.isfinite(d_event) and not np.isfinite(d_end):
+                    logger.warning("Nessun evento né drift target raggiungibile")
+                    break
+                last = d_event >= d_end
+                d_lambda = d_end if last else d_event
+                
+                # Salto allo stato dell'evento
+                lambda_current += d_lambda
+                u_tot += d_lambda * u_unit
+                R_tot += d_lambda * R_unit
+                for f0, f1 in zip(f_tot, f_unit):
+                    for key in f0:
+                        f0[key] += d_lambda * f1.get(key, 0.0)
+                
+                hinges_formed = [] if last else events
+                for hinge in hinges_formed:
+                    hinge['lambda'] = lambda_current
+                    formed.add((hinge['element'], hinge['location']))
+                
+                V_base = self._calculate_base_shear(R_tot)
+                delta_top = self._calculate_top_displacement(u_tot)
+                drift = delta_top / H_tot if H_tot > 0 else 0
+                
+                results['curve']['V_base'].append(V_base)
+                results['curve']['delta_top'].append(delta_top)
+                results['curve']['drift'].append(drift)
+                self._record_step(results, {
+                    'step': step,
+                    'lambda': lambda_current,
+                    'hinges': hinges_formed,
+                    'V_base': V_base,
+                    'delta_top': delta_top,
+                    'drift': drift
+                }, {
+                    'displacements': u_tot,
+                    'reactions': R_tot,
+                    'element_forces': f_tot,
+                    'max_displacement': np.max(np.abs(u_tot)) if n_dof else 0.0
+                })
+                
+                for level in self.performance_levels:
+                    if drift >= level.drift_limit and level.name not in results['performance_levels']:
+                        results['performance_levels'][level.name] = {
+                            'V_base': V_base,
+                            'delta_top': delta_top,
+                            'drift': drift,
+                            'step': step
+                        }
+                
+                if last:
+                    logger.info(f"Raggiunto drift target: {drift:.3f}")
+                    break
+                
+                # Cerniere all'evento e nuova rigidezza per il tratto successivo
+                self._update_model_with_hinges(hinges_formed)
+                hinge_history.extend(hinges_formed)
+                
+            except Exception as e:
+                logger.error(f"Errore all'evento {step}: {e}")
+                break
         
+        results['n_solves'] = n_solves
+        logger.info(f"Pushover evento-evento: {len(hinge_history)} cerniere, {n_solves} soluzioni")
+    
+    def _pushover_continuation(self, forces: Dict[int, np.ndarray], H_tot: float,
+                               options: AnalysisOptions, results: Dict,
+                               hinge_history: List[Dict]) -> None:
+        """
+        Pushover a controllo di spostamento o arc-length (modulo continuation).
+        
+        Le cerniere formate alla fine di un passo riducono la rigidezza
+        secante: il passo successivo ristabilisce l'equilibrio a spostamento
+        vincolato e il moltiplicatore può diminuire, per cui il degrado
+        viene tracciato invece di interrompere l'analisi.
+        """
+        F_ref = self._force_vector(forces)
+        F_ref[self._constrained_dofs()] = 0
+        top_node = max(self.nodes.items(), key=lambda x: x[1][1])[0]
+        control_dof = self.node_dofs[top_node][0]
+        
+        # Verso dello spostamento in sommità prodotto dal pattern
+        u_probe = self._solve_displacements(F_ref)
+        direction = 1.0 if u_probe[control_dof] >= 0 else -1.0
+        
+        formed = set()
+        
+        def internal_force(u):
+            return self._constrained_stiffness() @ u
+        
+        def linear_solve(u, rhs):
+            if self._lowrank is not None:
+                return self._lowrank.solve(rhs)
+            return self.linear_solver.solve(self._constrained_stiffness(), rhs)
+        
+        def on_step(state):
+            step, u, lam = state['step'], state['u'], state['lambda']
+            solution = {
+                'displacements': u,
+                'reactions': self.K_global @ u - lam * F_ref,
+                'element_forces': self._element_forces(u),
+                'max_displacement': np.max(np.abs(u)) if len(u) else 0.0
+            }
+            
+            # Cerniere a fine passo (una per componente)
+            hinges_formed = [h for h in self._check_hinges(solution)
+                             if (h['element'], h['location']) not in formed]
+            for hinge in hinges_formed:
+                hinge['lambda'] = lam
+                formed.add((hinge['element'], hinge['location']))
+            
+            V_base = self._calculate_base_shear(solution['reactions'])
+            delta_top = self._calculate_top_displacement(u)
+            drift = delta_top / H_tot if H_tot > 0 else 0
+            
+            results['curve']['V_base'].append(V_base)
+            results['curve']['delta_top'].append(delta_top)
+            results['curve']['drift'].append(drift)
+            self._record_step(results, {
+                'step': step,
+                'lambda': lam,
+                'hinges': hinges_formed,
+                'V_base': V_base,
+                'delta_top': delta_top,
+                'drift': drift
+            }, solution)
+            
+            for level in self.performance_levels:
+                if drift >= level.drift_limit and level.name not in results['performance_levels']:
+                    results['performance_levels'][level.name] = {
+                        'V_base': V_base,
+                        'delta_top': delta_top,
+                        'drift': drift,
+                        'step': step
+                    }
+            
+            if hinges_formed:
+                self._update_model_with_hinges(hinges_formed)
+                hinge_history.extend(hinges_formed)
+            
+            if V_base < options.min_strength_ratio * max(results['curve']['V_base']):
+                logger.warning("Degrado della capacità oltre la soglia: fine analisi")
+                return False
+            return True
+        
+        cont_options = ContinuationOptions(
+            method=options.pushover_mode,
+            control_dof=control_dof,
+            target_displacement=direction * options.target_drift * H_tot,
+            n_steps=options.n_steps
+        )
+        solver = ContinuationSolver(cont_options, self.linear_solver)
+        outcome = solver.run(internal_force, None, F_ref, np.zeros(len(F_ref)),
+                             on_step=on_step, linear_solve=linear_solve)
+        results['continuation'] = {k: outcome[k] for k in ('method', 'converged', 'n_solves',
+                                                          'stop_reason')}
+    
+    def _next_hinge_events(self, f_tot: List[Dict], f_unit: List[Dict],
+                           formed: set, d_max: float) -> Tuple[float, List[Dict]]:
+        """
+        Minimo incremento di moltiplicatore che porta a capacità una
+        componente non ancora plasticizzata, e le cerniere che si formano.
+        
+        La domanda è lineare nell'incremento; la capacità dei maschi dipende
+        dallo sforzo normale (anch'esso lineare), per cui la prima radice di
+        domanda - capacità si isola per campionamento e si affina con brentq.
+        """
+        candidates = []
+        for i, elem in enumerate(self.elements):
+            f0, f1 = f_tot[i], f_unit[i]
+            
+            def capacity(x, elem=elem, f0=f0, f1=f1):
+                if elem.type == "pier":
+                    return self._pier_capacity(elem, f0['N'] + x * f1['N'])
+                return self._spandrel_capacity(elem)
+            
+            components = (('i', 'flexure', 'M_i', 'M_max'),
+                          ('j', 'flexure', 'M_j', 'M_max'),
+                          ('center', 'shear', 'V', 'V_max'))
+            for location, kind, force_key, cap_key in components:
+                if (i, location) in formed:
+                    continue
+                
+                def excess(x, force_key=force_key, cap_key=cap_key):
+                    demand = abs(f0[force_key] + x * f1[force_key])
+                    cap = capacity(x)[cap_key]
+                    return demand - cap if cap > 0 else np.inf
+                
+                x = self._first_root(excess, d_max)
+                if x is not None:
+                    candidates.append((x, {'element': i, 'location': location, 'type': kind}))
+        
+        if not candidates:
+            return np.inf, []
+        d_event = min(c[0] for c in candidates)
+        tol = 1e-9 * max(d_event, 1e-12)
+        events = [h for x, h in candidates if x <= d_event + tol]
+        for hinge in events:
+            hinge['DCR'] = 1.0
+        return d_event, events
+    
+    @staticmethod
+    def _first_root(fun, d_max: float, n_samples: int = 64) -> Optional[float]:
+        """Primo x in [0, d_max] con fun(x) >= 0 (None se assente)"""
+        from scipy.optimize import brentq
+        
+        if fun(0.0) >= 0:
+            return 0.0
+        hi = d_max if np.isfinite(d_max) else 1.0
+        while True:
+            xs = np.linspace(0.0, hi, n_samples + 1)
+            vals = np.array([fun(x) for x in xs])
+            hit = np.nonzero(vals >= 0)[0]
+            if hit.size:
+                k = hit[0]
+                if not np.isfinite(vals[k]):
+                    return float(xs[k])
+                return float(brentq(fun, xs[k - 1], xs[k], xtol=1e-14 * max(hi, 1.0)))
+            if np.isfinite(d_max) or hi > 1e12:
+                return None
+            hi *= 10.0
+    
     def _get_lateral_pattern(self, pattern_type: str) -> Dict[int, np.ndarray]:
         """Genera pattern di carico laterale"""
         if pattern_type == "triangular":
@@ -574,42 +1055,11 @@ class EquivalentFrame:
         
     def _pier_capacity(self, elem: FrameElement, N: float) -> Dict:
         """Calcola capacità maschio murario secondo NTC2018"""
-        geom = elem.geometry
-        mat = elem.material.get_design_values()
-        
-        # Tensione normale media
-        sigma0 = abs(N) / geom.area if geom.area > 0 else 0
-        
-        # Momento ultimo (presso-flessione)
-        if sigma0 < 0.85 * mat['fcd'] * 1000:  # kPa
-            l = geom.length
-            t = geom.thickness
-            fcd = mat['fcd'] * 1000  # kPa
-            
-            # Formula NTC per muratura non armata
-            Mu = (l * t * sigma0 / 2) * (1 - sigma0 / (0.85 * fcd))
-        else:
-            Mu = 0
-            
-        # Taglio ultimo - minimo tra tre meccanismi
-        fvd0 = mat['fvd0'] * 1000  # kPa
-        
-        # 1. Taglio-scorrimento
-        Vt1 = geom.length * geom.thickness * fvd0 * np.sqrt(1 + sigma0 / fvd0)
-        
-        # 2. Taglio-trazione diagonale
-        b = geom.shape_factor  # fattore di forma
-        Vt2 = geom.length * geom.thickness * b * (fvd0 + 0.4 * sigma0)
-        
-        # 3. Taglio-presso flessione
-        h0 = geom.h0 if hasattr(geom, 'h0') else geom.height * 0.5
-        Vt3 = Mu / h0 if h0 > 0 else 0
-        
-        V_max = min(Vt1, Vt2, Vt3)
+        M_max, V_max, Vt3 = pier_strength(*pier_strength_params(elem), N)
         
         return {
-            'M_max': max(Mu, 0),
-            'V_max': max(V_max, 0),
+            'M_max': float(M_max),
+            'V_max': float(V_max),
             'mechanism': 'shear' if V_max < Vt3 else 'flexure'
         }
         
@@ -679,8 +1129,8 @@ class EquivalentFrame:
                 elem.k_local[1, 4] *= reduction
                 elem.k_local[4, 1] *= reduction
                 
-        # Riassembla matrice di rigidezza globale
-        self.assemble_stiffness_matrix()
+        # Aggiorna solo i blocchi degli elementi con nuove cerniere
+        self._update_element_blocks(hinge['element'] for hinge in hinges)
         
     def _calculate_base_shear(self, reactions: np.ndarray) -> float:
         """Calcola taglio totale alla base"""
@@ -931,6 +1381,42 @@ class EquivalentFrame:
         logger.info(f"Risultati esportati in {filename}")
 
 
+def pier_strength_params(elem: FrameElement) -> Tuple[float, ...]:
+    """Parametri di pier_strength: l, t, area, fattore di forma, h0, fcd e fvd0 [kPa]"""
+    geom = elem.geometry
+    mat = elem.material.get_design_values()
+    h0 = geom.h0 if hasattr(geom, 'h0') else geom.height * 0.5
+    return (geom.length, geom.thickness, geom.area, geom.shape_factor, h0,
+            mat['fcd'] * 1000, mat['fvd0'] * 1000)
+
+
+def pier_strength(l, t, area, b, h0, fcd, fvd0, N):
+    """
+    Momento e taglio ultimi del maschio (NTC2018) per sforzo normale N.
+    
+    Accetta scalari o array (un valore per maschio, area e h0 positivi):
+    le storie temporali non lineari verificano tutti i maschi a ogni
+    iterazione.
+    
+    Returns:
+        (M_max, V_max, Vt3) con Vt3 taglio da presso-flessione
+    """
+    # Tensione normale media
+    sigma0 = np.abs(N) / area
+    
+    # Momento ultimo (presso-flessione), nullo oltre 0.85 fcd
+    ratio = sigma0 / (0.85 * fcd)
+    Mu = (l * t * sigma0 / 2) * (1 - ratio) * (ratio < 1)
+    
+    # Taglio ultimo - minimo tra tre meccanismi
+    Vt1 = l * t * fvd0 * np.sqrt(1 + sigma0 / fvd0)   # taglio-scorrimento
+    Vt2 = l * t * b * (fvd0 + 0.4 * sigma0)           # taglio-trazione diagonale
+    Vt3 = Mu / h0                                     # taglio-presso flessione
+    V_max = np.minimum(np.minimum(Vt1, Vt2), Vt3)
+    
+    return np.maximum(Mu, 0.0), np.maximum(V_max, 0.0), Vt3
+
+
 def create_frame_from_wall_data(wall_data: Dict, material: MaterialProperties) -> EquivalentFrame:
     """Crea modello di telaio equivalente da dati parete"""
     frame = EquivalentFrame()
@@ -1053,20 +1539,128 @@ def create_frame_from_wall_data(wall_data: Dict, material: MaterialProperties) -
     return frame
 
 
+def frame_floor_masses(frame: EquivalentFrame, wall_data: Dict) -> Dict[int, float]:
+    """Masse nodali [kg] dai dati di piano di wall_data ('floors': numero o lista)"""
+    floor_masses = {}
+    floors_data = wall_data.get('floors', [])
+
+    # Se floors è un intero (numero piani) invece di lista
+    if isinstance(floors_data, int):
+        n_floors = floors_data
+        H = wall_data.get('height', 3.0)
+        h_floor = H / n_floors if n_floors > 0 else H
+        default_mass = 10000  # kg per piano (stima)
+
+        for nid, coord in frame.nodes.items():
+            # Assegna massa ai nodi non alla base
+            if coord[1] > 0.01:
+                floor_masses[nid] = default_mass / 2  # Divide per nodi sx e dx
+
+    elif isinstance(floors_data, list):
+        for floor in floors_data:
+            # Gestisce sia lista di float (quote) che lista di dict
+            if isinstance(floor, (int, float)):
+                level = float(floor)
+                mass = 1000  # massa default per piano
+            else:
+                level = floor.get('level', 0)
+                mass = floor.get('mass', 1000)
+
+            level_nodes = [nid for nid, coord in frame.nodes.items()
+                          if abs(coord[1] - level) < 0.01]
+
+            if level_nodes:
+                mass_per_node = mass / len(level_nodes)
+                for nid in level_nodes:
+                    floor_masses[nid] = mass_per_node
+
+    # Se non ci sono masse, usa default
+    if not floor_masses:
+        for nid, coord in frame.nodes.items():
+            if coord[1] > 0.01:
+                floor_masses[nid] = 5000  # kg default
+
+    return floor_masses
+
+
+class FrameModelBuilder:
+    """
+    Costruttore del telaio per ModelCache: geometria e masse separate,
+    aggiornamento del materiale sul posto e reset dello stato elastico.
+    """
+    
+    kind = 'frame'
+    
+    @staticmethod
+    def parts(wall_data: Dict, material: MaterialProperties, loads: Optional[Dict]) -> Dict:
+        floors = wall_data.get('floors', [])
+        masses = None
+        geometry = dict(wall_data)
+        if isinstance(floors, list):
+            # Le masse dei piani non cambiano la geometria (solo le quote)
+            masses = [f.get('mass') if isinstance(f, dict) else None for f in floors]
+            geometry['floors'] = [{k: v for k, v in f.items() if k != 'mass'}
+                                  if isinstance(f, dict) else f for f in floors]
+        return {'geometry': geometry, 'material': material, 'masses': masses, 'loads': loads}
+    
+    @staticmethod
+    def build(wall_data: Dict, material: MaterialProperties) -> EquivalentFrame:
+        frame = create_frame_from_wall_data(wall_data, material)
+        frame.assemble_stiffness_matrix()
+        frame.assemble_mass_matrix(frame_floor_masses(frame, wall_data))
+        return frame
+    
+    @staticmethod
+    def update_material(frame: EquivalentFrame, wall_data: Dict,
+                        material: MaterialProperties) -> None:
+        frame.update_material(material)
+        frame.assemble_mass_matrix(frame_floor_masses(frame, wall_data))
+    
+    @staticmethod
+    def update_masses(frame: EquivalentFrame, wall_data: Dict) -> None:
+        frame.assemble_mass_matrix(frame_floor_masses(frame, wall_data))
+    
+    @staticmethod
+    def reset(frame: EquivalentFrame) -> None:
+        frame.reset_state()
+
+
 def _analyze_frame(wall_data: Dict, material: MaterialProperties,
                    loads: Dict, options: Dict) -> Dict:
-    """Funzione principale per analisi con telaio equivalente"""
+    """
+    Funzione principale per analisi con telaio equivalente.
+    
+    Con options['model_cache'] il modello è riusato e modificato sul posto
+    dalle analisi successive sulla stessa parete: results['model'] è allora
+    una copia (snapshot) con lo stato di questa analisi, che le chiamate
+    successive non alterano.
+    """
     logger.info("Avvio analisi con metodo del telaio equivalente")
     
-    # Crea modello
-    frame = create_frame_from_wall_data(wall_data, material)
+    # Crea modello (o riusa quello in cache ricostruendo solo le parti modificate)
+    model_info = None
+    if options.get('model_cache') is not None:
+        frame, model_info = options['model_cache'].get(FrameModelBuilder, wall_data, material, loads)
+    else:
+        frame = create_frame_from_wall_data(wall_data, material)
+    if options.get('modal_solver') is not None:
+        # Servizio modale condiviso: riuso dei modi tra analisi parametriche
+        frame.modal_solver = options['modal_solver']
     
     # Opzioni analisi
     analysis_options = AnalysisOptions(
         analysis_type=options.get('analysis_type', 'pushover'),
         lateral_pattern=options.get('lateral_pattern', 'triangular'),
         target_drift=options.get('target_drift', 0.04),
-        n_modes=options.get('n_modes', 6)
+        n_modes=options.get('n_modes', 6),
+        hinge_update=options.get('hinge_update', 'reassemble'),
+        woodbury_max_rank=options.get('woodbury_max_rank', 60),
+        pushover_mode=options.get('pushover_mode', 'incremental'),
+        n_steps=options.get('n_steps', 100),
+        min_strength_ratio=options.get('min_strength_ratio', 0.5),
+        record=options.get('record', 'curve'),
+        record_every=options.get('record_every', 1),
+        record_path=options.get('record_path')
     )
     
     # Risultati
@@ -1075,6 +1669,8 @@ def _analyze_frame(wall_data: Dict, material: MaterialProperties,
         'model': frame,
         'analyses': {}
     }
+    if model_info is not None:
+        results['model_cache'] = model_info
     
     # Analisi statica (carichi verticali)
     if 'vertical' in loads and loads['vertical']:
@@ -1098,54 +1694,18 @@ def _analyze_frame(wall_data: Dict, material: MaterialProperties,
             static_results = frame.solve_static(V_load)
             results['analyses']['static'] = static_results
         
-    # Assembla matrice di rigidezza
-    frame.assemble_stiffness_matrix()
+    # Assembla matrice di rigidezza (già assemblata per i modelli in cache)
+    if model_info is None:
+        frame.assemble_stiffness_matrix()
+
+    # Masse di piano (modale, pushover e storie temporali)
+    if analysis_options.analysis_type in ['modal', 'pushover', 'time_history', 'time_history_batch'] \
+            and model_info is None:
+        frame.assemble_mass_matrix(frame_floor_masses(frame, wall_data))
 
     # Analisi modale
     if analysis_options.analysis_type in ['modal', 'pushover']:
         logger.info(f"Esecuzione analisi modale ({analysis_options.n_modes} modi)")
-
-        # Masse di piano
-        floor_masses = {}
-        floors_data = wall_data.get('floors', [])
-
-        # Se floors è un intero (numero piani) invece di lista
-        if isinstance(floors_data, int):
-            n_floors = floors_data
-            H = wall_data.get('height', 3.0)
-            h_floor = H / n_floors if n_floors > 0 else H
-            default_mass = 10000  # kg per piano (stima)
-
-            for nid, coord in frame.nodes.items():
-                # Assegna massa ai nodi non alla base
-                if coord[1] > 0.01:
-                    floor_masses[nid] = default_mass / 2  # Divide per nodi sx e dx
-
-        elif isinstance(floors_data, list):
-            for floor in floors_data:
-                # Gestisce sia lista di float (quote) che lista di dict
-                if isinstance(floor, (int, float)):
-                    level = float(floor)
-                    mass = 1000  # massa default per piano
-                else:
-                    level = floor.get('level', 0)
-                    mass = floor.get('mass', 1000)
-
-                level_nodes = [nid for nid, coord in frame.nodes.items()
-                              if abs(coord[1] - level) < 0.01]
-
-                if level_nodes:
-                    mass_per_node = mass / len(level_nodes)
-                    for nid in level_nodes:
-                        floor_masses[nid] = mass_per_node
-
-        # Se non ci sono masse, usa default
-        if not floor_masses:
-            for nid, coord in frame.nodes.items():
-                if coord[1] > 0.01:
-                    floor_masses[nid] = 5000  # kg default
-
-        frame.assemble_mass_matrix(floor_masses)
         modal_results = frame.solve_modal(analysis_options.n_modes)
         results['analyses']['modal'] = modal_results
         
@@ -1178,6 +1738,30 @@ def _analyze_frame(wall_data: Dict, material: MaterialProperties,
             frame.plot_pushover_curve(pushover_results, 
                                     filename=options.get('plot_filename'))
             
+    # Storie temporali (singola o insieme di accelerogrammi)
+    if analysis_options.analysis_type == 'time_history':
+        logger.info("Esecuzione analisi time-history")
+        results['analyses']['time_history'] = frame_time_history(
+            frame, options.get('accelerogram', []), options.get('dt', 0.01),
+            options.get('excitation_dir', 'y'), options.get('accel_units', 'mps2'),
+            integrator=options.get('integrator', 'auto'),
+            n_modes=analysis_options.n_modes,
+            output_dofs=options.get('output_dofs'),
+            output=options.get('output', 'lists'),
+            output_dtype=options.get('output_dtype', 'float64'),
+            output_every=options.get('output_every', 1),
+            output_path=options.get('output_path'),
+            nonlinear_options=options.get('nonlinear')
+        )
+    elif analysis_options.analysis_type == 'time_history_batch':
+        logger.info(f"Esecuzione time-history su {len(options.get('accelerograms', []))} accelerogrammi")
+        results['analyses']['time_history_batch'] = frame_time_history_batch(
+            frame, options.get('accelerograms', []), options.get('dt', 0.01),
+            options.get('excitation_dir', 'y'), options.get('accel_units', 'mps2'),
+            integrator=options.get('integrator', 'auto'),
+            n_workers=options.get('n_workers')
+        )
+            
     # Esporta risultati se richiesto
     if 'export_filename' in options:
         frame.export_results(results, options['export_filename'])
@@ -1199,6 +1783,10 @@ def _analyze_frame(wall_data: Dict, material: MaterialProperties,
             'performance_levels': list(pushover['performance_levels'].keys())
         }
         
+    # Il modello in cache appartiene alla cache: al chiamante una copia
+    if model_info is not None:
+        results['model'] = frame.snapshot()
+        
     logger.info("Analisi con telaio equivalente completata")
     
     return results
\ No newline at end of file
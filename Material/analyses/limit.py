@@ -7,6 +7,7 @@ from scipy.optimize import minimize, minimize_scalar
 from ..enums import KinematicMechanism
 from ..materials import MaterialProperties
 from ..utils import probabilistic_limit_analysis, sensitivity_analysis_limit
+from .result_cache import cached_analysis, engine_version
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,7 +19,13 @@ class LimitAnalysis:
     material: MaterialProperties
     
     def analyze_all_mechanisms(self, loads: Dict) -> Dict:
-        """Analizza tutti i 24 meccanismi e trova il minimo alpha"""
+        """Analizza tutti i 24 meccanismi e trova il minimo alpha (con cache risultati)"""
+        return cached_analysis('LIMIT_MECHANISMS', engine_version(),
+                               lambda: self._compute_all_mechanisms(loads),
+                               self.geometry, self.material, loads)
+
+    def _compute_all_mechanisms(self, loads: Dict) -> Dict:
+        """Calcolo dei meccanismi (analyze_all_mechanisms senza cache)"""
         results = {}
         mechanism_results = {}
         min_alpha = float('inf')
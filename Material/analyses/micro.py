@@ -9,6 +9,7 @@ from scipy.spatial.distance import cdist
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle, Polygon
 from matplotlib.collections import LineCollection
+from .solvers import LinearSolver
 
 logger = logging.getLogger(__name__)
 
@@ -61,6 +62,9 @@ class MicroModel:
     nodes: Dict[int, np.ndarray] = field(default_factory=dict)
     dof_map: Dict[int, Tuple[int, int]] = field(default_factory=dict)
     K_global: Optional[csr_matrix] = None
+    linear_solver: LinearSolver = field(default_factory=lambda: LinearSolver(ordering='amd'),
+                                        repr=False)
+    report_ordering: bool = False  # confronto nnz(L) con/senza riordino dei DOF
     
     def generate_micro_mesh(self, wall_data: Dict, block_size: Dict):
         """Genera mesh micro dettagliata con blocchi, malta e interfacce"""
@@ -371,7 +375,8 @@ class MicroModel:
         
         # Risolvi sistema
         logger.info("Risoluzione sistema lineare...")
-        u = spsolve(K_mod, F_mod)
+        u = self.linear_solver.solve(K_mod, F_mod)
+        ordering_report = self.linear_solver.ordering_report(K_mod) if self.report_ordering else None
         
         # Calcola spostamenti e deformazioni
         displacements = self._extract_displacements(u)
@@ -394,7 +399,9 @@ class MicroModel:
             'reactions': reactions,
             'max_displacement': np.max(np.abs(u)),
             'n_damaged_elements': len(damage['crushing']) + len(damage['cracking']),
-            'n_failed_interfaces': len(damage['sliding'])
+            'n_failed_interfaces': len(damage['sliding']),
+            'nnz_L': self.linear_solver.stats['nnz_L'],
+            'ordering_report': ordering_report
         }
         
         logger.info(f"Analisi completata: max spostamento = {results['max_displacement']:.3e} m")
@@ -1159,6 +1166,8 @@ def analyze_micro(wall_data: Dict, material: Dict, loads: Dict,
     
     # Crea modello
     model = MicroModel(block_props, mortar_props, interface_props)
+    model.linear_solver = LinearSolver(ordering=options.get('dof_ordering', 'amd'))
+    model.report_ordering = options.get('report_ordering', False)
     
     # Genera mesh
     model.generate_micro_mesh(wall_data, block_size)
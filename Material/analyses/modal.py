@@ -0,0 +1,265 @@
+# analyses/modal.py
+"""
+Servizio di analisi modale con riuso tra analisi successive.
+
+ModalSolver risolve K phi = lambda M phi per i primi modi e conserva,
+per ogni coppia (K, M) risolta, autovalori, modi e fattorizzazione di
+K - sigma M:
+
+    'cached'        stessi dati di K e M (checksum): risultato riusato
+    'lobpcg'        stessa dimensione ma dati modificati (studi parametrici,
+                    piccole modifiche al modello): LOBPCG con i modi
+                    precedenti come sottospazio iniziale e la fattorizzazione
+                    precedente come precondizionatore
+    'shift_invert'  Lanczos shift-invert (eigsh con sigma) sulla
+                    fattorizzazione di K - sigma M, ottenuta dal LinearSolver
+                    (per sigma = 0 condivide la cache delle analisi statiche)
+
+Il riavvio LOBPCG è accettato solo se l'errore all'indietro di tutte le
+autocoppie rispetta la tolleranza, altrimenti si ripiega sullo
+shift-invert.
+
+participation() calcola in forma vettoriale fattori di partecipazione,
+masse modali efficaci e rapporti di massa per più direzioni.
+"""
+
+import logging
+import warnings
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from scipy.linalg import eigh
+from scipy.sparse import csr_matrix, issparse
+from scipy.sparse.linalg import LinearOperator, eigsh, lobpcg
+
+from .solvers import LinearSolver
+
+logger = logging.getLogger(__name__)
+
+
+def influence_vectors(n: int, dofs_per_node: int = 3,
+                      exclude: Optional[np.ndarray] = None) -> np.ndarray:
+    """Vettori di trascinamento (n, 2) per X e Y (DOF 0::3 e 1::3), nulli sui DOF esclusi"""
+    R = np.zeros((n, 2))
+    R[0::dofs_per_node, 0] = 1.0
+    R[1::dofs_per_node, 1] = 1.0
+    if exclude is not None and len(exclude):
+        R[np.asarray(exclude, dtype=int)] = 0.0
+    return R
+
+
+def participation(modes: np.ndarray, M, R: np.ndarray) -> Dict:
+    """
+    Partecipazione modale per le direzioni di R (colonne).
+
+    Args:
+        modes: Modi (n, k)
+        M: Matrice delle masse (n, n)
+        R: Vettori di trascinamento (n, d)
+
+    Returns:
+        Dict con 'L' = Phi^T M R (k, d), 'modal_masses' m* = diag(Phi^T M Phi),
+        'gamma' = L / m*, 'effective_masses' = L^2 / m*, 'total_masses' =
+        diag(R^T M R) e 'mass_ratios' = masse efficaci / massa totale.
+    """
+    modes = np.asarray(modes, dtype=float).reshape(M.shape[0], -1)
+    R = np.asarray(R, dtype=float).reshape(M.shape[0], -1)
+    MR = M @ R
+    L = modes.T @ MR
+    m_star = np.einsum('ij,ij->j', modes, M @ modes)
+    safe = np.where(m_star > 0, m_star, np.inf)[:, None]
+    m_eff = L ** 2 / safe
+    total = np.einsum('ij,ij->j', R, MR)
+    ratios = m_eff / np.where(total > 0, total, np.inf)[None, :]
+    return {
+        'L': L,
+        'modal_masses': m_star,
+        'gamma': L / safe,
+        'effective_masses': m_eff,
+        'total_masses': total,
+        'mass_ratios': ratios
+    }
+
+
+def _checksum(A) -> Tuple:
+    """Firma dei dati di una matrice sparsa (forma, nnz, crc di indici e valori)"""
+    A = A if isinstance(A, csr_matrix) else csr_matrix(A)
+    crc = zlib.crc32(np.ascontiguousarray(A.indptr).view(np.uint8))
+    crc = zlib.crc32(np.ascontiguousarray(A.indices).view(np.uint8), crc)
+    crc = zlib.crc32(np.ascontiguousarray(A.data, dtype=float).view(np.uint8), crc)
+    return (A.shape, A.nnz, crc)
+
+
+class ModalSolver:
+    """
+    Autocoppie generalizzate con cache dei risultati e riavvio da sottospazio.
+
+    Args:
+        linear_solver: Fattorizzazioni di K - sigma M (default: LinearSolver proprio)
+        sigma: Shift (0 = modi a frequenza più bassa)
+        warm_start: Riavvio LOBPCG dai modi precedenti per modelli modificati
+        tol: Tolleranza sull'errore all'indietro delle autocoppie
+        max_iter: Iterazioni massime LOBPCG
+        cache_size: Numero di problemi (K, M) mantenuti
+    """
+
+    def __init__(self, linear_solver: Optional[LinearSolver] = None, sigma: float = 0.0,
+                 warm_start: bool = True, tol: float = 1e-10, max_iter: int = 20,
+                 cache_size: int = 8):
+        if tol <= 0:
+            raise ValueError("La tolleranza modale deve essere positiva")
+        if max_iter < 1 or cache_size < 1:
+            raise ValueError("max_iter e cache_size devono essere >= 1")
+        self.linear_solver = linear_solver or LinearSolver()
+        self.sigma = float(sigma)
+        self.warm_start = warm_start
+        self.tol = tol
+        self.max_iter = max_iter
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[Tuple, Dict]' = OrderedDict()
+        self.stats = {'solves': 0, 'cached': 0, 'lobpcg': 0, 'lobpcg_iterations': 0,
+                      'lobpcg_rejected': 0, 'shift_invert': 0, 'dense': 0}
+
+    def clear(self) -> None:
+        """Svuota la cache dei problemi risolti"""
+        self._cache.clear()
+
+    def solve(self, K, M, n_modes: int = 6,
+              linear_solver: Optional[LinearSolver] = None) -> Dict:
+        """
+        Primi n_modes modi di K phi = lambda M phi.
+
+        Args:
+            K, M: Matrici sparse simmetriche (n, n)
+            n_modes: Numero di modi (limitato a n - 1)
+            linear_solver: Solver per la fattorizzazione di K - sigma M
+                           (es. quello del modello, per condividerne la cache)
+
+        Returns:
+            Dict con 'eigenvalues', 'omega' (crescenti), 'modes' (n, k)
+            normalizzati rispetto a M, 'method' e 'residual' (errore
+            all'indietro massimo).
+        """
+        K = K.tocsr() if issparse(K) else csr_matrix(K)
+        M = M.tocsr() if issparse(M) else csr_matrix(M)
+        n = K.shape[0]
+        k = max(1, min(int(n_modes), n - 1))
+        self.stats['solves'] += 1
+
+        key = (_checksum(K), _checksum(M), self.sigma)
+        entry = self._cache.get(key)
+        if entry is not None and entry['modes'].shape[1] >= k:
+            self._cache.move_to_end(key)
+            self.stats['cached'] += 1
+            return self._result(entry, k, 'cached')
+
+        result = None
+        previous = entry if entry is not None else self._latest(n)
+        # LOBPCG richiede n >= 5k (altrimenti scipy ripiega su una soluzione densa)
+        if self.warm_start and previous is not None and previous['factor'] is not None \
+                and n >= 5 * k:
+            result = self._lobpcg(K, M, k, previous)
+        if result is None:
+            result = self._shift_invert(K, M, k, linear_solver or self.linear_solver)
+
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return self._result(result, k, result['method'])
+
+    def _latest(self, n: int) -> Optional[Dict]:
+        """Ultimo problema risolto con la stessa dimensione (sottospazio di riavvio)"""
+        for entry in reversed(self._cache.values()):
+            if entry['modes'].shape[0] == n:
+                return entry
+        return None
+
+    @staticmethod
+    def _result(entry: Dict, k: int, method: str) -> Dict:
+        lam = entry['eigenvalues'][:k].copy()
+        return {
+            'eigenvalues': lam,
+            'omega': np.sqrt(np.clip(lam, 0.0, None)),
+            'modes': entry['modes'][:, :k].copy(),
+            'method': method,
+            'residual': entry['residual']
+        }
+
+    @staticmethod
+    def _normalize(lam: np.ndarray, modes: np.ndarray, M) -> Tuple[np.ndarray, np.ndarray]:
+        """Ordina per autovalore crescente e normalizza i modi rispetto a M"""
+        idx = np.argsort(lam)
+        lam, modes = lam[idx], modes[:, idx]
+        m = np.einsum('ij,ij->j', modes, M @ modes)
+        return lam, modes / np.sqrt(np.where(m > 0, m, 1.0))
+
+    @staticmethod
+    def _norms(K, M) -> Tuple[float, float]:
+        """Norme infinito di K e M (scala dell'errore all'indietro)"""
+        return float(abs(K).sum(axis=1).max()), float(abs(M).sum(axis=1).max())
+
+    def _residual(self, K, M, lam: np.ndarray, modes: np.ndarray) -> float:
+        """Errore all'indietro massimo ||K phi - lambda M phi|| / ((||K|| + |lambda| ||M||) ||phi||)"""
+        norm_K, norm_M = self._norms(K, M)
+        res = np.linalg.norm(K @ modes - (M @ modes) * lam, axis=0)
+        scale = (norm_K + np.abs(lam) * norm_M) * np.linalg.norm(modes, axis=0)
+        return float(np.max(res / np.where(scale > 0, scale, 1.0)))
+
+    def _lobpcg(self, K, M, k: int, previous: Dict) -> Optional[Dict]:
+        """Riavvio LOBPCG dai modi precedenti; None se non converge"""
+        n = K.shape[0]
+        X = previous['modes'][:, :k]
+        if X.shape[1] < k:
+            rng = np.random.default_rng(0)
+            X = np.column_stack([X, rng.standard_normal((n, k - X.shape[1]))])
+        factor = previous['factor']
+        # LOBPCG controlla il residuo assoluto: scala dell'errore all'indietro
+        norm_K, norm_M = self._norms(K, M)
+        lam_max = float(np.max(np.abs(previous['eigenvalues'][:k])))
+        phi_min = float(np.min(np.linalg.norm(X, axis=0)))
+        tol = self.tol * (norm_K + lam_max * norm_M) * phi_min
+        precond = LinearOperator((n, n), matvec=factor.solve, matmat=factor.solve,
+                                 dtype=float)
+        try:
+            with warnings.catch_warnings():
+                # la mancata convergenza è gestita dal controllo dei residui
+                warnings.simplefilter('ignore')
+                lam, modes, history = lobpcg(K, X, B=M, M=precond, tol=tol,
+                                             maxiter=self.max_iter, largest=False,
+                                             retResidualNormsHistory=True)
+        except Exception as e:
+            logger.debug(f"LOBPCG fallito ({e}), uso shift-invert")
+            self.stats['lobpcg_rejected'] += 1
+            return None
+        lam, modes = self._normalize(np.asarray(lam, dtype=float), modes, M)
+        residual = self._residual(K, M, lam, modes)
+        if not np.all(np.isfinite(lam)) or residual > self.tol:
+            logger.debug(f"LOBPCG non convergente (residuo {residual:.2e}), uso shift-invert")
+            self.stats['lobpcg_rejected'] += 1
+            return None
+        self.stats['lobpcg'] += 1
+        self.stats['lobpcg_iterations'] += len(history)
+        return {'eigenvalues': lam, 'modes': modes, 'factor': factor,
+                'residual': residual, 'method': 'lobpcg'}
+
+    def _shift_invert(self, K, M, k: int, linear_solver: LinearSolver) -> Dict:
+        """Lanczos shift-invert sulla fattorizzazione di K - sigma M"""
+        n = K.shape[0]
+        if n <= max(10, k + 1):
+            # Problemi piccoli: decomposizione densa completa
+            lam, modes = eigh(K.toarray(), M.toarray())
+            self.stats['dense'] += 1
+            lam, modes = self._normalize(lam[:k], modes[:, :k], M)
+            return {'eigenvalues': lam, 'modes': modes, 'factor': None,
+                    'residual': self._residual(K, M, lam, modes), 'method': 'dense'}
+        A = K if self.sigma == 0.0 else (K - self.sigma * M).tocsr()
+        factor = linear_solver.factorize(A, spd=True if self.sigma == 0.0 else None)
+        OPinv = LinearOperator((n, n), matvec=factor.solve, dtype=float)
+        lam, modes = eigsh(K, k=k, M=M, sigma=self.sigma, which='LM', OPinv=OPinv)
+        lam, modes = self._normalize(lam, modes, M)
+        self.stats['shift_invert'] += 1
+        return {'eigenvalues': lam, 'modes': modes, 'factor': factor,
+                'residual': self._residual(K, M, lam, modes), 'method': 'shift_invert'}
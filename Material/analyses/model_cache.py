@@ -0,0 +1,163 @@
+# analyses/model_cache.py
+"""
+Cache dei modelli strutturali per contenuto con tracciamento delle modifiche.
+
+Ogni modello è indicizzato sull'impronta (stable_hash) della geometria;
+per le analisi successive sulla stessa parete si confrontano le impronte
+delle singole parti dei dati e si ricostruisce solo ciò che è invalidato:
+
+    'geometry'  modello ricostruito (nodi, elementi, K e M)
+    'material'  rigidezze e capacità degli elementi, K aggiornata sul posto
+                (stesso pattern di sparsità), M riassemblata
+    'masses'    solo M riassemblata
+    'loads'     nessuna ricostruzione (i carichi entrano solo nelle analisi)
+
+Senza modifiche il modello viene riportato allo stato elastico (reset
+dopo pushover o storie non lineari) e K, M e fattorizzazioni sono
+riusate. Il costruttore del modello fornisce:
+
+    kind                                    nome del tipo di modello
+    parts(wall_data, material, loads)       dict delle parti sopra
+    build(wall_data, material)              modello assemblato
+    update_material(model, wall_data, material)   opzionale
+    update_masses(model, wall_data)               opzionale
+    reset(model)                                  opzionale
+
+Se un aggiornamento non è disponibile il modello viene ricostruito.
+"""
+
+import dataclasses
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_PARTS = ('geometry', 'material', 'masses', 'loads')
+
+
+def _canonical(obj: Any, strict: bool = False) -> Any:
+    """Forma serializzabile e deterministica di dati annidati"""
+    if obj is None or isinstance(obj, (bool, int, str)):
+        return obj
+    if isinstance(obj, float):
+        return repr(obj)
+    if isinstance(obj, Enum):
+        return ['enum', type(obj).__name__, _canonical(obj.value, strict)]
+    if isinstance(obj, np.generic):
+        return _canonical(obj.item(), strict)
+    if isinstance(obj, np.ndarray):
+        data = np.ascontiguousarray(obj)
+        return ['ndarray', str(data.dtype), list(data.shape),
+                hashlib.sha256(data.view(np.uint8)).hexdigest()]
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return ['dataclass', type(obj).__name__,
+                {f.name: _canonical(getattr(obj, f.name), strict) for f in dataclasses.fields(obj)}]
+    if isinstance(obj, dict):
+        return ['dict', sorted(([_canonical(k, strict), _canonical(v, strict)] for k, v in obj.items()),
+                               key=lambda kv: json.dumps(kv[0], sort_keys=True))]
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v, strict) for v in obj]
+    if isinstance(obj, (set, frozenset)):
+        return ['set', sorted(json.dumps(_canonical(v, strict), sort_keys=True) for v in obj)]
+    if strict:
+        raise TypeError(f"Oggetto senza impronta di contenuto: {type(obj).__qualname__}")
+    # Oggetti opachi: identità (nessun falso riuso)
+    return ['object', type(obj).__qualname__, id(obj)]
+
+
+def stable_hash(obj: Any, strict: bool = False) -> str:
+    """
+    Impronta SHA-256 del contenuto (dict, liste, array, dataclass, enum).
+
+    Gli oggetti opachi entrano con la loro identità (impronta valida solo
+    nel processo corrente); con strict=True sollevano TypeError.
+    """
+    text = json.dumps(_canonical(obj, strict), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ModelCache:
+    """
+    Modelli riusati tra analisi successive sulla stessa parete.
+
+    Args:
+        max_models: Numero massimo di modelli (geometrie) mantenuti
+    """
+
+    def __init__(self, max_models: int = 4):
+        if max_models < 1:
+            raise ValueError("max_models deve essere >= 1")
+        self.max_models = max_models
+        self._models: 'OrderedDict[Tuple[str, str], Dict]' = OrderedDict()
+        self.stats = {'builds': 0, 'reuses': 0, 'material_updates': 0,
+                      'mass_updates': 0, 'resets': 0}
+
+    def clear(self) -> None:
+        self._models.clear()
+
+    def get(self, builder, wall_data: Dict, material, loads: Optional[Dict] = None) -> Tuple[Any, Dict]:
+        """
+        Modello per (wall_data, material), ricostruito solo dove necessario.
+
+        Returns:
+            (modello, info) con info['reused'], info['changes'] (parti
+            modificate rispetto all'analisi precedente sulla stessa
+            geometria) e info['updated'] (operazioni eseguite)
+        """
+        hashes = {part: stable_hash(value)
+                  for part, value in builder.parts(wall_data, material, loads).items()}
+        key = (builder.kind, hashes['geometry'])
+        entry = self._models.get(key)
+
+        if entry is None:
+            model = builder.build(wall_data, material)
+            self.stats['builds'] += 1
+            self._store(key, model, hashes)
+            logger.debug(f"Cache modelli: nuovo modello {builder.kind} ({hashes['geometry'][:12]})")
+            return model, {'reused': False, 'changes': ['geometry'], 'updated': ['build']}
+
+        self._models.move_to_end(key)
+        model = entry['model']
+        changes = [part for part in MODEL_PARTS[1:] if entry['hashes'].get(part) != hashes.get(part)]
+        updated = []
+
+        update_material = getattr(builder, 'update_material', None)
+        update_masses = getattr(builder, 'update_masses', None)
+        if ('material' in changes and update_material is None) or \
+                ('masses' in changes and update_masses is None):
+            model = builder.build(wall_data, material)
+            self.stats['builds'] += 1
+            self._store(key, model, hashes)
+            return model, {'reused': False, 'changes': changes, 'updated': ['build']}
+
+        reset = getattr(builder, 'reset', None)
+        if reset is not None:
+            reset(model)
+            self.stats['resets'] += 1
+            updated.append('reset')
+        if 'material' in changes:
+            update_material(model, wall_data, material)
+            self.stats['material_updates'] += 1
+            updated.append('material')
+        elif 'masses' in changes:
+            # L'aggiornamento del materiale riassembla già M
+            update_masses(model, wall_data)
+            self.stats['mass_updates'] += 1
+            updated.append('masses')
+        entry['hashes'] = hashes
+        self.stats['reuses'] += 1
+        if changes:
+            logger.debug(f"Cache modelli: modifiche {changes}, aggiornamento {updated}")
+        return model, {'reused': True, 'changes': changes, 'updated': updated}
+
+    def _store(self, key: Tuple[str, str], model: Any, hashes: Dict[str, str]) -> None:
+        self._models[key] = {'model': model, 'hashes': hashes}
+        self._models.move_to_end(key)
+        while len(self._models) > self.max_models:
+            self._models.popitem(last=False)
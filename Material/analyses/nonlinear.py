@@ -0,0 +1,218 @@
+# analyses/nonlinear.py
+"""
+Strategie di soluzione non lineare per sistemi ridotti ai DOF liberi.
+
+Il problema è descritto da due funzioni:
+    residual(u, lam) -> R = lam * F_ext - f_int(u)
+    tangent(u)       -> matrice tangente sparsa K_T(u)
+
+Strategie disponibili:
+    'newton'            Newton-Raphson completo (tangente ad ogni iterazione)
+    'modified_newton'   tangente aggiornata ogni `tangent_interval` iterazioni
+    'initial_stiffness' rigidezza iniziale fattorizzata una sola volta
+    'bfgs'              quasi-Newton BFGS (Matthies-Strang) sulla tangente di inizio passo
+
+Opzionalmente: line search a backtracking e passi di carico incrementali
+con riduzione automatica del passo (cutback) in caso di mancata convergenza.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .solvers import LinearSolver
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ('newton', 'modified_newton', 'initial_stiffness', 'bfgs')
+
+
+@dataclass
+class NonlinearOptions:
+    """Opzioni per la soluzione non lineare"""
+    strategy: str = 'newton'
+    tol: float = 1e-6               # tolleranza assoluta su ||R||
+    max_iter: int = 50              # iterazioni massime per passo
+    tangent_interval: int = 5       # modified Newton: iterazioni tra aggiornamenti
+    line_search: bool = False
+    line_search_max: int = 8        # dimezzamenti massimi del passo
+    line_search_c: float = 1e-4     # condizione di decremento sufficiente
+    load_steps: int = 1             # passi di carico iniziali
+    max_cutbacks: int = 5           # riduzioni del passo di carico ammesse
+    min_load_increment: float = 1e-4
+    bfgs_max_pairs: int = 20
+
+    def __post_init__(self):
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"Strategia non lineare non riconosciuta: {self.strategy}")
+
+
+class NonlinearSolver:
+    """Risolutore incrementale-iterativo con strategie e report per passo"""
+
+    def __init__(self, options: Optional[NonlinearOptions] = None,
+                 linear_solver: Optional[LinearSolver] = None):
+        self.options = options or NonlinearOptions()
+        self.linear_solver = linear_solver or LinearSolver()
+
+    def solve(self, residual: Callable[[np.ndarray, float], np.ndarray],
+              tangent: Callable[[np.ndarray], object],
+              u0: np.ndarray) -> Dict:
+        """
+        Esegue l'analisi fino a lam = 1.
+
+        Returns:
+            Dict con 'u', 'converged', 'lambda' (ultimo livello in equilibrio),
+            'steps' (per passo: lambda, iterations, factorizations, residuals,
+            cutbacks, converged) e totali. Se l'analisi si interrompe 'u' è
+            l'ultima iterata del passo fallito.
+        """
+        opts = self.options
+        u = np.array(u0, dtype=float)
+        lam = 0.0
+        d_lam = 1.0 / max(1, opts.load_steps)
+        cutbacks_left = opts.max_cutbacks
+        step_cutbacks = 0
+        steps: List[Dict] = []
+
+        K_initial = None
+        if opts.strategy == 'initial_stiffness':
+            K_initial = tangent(np.zeros_like(u)).copy()
+
+        converged = True
+        while lam < 1.0 - 1e-12:
+            lam_target = min(1.0, lam + d_lam)
+            step = self._solve_step(residual, tangent, u, lam_target, K_initial)
+            step['cutbacks'] = step_cutbacks
+
+            if step['converged']:
+                u = step.pop('u')
+                lam = lam_target
+                steps.append(step)
+                step_cutbacks = 0
+                continue
+
+            u_attempt = step.pop('u')
+            steps.append(step)
+            if cutbacks_left > 0 and d_lam * 0.5 >= opts.min_load_increment:
+                cutbacks_left -= 1
+                step_cutbacks += 1
+                d_lam *= 0.5
+                logger.info(f"Passo a lambda={lam_target:.4f} non convergente, "
+                            f"riduzione incremento a {d_lam:.4g}")
+                continue
+
+            logger.warning(f"Soluzione non lineare interrotta a lambda={lam:.4f}")
+            # Restituisce l'ultima iterata (non in equilibrio), come il solver storico
+            u = u_attempt
+            converged = False
+            break
+
+        return {
+            'u': u,
+            'converged': converged,
+            'lambda': lam,
+            'strategy': opts.strategy,
+            'steps': steps,
+            'total_iterations': int(sum(s['iterations'] for s in steps)),
+            'total_factorizations': int(sum(s['factorizations'] for s in steps))
+        }
+
+    def _solve_step(self, residual, tangent, u_start: np.ndarray,
+                    lam: float, K_initial) -> Dict:
+        """Iterazioni di equilibrio per un singolo livello di carico"""
+        opts = self.options
+        solver = self.linear_solver
+        n_fact_start = solver.stats['factorizations']
+
+        u = u_start.copy()
+        R = residual(u, lam)
+        norm_R = float(np.linalg.norm(R))
+        residuals = [norm_R]
+
+        K = K_initial
+        pairs: List[tuple] = []  # coppie BFGS (s, y, rho)
+        converged = norm_R < opts.tol
+        iterations = 0
+
+        while not converged and iterations < opts.max_iter:
+            if opts.strategy == 'newton' or K is None or (
+                    opts.strategy == 'modified_newton'
+                    and iterations % max(1, opts.tangent_interval) == 0):
+                K = tangent(u)
+                pairs.clear()
+
+            try:
+                if opts.strategy == 'bfgs' and pairs:
+                    du = self._bfgs_direction(K, R, pairs)
+                else:
+                    du = solver.solve(K, R)
+            except Exception as e:
+                logger.error(f"Errore nella risoluzione sistema lineare: {e}")
+                break
+            if not np.all(np.isfinite(du)):
+                break
+
+            s, R_new, norm_new = self._line_search(residual, u, du, lam, R, norm_R)
+            u_new = u + s * du
+            iterations += 1
+
+            if opts.strategy == 'bfgs':
+                # Gradiente g = -R: y = g_new - g_old = R_old - R_new
+                step_vec = s * du
+                y = R - R_new
+                sy = float(step_vec @ y)
+                if sy > 1e-14 * np.linalg.norm(step_vec) * np.linalg.norm(y):
+                    pairs.append((step_vec, y, 1.0 / sy))
+                    if len(pairs) > opts.bfgs_max_pairs:
+                        pairs.pop(0)
+
+            u, R, norm_R = u_new, R_new, norm_new
+            residuals.append(norm_R)
+            logger.debug(f"lambda={lam:.4f} iterazione {iterations}: ||R|| = {norm_R}")
+
+            if not np.isfinite(norm_R):
+                break
+            converged = norm_R < opts.tol
+
+        return {
+            'lambda': lam,
+            'u': u,
+            'converged': bool(converged),
+            'iterations': iterations,
+            'factorizations': solver.stats['factorizations'] - n_fact_start,
+            'residuals': residuals
+        }
+
+    def _line_search(self, residual, u, du, lam, R, norm_R):
+        """Backtracking sul passo con condizione di decremento sufficiente su ||R||"""
+        opts = self.options
+        s = 1.0
+        R_new = residual(u + du, lam)
+        norm_new = float(np.linalg.norm(R_new))
+        if not opts.line_search:
+            return s, R_new, norm_new
+
+        for _ in range(opts.line_search_max):
+            if np.isfinite(norm_new) and norm_new <= (1.0 - opts.line_search_c * s) * norm_R:
+                break
+            s *= 0.5
+            R_new = residual(u + s * du, lam)
+            norm_new = float(np.linalg.norm(R_new))
+        return s, R_new, norm_new
+
+    def _bfgs_direction(self, K, R: np.ndarray, pairs: List[tuple]) -> np.ndarray:
+        """Direzione H*R con ricorsione a due cicli e H0 = K^-1 (fattorizzata)"""
+        q = R.copy()
+        alphas = []
+        for s, y, rho in reversed(pairs):
+            a = rho * float(s @ q)
+            alphas.append(a)
+            q -= a * y
+        r = self.linear_solver.solve(K, q)
+        for (s, y, rho), a in zip(pairs, reversed(alphas)):
+            b = rho * float(y @ r)
+            r += (a - b) * s
+        return r
@@ -0,0 +1,630 @@
+# analyses/nonlinear_dynamics.py
+"""
+Storie temporali non lineari del telaio equivalente.
+
+Ogni elemento ha tre cerniere isteretiche: flessione ai nodi i e j e
+taglio al centro, con le capacità delle verifiche pushover (pier_strength
+per i maschi, funzione dello sforzo normale corrente; _spandrel_capacity
+per le fasce). Il legame è elasto-plastico con incrudimento cinematico di
+rapporto post_yield_ratio (default 0.001, la riduzione di rigidezza di
+_update_model_with_hinges): scarico elastico, deformazioni plastiche
+permanenti, ricarico dal lato opposto dopo l'escursione completa. Le
+componenti a capacità nulla (flessione delle fasce senza tirante né arco)
+sono svincolate fin dall'inizio e riportate in 'released', non come
+cerniere che si formano al primo passo.
+
+Nel sistema locale f = k (u - G e_p), con e_p deformazioni plastiche
+generalizzate (rotazioni ai nodi, scorrimento trasversale) e G le loro
+direzioni (HINGE_DIRECTIONS): la forza resta in equilibrio nell'elemento.
+
+Integrazione: Newmark (accelerazione media) con iterazioni di
+Newton-Raphson sull'equilibrio a ogni passo. Nella determinazione dello
+stato il percorso u_n -> u_n+1 di ogni elemento che supera la capacità è
+seguito evento per evento: si cerca la frazione del passo in cui la
+prossima cerniera si attiva (radice scalare), si aggiorna l'insieme attivo
+e si prosegue fino alla fine del passo.
+
+La rigidezza efficace K_T + a1 C + a0 M dipende solo dall'insieme delle
+cerniere attive: le fattorizzazioni sono conservate per stato (cache LRU)
+e riutilizzate finché le cerniere non cambiano, per cui nei tratti
+elastici un passo costa come nell'analisi lineare (una soluzione e una
+valutazione vettoriale delle forze interne).
+
+Unità: forze in kN, lunghezze in m, masse in t (già convertite da
+time_history_model), così la domanda è confrontabile con le capacità
+delle cerniere.
+"""
+
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.optimize import brentq
+from scipy.sparse import coo_matrix, csr_matrix
+
+from .dynamics import (DENSE_DOF_LIMIT, INTEGRATOR_SOLVERS, factorize_effective,
+                       frame_fixed_nodes, newmark_coefficients)
+from .frame.model import pier_strength, pier_strength_params
+from .solvers import LinearSolver
+
+logger = logging.getLogger(__name__)
+
+GRAVITY = 9.80665
+HINGE_COMPONENTS = ('M_i', 'M_j', 'V')
+HINGE_LOCATIONS = (('i', 'flexure'), ('j', 'flexure'), ('center', 'shear'))
+
+# Direzioni delle deformazioni plastiche nel sistema locale [u1, v1, θ1, u2, v2, θ2]:
+# rotazione al nodo i, rotazione al nodo j, scorrimento trasversale v1 - v2
+# (lavoro coniugato con M_i = f[2], M_j = f[5] e V = f[1])
+HINGE_DIRECTIONS = np.array([[0.0, 0.0, 0.0],
+                             [0.0, 0.0, 0.5],
+                             [1.0, 0.0, 0.0],
+                             [0.0, 0.0, 0.0],
+                             [0.0, 0.0, -0.5],
+                             [0.0, 1.0, 0.0]])
+
+
+@dataclass
+class NonlinearDynamicsOptions:
+    """Opzioni per la storia temporale non lineare"""
+    tol: float = 1e-6                # tolleranza relativa su ||R|| / ||forze||
+    max_iter: int = 20               # iterazioni di Newton per passo
+    post_yield_ratio: float = 0.001  # rigidezza post-snervamento / elastica
+    gravity: bool = True             # carichi verticali dalle masse prima del sisma
+    max_events: int = 12             # eventi per elemento in un passo
+    cache_size: int = 8              # fattorizzazioni di K_eff conservate
+
+    def __post_init__(self):
+        if not 0.0 < self.post_yield_ratio < 1.0:
+            raise ValueError("post_yield_ratio deve essere compreso tra 0 e 1")
+
+
+class FrameHinges:
+    """
+    Cerniere isteretiche di tutti gli elementi (array per elemento).
+
+    Lo stato confermato è quello dell'ultimo passo in equilibrio; trial(u)
+    calcola forze interne e cerniere attive per lo spostamento u partendo
+    dallo stato confermato, commit() lo rende definitivo.
+    """
+
+    def __init__(self, frame, post_yield_ratio: float = 0.001, max_events: int = 12):
+        elements = frame.elements
+        n_elem = len(elements)
+        self.n = 3 * len(frame.nodes)
+        self.max_events = max_events
+        self.dofs = frame._element_dofs()
+        self.T = np.array([elem.T for elem in elements], dtype=float).reshape(-1, 6, 6)
+        # Rigidezza elastica (le riduzioni di una pushover precedente non contano)
+        self.k = np.array([elem.k_local_elastic for elem in elements],
+                          dtype=float).reshape(-1, 6, 6)
+
+        # Capacità: costanti per le fasce, da pier_strength(N) per i maschi
+        self.cap_fixed = np.zeros((n_elem, 3))
+        self.is_pier = np.array([elem.type == 'pier' for elem in elements], dtype=bool)
+        for e, elem in enumerate(elements):
+            if elem.type != 'pier':
+                cap = frame._spandrel_capacity(elem)
+                self.cap_fixed[e] = (cap['M_max'], cap['M_max'], cap['V_max'])
+
+        # Componenti a capacità nulla (fasce senza tirante né arco): svincolate
+        # dall'inizio per condensazione statica, non sono eventi di snervamento
+        self.released = (self.cap_fixed <= 0.0) & ~self.is_pier[:, None]
+        for e in np.flatnonzero(np.any(self.released, axis=1)):
+            G = HINGE_DIRECTIONS[:, self.released[e]]
+            kG = self.k[e] @ G
+            self.k[e] = self.k[e] - kG @ np.linalg.pinv(G.T @ kG) @ kG.T
+        self.cap_fixed[self.released] = np.inf
+
+        self.kG = self.k @ HINGE_DIRECTIONS
+        self.D = np.einsum('ji,ejk->eik', HINGE_DIRECTIONS, self.kG)
+        # Incrudimento: tangente post-snervamento r D_cc sulla singola componente
+        self.H = np.einsum('eii->ei', self.D) * post_yield_ratio / (1.0 - post_yield_ratio)
+
+        self._pier_pos = np.cumsum(self.is_pier) - 1
+        self._params = [pier_strength_params(elem) if elem.type == 'pier' else None
+                        for elem in elements]
+        self._pier_params = None
+        if np.any(self.is_pier):
+            rows = [params for params in self._params if params is not None]
+            self._pier_params = tuple(np.array(col, dtype=float) for col in zip(*rows))
+        # (D_AA + H_A)^-1 per elemento e insieme attivo, calcolate al primo uso
+        self._inverse: Dict[Tuple[int, int], np.ndarray] = {}
+
+        # Stato confermato
+        self.u_loc = np.zeros((n_elem, 6))
+        self.f_loc = np.zeros((n_elem, 6))
+        self.e_p = np.zeros((n_elem, 3))
+        self.active = np.zeros((n_elem, 3), dtype=bool)
+        self.sign = np.ones((n_elem, 3))
+        self._trial = None
+
+    def elastic_stiffness(self) -> csr_matrix:
+        """Rigidezza elastica globale (n, n) dagli stessi blocchi elemento"""
+        blocks = np.einsum('eji,ejk,ekl->eil', self.T, self.k, self.T)
+        rows = np.repeat(self.dofs, 6, axis=1).ravel()
+        cols = np.tile(self.dofs, (1, 6)).ravel()
+        return coo_matrix((blocks.ravel(), (rows, cols)), shape=(self.n, self.n)).tocsr()
+
+    def capacity(self, N: np.ndarray, elements: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Capacità (M_max, M_max, V_max) per elemento con sforzo normale N"""
+        idx = np.arange(len(self.k)) if elements is None else np.atleast_1d(elements)
+        cap = self.cap_fixed[idx].copy()
+        piers = self.is_pier[idx]
+        if np.any(piers):
+            sel = self._pier_pos[idx[piers]]
+            M_max, V_max, _ = pier_strength(*(p[sel] for p in self._pier_params),
+                                            np.asarray(N, dtype=float)[piers])
+            cap[piers, 0] = M_max
+            cap[piers, 1] = M_max
+            cap[piers, 2] = V_max
+        return cap
+
+    def _element_capacity(self, e: int, N: float) -> np.ndarray:
+        """Capacità del singolo elemento (percorso evento per evento)"""
+        if self._params[e] is None:
+            return self.cap_fixed[e]
+        M_max, V_max, _ = pier_strength(*self._params[e], N)
+        return np.array([M_max, M_max, V_max])
+
+    def _condensed(self, e: int, A: Sequence[int]) -> np.ndarray:
+        """(D_AA + H_A)^-1 dell'elemento e per le componenti attive A (ordinate)"""
+        key = (e, sum(1 << int(c) for c in A))
+        inverse = self._inverse.get(key)
+        if inverse is None:
+            A = list(A)
+            inverse = np.linalg.inv(self.D[e][np.ix_(A, A)] + np.diag(self.H[e][A]))
+            self._inverse[key] = inverse
+        return inverse
+
+    def trial(self, u: np.ndarray) -> np.ndarray:
+        """Forze interne globali (n,) per lo spostamento u dallo stato confermato"""
+        u_loc = np.einsum('eij,ej->ei', self.T, u[self.dofs])
+        e_p = self.e_p.copy()
+        active = np.zeros_like(self.active)
+        sign = self.sign.copy()
+        events = []
+
+        # Predittore elastico vettoriale: il percorso evento per evento
+        # serve solo agli elementi che superano la capacità
+        q = np.einsum('eji,ej->ei', self.kG, u_loc) - np.einsum('eij,ej->ei', self.D, e_p)
+        N = np.einsum('ej,ej->e', self.k[:, 0], u_loc)
+        cap = self.capacity(N)
+        phi = np.abs(q - self.H * e_p) - cap
+        over = np.any(phi > 1e-9 * cap + 1e-12, axis=1)
+        plastic = over & np.any(self.active, axis=1)
+        path = over & ~plastic
+
+        # Elementi plastici che proseguono sulla superficie: ritorno vettoriale
+        # per gruppo di cerniere attive; percorso completo solo se una
+        # cerniera si scarica o si attiva una nuova componente
+        codes = self.active @ np.array([1, 2, 4])
+        for code in np.unique(codes[plastic]):
+            grp = np.flatnonzero(plastic & (codes == code))
+            A = [c for c in range(3) if code & (1 << c)]
+            inverse = np.array([self._condensed(e, A) for e in grp])
+            rhs = (q[grp] - self.H[grp] * e_p[grp])[:, A] - sign[grp][:, A] * cap[grp][:, A]
+            d = np.einsum('eij,ej->ei', inverse, rhs)
+            ep_g = e_p[grp].copy()
+            ep_g[:, A] += d
+            q_g = q[grp] - np.einsum('eij,ej->ei', self.D[grp][:, :, A], d)
+            phi_g = np.abs(q_g - self.H[grp] * ep_g) - cap[grp]
+            phi_g[:, A] = -np.inf
+            ok = np.all(d * sign[grp][:, A] >= 0, axis=1) & \
+                ~np.any(phi_g > 1e-9 * cap[grp] + 1e-12, axis=1)
+            e_p[grp[ok]] = ep_g[ok]
+            active[grp[ok]] = self.active[grp[ok]]
+            path[grp[~ok]] = True
+
+        for e in np.flatnonzero(path):
+            e_p[e], active[e], sign[e], path_events = self._path(e, self.u_loc[e], u_loc[e])
+            events.extend((int(e), c, s) for c, s in path_events)
+
+        f_loc = np.einsum('eij,ej->ei', self.k, u_loc) - np.einsum('eij,ej->ei', self.kG, e_p)
+        self._trial = (u_loc, f_loc, e_p, active, sign, events)
+        f_glob = np.einsum('eji,ej->ei', self.T, f_loc)
+        return np.bincount(self.dofs.ravel(), f_glob.ravel(), minlength=self.n)
+
+    @property
+    def trial_active(self) -> np.ndarray:
+        return self.active if self._trial is None else self._trial[3]
+
+    def commit(self) -> List[Tuple[int, int, float]]:
+        """Conferma lo stato di prova; restituisce gli eventi (elemento, componente, frazione)"""
+        if self._trial is None:
+            return []
+        self.u_loc, self.f_loc, self.e_p, self.active, self.sign, events = self._trial
+        self._trial = None
+        return events
+
+    def _path(self, e: int, u0: np.ndarray, u1: np.ndarray):
+        """
+        Percorso lineare u0 -> u1 dell'elemento e, evento per evento.
+
+        In ogni tratto l'insieme attivo A è fisso e le componenti attive
+        restano sulla superficie (q - H e_p)_A = sign_A cap_A; le cerniere
+        con incremento plastico opposto al verso si scaricano, la prima
+        componente elastica che raggiunge la capacità chiude il tratto.
+        """
+        k, kG, D, H = self.k[e], self.kG[e], self.D[e], self.H[e]
+        ep = self.e_p[e].copy()
+        sg = self.sign[e].copy()
+        A = [int(c) for c in np.flatnonzero(self.active[e])]
+        u_s = u0.copy()
+        s = 0.0
+        events = []
+
+        def state(t: float, A: List[int]):
+            u_t = u_s + t * (u1 - u_s)
+            q = kG.T @ u_t - D @ ep
+            cap = self._element_capacity(e, k[0] @ u_t)
+            ep_t = ep.copy()
+            if A:
+                d = self._condensed(e, A) @ ((q - H * ep)[A] - sg[A] * cap[A])
+                ep_t[A] += d
+                q = q - D[:, A] @ d
+            return q, ep_t, cap
+
+        for _ in range(self.max_events):
+            # Scarico: cerniere con incremento plastico opposto al verso
+            while True:
+                q, ep_t, cap = state(1.0, A)
+                back = [c for c in A if (ep_t[c] - ep[c]) * sg[c] < 0]
+                if not back:
+                    break
+                A.remove(min(back, key=lambda c: (ep_t[c] - ep[c]) * sg[c]))
+            phi = np.abs(q - H * ep_t) - cap
+            phi[A] = -np.inf
+            over = np.flatnonzero(phi > 1e-9 * cap + 1e-12)
+            if over.size == 0:
+                return ep_t, self._mask(A), sg, events
+
+            # Prossimo evento: prima componente che raggiunge la capacità
+            t_evt, c_evt = 1.0, int(over[0])
+            for c in over:
+                def excess(t, c=c):
+                    q_t, ep_c, cap_t = state(t, A)
+                    return abs(q_t[c] - H[c] * ep_c[c]) - cap_t[c]
+                t_c = 0.0 if excess(0.0) >= 0 else brentq(excess, 0.0, 1.0, xtol=1e-12)
+                if t_c < t_evt:
+                    t_evt, c_evt = t_c, int(c)
+            q, ep, cap = state(t_evt, A)
+            u_s = u_s + t_evt * (u1 - u_s)
+            s += t_evt * (1.0 - s)
+            value = q[c_evt] - H[c_evt] * ep[c_evt]
+            if abs(value) <= 1e-9 * cap[c_evt] + 1e-12:
+                # Capacità nulla: verso dato dall'incremento elastico residuo
+                value = kG[:, c_evt] @ (u1 - u_s)
+            sg[c_evt] = 1.0 if value >= 0 else -1.0
+            A = sorted(A + [c_evt])
+            events.append((c_evt, s))
+
+        logger.debug(f"Elemento {e}: superato il numero massimo di eventi nel passo")
+        q, ep_t, cap = state(1.0, A)
+        return ep_t, self._mask(A), sg, events
+
+    @staticmethod
+    def _mask(A: List[int]) -> np.ndarray:
+        mask = np.zeros(3, dtype=bool)
+        mask[A] = True
+        return mask
+
+    def tangent_blocks(self, active: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Correzioni della rigidezza per le cerniere attive (coordinate globali):
+        -T' kG_A (D_AA + H_A)^-1 kG_A' T, condensazione delle componenti plastiche
+        """
+        idx = np.flatnonzero(np.any(active, axis=1))
+        blocks = np.zeros((idx.size, 6, 6))
+        for j, e in enumerate(idx):
+            A = np.flatnonzero(active[e])
+            kG = self.kG[e][:, A]
+            k_c = kG @ self._condensed(e, A) @ kG.T
+            blocks[j] = -(self.T[e].T @ k_c @ self.T[e])
+        return idx, blocks
+
+    def element_forces(self, f_loc: Optional[np.ndarray] = None) -> List[Dict]:
+        """Forze {N, V, M_i, M_j} di ogni elemento (default stato confermato)"""
+        f_loc = self.f_loc if f_loc is None else f_loc
+        return [{'N': float(f[0]), 'V': float(f[1]), 'M_i': float(f[2]), 'M_j': float(f[5])}
+                for f in f_loc]
+
+
+class NonlinearNewmark:
+    """
+    Newmark con equilibrio di Newton-Raphson e cerniere isteretiche.
+
+    Args:
+        frame: EquivalentFrame con matrici assemblate
+        model: Riduzione ai DOF liberi di time_history_model
+        dt: Passo temporale
+        rayleigh: (alpha0, alpha1) con C = alpha0 M + alpha1 K elastica
+        options: NonlinearDynamicsOptions
+        solver: 'auto', 'dense' o 'sparse' per le fattorizzazioni di K_eff
+    """
+
+    def __init__(self, frame, model: Dict, dt: float, rayleigh: Tuple[float, float],
+                 options: Optional[NonlinearDynamicsOptions] = None,
+                 beta: float = 0.25, gamma: float = 0.5, solver: str = 'auto',
+                 linear_solver: Optional[LinearSolver] = None):
+        if solver not in INTEGRATOR_SOLVERS:
+            raise ValueError(f"Solver di integrazione non riconosciuto: {solver}")
+        self.options = options or NonlinearDynamicsOptions()
+        self.hinges = FrameHinges(frame, self.options.post_yield_ratio, self.options.max_events)
+        self.free = model['free']
+        self.dir_idx = model['dir_idx']
+        self.dt = dt
+        n_free = self.free.size
+        self.index = np.full(self.hinges.n, -1, dtype=int)
+        self.index[self.free] = np.arange(n_free)
+        self.base_dofs = [frame.node_dofs[nid][self.dir_idx] for nid in frame_fixed_nodes(frame)]
+
+        self.Kff = self.hinges.elastic_stiffness()[self.free][:, self.free].tocsr()
+        self.Mff = model['Mff']
+        self.M_base = model['M_base']
+        alpha0, alpha1 = rayleigh
+        self.C = (alpha0 * self.Mff + alpha1 * self.Kff).tocsr()
+        # Righe del taglio alla base per smorzamento e inerzia
+        self.C_base = alpha0 * self.M_base + alpha1 * model['K_base']
+
+        self._a = newmark_coefficients(dt, beta, gamma)
+        a0, a1 = self._a[0], self._a[1]
+        self._K_eff = (self.Kff + a1 * self.C + a0 * self.Mff).tocsr()
+        self.solver = solver if solver != 'auto' else (
+            'dense' if n_free <= DENSE_DOF_LIMIT else 'sparse')
+        self.linear_solver = linear_solver or LinearSolver(ordering='amd')
+        self._factors: 'OrderedDict[bytes, Callable]' = OrderedDict()
+        self.stats = {'factorizations': 0, 'cache_hits': 0, 'iterations': 0,
+                      'max_iterations': 0, 'non_converged_steps': 0}
+
+    def _tangent_delta(self, active: np.ndarray) -> csr_matrix:
+        """Variazione di K_T sui DOF liberi rispetto alla rigidezza elastica"""
+        n_free = self.free.size
+        idx, blocks = self.hinges.tangent_blocks(active)
+        if idx.size == 0:
+            return csr_matrix((n_free, n_free))
+        dofs = self.index[self.hinges.dofs[idx]]
+        rows = np.repeat(dofs, 6, axis=1).ravel()
+        cols = np.tile(dofs, (1, 6)).ravel()
+        keep = (rows >= 0) & (cols >= 0)
+        return coo_matrix((blocks.ravel()[keep], (rows[keep], cols[keep])),
+                          shape=(n_free, n_free)).tocsr()
+
+    def _solver_for(self, active: np.ndarray) -> Callable[[np.ndarray], np.ndarray]:
+        """Soluzione con K_eff dello stato delle cerniere (fattorizzata una volta per stato)"""
+        key = active.tobytes()
+        solve = self._factors.get(key)
+        if solve is not None:
+            self._factors.move_to_end(key)
+            self.stats['cache_hits'] += 1
+            return solve
+        K_eff = self._K_eff
+        if np.any(active):
+            K_eff = (K_eff + self._tangent_delta(active)).tocsr()
+        solve = factorize_effective(K_eff, self.solver, self.linear_solver)
+        self.stats['factorizations'] += 1
+        self._factors[key] = solve
+        while len(self._factors) > max(1, self.options.cache_size):
+            self._factors.popitem(last=False)
+        return solve
+
+    def _internal_force(self, u: np.ndarray) -> np.ndarray:
+        u_full = np.zeros(self.hinges.n)
+        u_full[self.free] = u
+        return self.hinges.trial(u_full)
+
+    def gravity_load(self) -> np.ndarray:
+        """Pesi delle masse nodali ed elementari sui DOF liberi [kN] (masse in t)"""
+        r = np.zeros(self.hinges.n)
+        r[1::3] = 1.0
+        return -GRAVITY * (self.Mff @ r[self.free])
+
+    def static(self, F: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Equilibrio non lineare sotto carichi costanti F (Newton con tangente K_T)"""
+        opts = self.options
+        u = np.zeros(self.free.size)
+        f_full = np.zeros(self.hinges.n)
+        ref = max(float(np.linalg.norm(F)), 1e-30)
+        active = self.hinges.active
+        for it in range(opts.max_iter):
+            R = F - f_full[self.free]
+            if float(np.linalg.norm(R)) <= opts.tol * ref:
+                break
+            K_T = (self.Kff + self._tangent_delta(active)).tocsr()
+            u = u + self.linear_solver.solve(K_T, R)
+            f_full = self._internal_force(u)
+            active = self.hinges.trial_active
+        else:
+            logger.warning("Equilibrio sotto carichi verticali non raggiunto")
+        self.hinges.commit()
+        return u, f_full
+
+    def _step(self, u: np.ndarray, v: np.ndarray, a: np.ndarray, P: np.ndarray,
+              f_full: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int, bool]:
+        """Iterazioni di Newton del passo; lo stato di prova resta da confermare"""
+        opts = self.options
+        a0, a1, a2, a3, a4, a5 = self._a
+        a_pred = -a2 * v - a3 * a
+        v_pred = -a4 * v - a5 * a
+        u_new = u.copy()
+        f = f_full[self.free]
+        active = self.hinges.active
+        for it in range(opts.max_iter + 1):
+            du = u_new - u
+            inertia = self.Mff @ (a0 * du + a_pred)
+            R = P - inertia - self.C @ (a1 * du + v_pred) - f
+            ref = max(float(np.linalg.norm(P)), float(np.linalg.norm(f)),
+                      float(np.linalg.norm(inertia)), 1e-30)
+            if it > 0 and float(np.linalg.norm(R)) <= opts.tol * ref:
+                return u_new, f_full, it, True
+            if it == opts.max_iter:
+                break
+            u_new = u_new + self._solver_for(active)(R)
+            f_full = self._internal_force(u_new)
+            f = f_full[self.free]
+            active = self.hinges.trial_active
+        return u_new, f_full, opts.max_iter, False
+
+    def integrate_ground_motion(self, acc: np.ndarray, influence: np.ndarray, control_dof: int,
+                                drift_dofs: Optional[Sequence[int]] = None,
+                                on_step: Optional[Callable] = None) -> Dict:
+        """
+        Storia non lineare per l'accelerogramma acc (P_i = -acc_i M r), con
+        picchi e stato allo step critico (massimo |u| nel DOF di controllo).
+
+        Spostamenti, forze e reazioni comprendono i carichi verticali
+        (options.gravity), applicati prima del sisma.
+
+        Returns:
+            Dict con i campi di NewmarkIntegrator.integrate_ground_motions (un
+            solo record, scalari), forze negli elementi allo step critico,
+            cerniere (prima formazione di ogni componente), componenti
+            svincolate, deformazioni plastiche e statistiche delle iterazioni e delle fattorizzazioni
+        """
+        opts = self.options
+        acc = np.asarray(acc, dtype=float).ravel()
+        n_free = self.free.size
+        a0, a1, a2, a3, a4, a5 = self._a
+        Mr = self.Mff @ np.asarray(influence, dtype=float)
+        drift_dofs = np.arange(n_free) if drift_dofs is None else np.asarray(drift_dofs, dtype=int)
+
+        F_const = np.zeros(n_free)
+        u = np.zeros(n_free)
+        f_full = np.zeros(self.hinges.n)
+        if opts.gravity:
+            F_const = self.gravity_load()
+            u, f_full = self.static(F_const)
+        v = np.zeros(n_free)
+        a = np.zeros(n_free)
+
+        def base_shear(u_full_f, v, a):
+            return float(u_full_f[self.base_dofs].sum() + self.C_base @ v + self.M_base @ a)
+
+        peaks = [np.abs(u), np.zeros(n_free), np.zeros(n_free)]
+        critical = {'step': 0, 'u': u.copy(), 'v': v.copy(), 'a': a.copy(),
+                    'f_loc': self.hinges.f_loc.copy(), 'V_base': base_shear(f_full, v, a)}
+        ctrl_abs = abs(u[control_dof])
+        max_base_shear = abs(critical['V_base'])
+        e_p_max = np.zeros_like(self.hinges.e_p)
+        hinges: List[Dict] = []
+        formed = set()
+        n_events = 0
+        if on_step is not None:
+            on_step(0, u, v, a)
+
+        for i in range(1, acc.size):
+            P = F_const - Mr * acc[i]
+            u_new, f_full, iterations, converged = self._step(u, v, a, P, f_full)
+            du = u_new - u
+            a_new = a0 * du - a2 * v - a3 * a
+            v_new = a1 * du - a4 * v - a5 * a
+            u, v, a = u_new, v_new, a_new
+            self.stats['iterations'] += iterations
+            self.stats['max_iterations'] = max(self.stats['max_iterations'], iterations)
+            if not converged:
+                self.stats['non_converged_steps'] += 1
+                logger.debug(f"Passo {i}: equilibrio non raggiunto in {iterations} iterazioni")
+
+            # Eventi del passo: tempo interpolato sulla frazione del percorso
+            for e, c, s in self.hinges.commit():
+                n_events += 1
+                if (e, c) in formed:
+                    continue
+                formed.add((e, c))
+                location, kind = HINGE_LOCATIONS[c]
+                hinges.append({'element': e, 'location': location, 'type': kind,
+                               'step': i, 'time': float((i - 1 + s) * self.dt)})
+            np.maximum(e_p_max, np.abs(self.hinges.e_p), out=e_p_max)
+
+            if on_step is not None:
+                on_step(i, u, v, a)
+            for peak, x in zip(peaks, (u, v, a)):
+                np.maximum(peak, np.abs(x), out=peak)
+            V_base = base_shear(f_full, v, a)
+            max_base_shear = max(max_base_shear, abs(V_base))
+            if abs(u[control_dof]) > ctrl_abs:
+                ctrl_abs = abs(u[control_dof])
+                critical = {'step': i, 'u': u.copy(), 'v': v.copy(), 'a': a.copy(),
+                            'f_loc': self.hinges.f_loc.copy(), 'V_base': V_base}
+
+        if self.stats['non_converged_steps']:
+            logger.warning(f"Storia non lineare: {self.stats['non_converged_steps']} passi "
+                           f"senza equilibrio entro {opts.max_iter} iterazioni")
+        n_steps = max(1, acc.size - 1)
+        return {
+            'critical_step': critical['step'],
+            'control_peak': float(critical['u'][control_dof]),
+            'max_displacement': float(peaks[0].max(initial=0.0)),
+            'max_velocity': float(peaks[1].max(initial=0.0)),
+            'max_acceleration': float(peaks[2].max(initial=0.0)),
+            'max_drift_displacement': float(peaks[0][drift_dofs].max(initial=0.0)),
+            'base_shear_critical': abs(critical['V_base']),
+            'max_base_shear': max_base_shear,
+            'u_critical': critical['u'],
+            'v_critical': critical['v'],
+            'a_critical': critical['a'],
+            'element_forces_critical': self.hinges.element_forces(critical['f_loc']),
+            'hinges': hinges,
+            'released': [{'element': int(e), 'location': HINGE_LOCATIONS[c][0],
+                          'type': HINGE_LOCATIONS[c][1]}
+                         for e, c in zip(*np.nonzero(self.hinges.released))],
+            'n_yield_events': n_events,
+            'plastic_deformation': self.hinges.e_p.copy(),
+            'max_plastic_deformation': e_p_max,
+            'stats': dict(self.stats, mean_iterations=self.stats['iterations'] / n_steps)
+        }
+
+
+if __name__ == "__main__":
+    # Verifica: python -m Material.analyses.nonlinear_dynamics
+    from ..geometry import GeometryPier, GeometrySpandrel
+    from ..materials import MaterialProperties
+    from .dynamics import frame_time_history
+    from .frame.model import EquivalentFrame, FrameElement
+
+    def portal_frame() -> 'EquivalentFrame':
+        """Telaio a due piani: maschi 1.5 x 3.0 x 0.4 m, 15 t per nodo di piano"""
+        material = MaterialProperties()
+        frame = EquivalentFrame()
+        frame.add_node(0, 0.0, 0.0)
+        frame.add_node(1, 4.5, 0.0)
+        frame.add_constraint(0, "fixed")
+        frame.add_constraint(1, "fixed")
+        masses = {}
+        for storey in range(2):
+            left, right = 2 + 2 * storey, 3 + 2 * storey
+            frame.add_node(left, 0.0, 3.0 * (storey + 1))
+            frame.add_node(right, 4.5, 3.0 * (storey + 1))
+            for i_node, j_node in ((left - 2, left), (right - 2, right)):
+                frame.add_element(FrameElement(
+                    element_id=len(frame.elements), i_node=i_node, j_node=j_node,
+                    geometry=GeometryPier(length=1.5, height=3.0, thickness=0.4),
+                    material=material, element_type='pier'))
+            frame.add_element(FrameElement(
+                element_id=len(frame.elements), i_node=left, j_node=right,
+                geometry=GeometrySpandrel(length=4.5, height=0.9, thickness=0.4),
+                material=material, element_type='spandrel'))
+            masses[left] = masses[right] = 15000.0
+        frame.assemble_stiffness_matrix()
+        frame.assemble_mass_matrix(masses)
+        return frame
+
+    dt = 0.01
+    t = np.arange(1500) * dt
+    record = GRAVITY * np.sin(2 * np.pi * 3.0 * t) * np.exp(-0.2 * t)
+    print("Storia non lineare: telaio a due piani, accelerogramma 3 Hz smorzato")
+    print(f"{'PGA [g]':>8} {'cerniere':>9} {'eventi':>7} {'V_max [kN]':>11} {'V_max/PGA':>10}")
+    shear = {}
+    for pga in (0.01, 0.05, 0.2, 0.8):
+        nonlinear = frame_time_history(portal_frame(), pga * record, dt, 'x',
+                                       integrator='nonlinear', output='peaks')['nonlinear']
+        shear[pga] = nonlinear['max_base_shear']
+        print(f"{pga:>8.2f} {nonlinear['n_hinges']:>9d} {nonlinear['n_yield_events']:>7d} "
+              f"{shear[pga]:>11.2f} {shear[pga] / pga:>10.1f}")
+        if pga == 0.01:
+            # Record debole: risposta elastica
+            assert nonlinear['n_hinges'] == 0 and nonlinear['n_yield_events'] == 0
+    # Con le cerniere formate il taglio non cresce più in proporzione alla PGA
+    assert shear[0.8] / 0.8 < 0.5 * shear[0.01] / 0.01
@@ -34,6 +34,7 @@ from enum import Enum
 
 # Import centralizzato da enums.py
 from ..enums import LoadDistribution
+from .result_cache import cached_analysis, engine_version
 
 logger = logging.getLogger(__name__)
 
@@ -794,7 +795,17 @@ def analyze_por(wall_data: Dict, material: MaterialProperties,
         - h_eff è l'altezza fisica media dei maschi (NON h0), pesabile con area o taglio
         - FS=999 è un valore sentinel per "divisione evitata/non rilevante"
         - Tolleranza numerica EPS=1e-9 per confronti con zero
+        - Con una cache risultati attiva (result_cache) input identici
+          restituiscono il risultato memorizzato
     """
+    return cached_analysis('POR', engine_version(),
+                           lambda: _compute_por(wall_data, material, loads, options),
+                           wall_data, material, loads, options)
+
+
+def _compute_por(wall_data: Dict, material: MaterialProperties,
+                 loads: Dict, options: AnalysisOptions = None) -> Dict:
+    """Calcolo POR (analyze_por senza cache)"""
     logger.info("=== ANALISI POR - Pier Only Resistance ===")
     logger.info(f"Parete: L={wall_data.get('length','N/A')}m, H={wall_data.get('height','N/A')}m")
     
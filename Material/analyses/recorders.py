@@ -0,0 +1,231 @@
+# analyses/recorders.py
+"""
+Recorder per analisi incrementali (pushover, storie temporali).
+
+L'analisi chiama, per ogni passo convergente:
+    recorder.record(step, state)
+dove `step` contiene le grandezze scalari del passo (step, lambda,
+V_base, delta_top, drift, hinges) e `state` lo stato completo
+(displacements, reactions, element_forces). Ogni recorder decide cosa
+conservare; al termine finish() restituisce il riepilogo che l'analisi
+inserisce in results['recorders'][recorder.name].
+
+Recorder disponibili:
+    StepRecorder      stato completo in memoria ogni `every` passi
+    EnvelopeRecorder  inviluppi delle forze negli elementi e degli spostamenti
+    NPZRecorder       stato in blocchi .npz su disco (memoria costante)
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORCE_COMPONENTS = ('N', 'V', 'M_i', 'M_j')
+STATE_FIELDS = ('displacements', 'reactions', 'element_forces')
+
+
+def element_forces_array(element_forces: List[Dict]) -> np.ndarray:
+    """Forze negli elementi come array (n_elem, 4) nell'ordine FORCE_COMPONENTS"""
+    return np.array([[f.get(k, 0.0) for k in FORCE_COMPONENTS] for f in element_forces],
+                    dtype=float).reshape(-1, len(FORCE_COMPONENTS))
+
+
+class Recorder:
+    """Recorder base: nessun dato conservato"""
+
+    name = 'recorder'
+
+    def start(self, info: Optional[Dict] = None) -> None:
+        """Inizio analisi (info: n_dof, n_elements, ...)"""
+
+    def record(self, step: Dict, state: Dict) -> None:
+        """Registra un passo convergente"""
+
+    def finish(self) -> Dict:
+        """Fine analisi: riepilogo da inserire nei risultati"""
+        return {}
+
+
+class StepRecorder(Recorder):
+    """Stato completo in memoria ogni `every` passi (campi selezionabili)"""
+
+    name = 'steps'
+
+    def __init__(self, every: int = 1, fields: Sequence[str] = STATE_FIELDS):
+        self.every = max(1, int(every))
+        self.fields = tuple(fields)
+        self.records: List[Dict] = []
+        self._count = 0
+
+    def start(self, info: Optional[Dict] = None) -> None:
+        self.records = []
+        self._count = 0
+
+    def record(self, step: Dict, state: Dict) -> None:
+        if self._count % self.every == 0:
+            entry = {'step': step.get('step'), 'lambda': step.get('lambda')}
+            for field in self.fields:
+                value = state.get(field)
+                if field == 'element_forces' and value is not None:
+                    value = [dict(f) for f in value]
+                elif isinstance(value, np.ndarray):
+                    value = value.copy()
+                entry[field] = value
+            self.records.append(entry)
+        self._count += 1
+
+    def finish(self) -> Dict:
+        return {'every': self.every, 'records': self.records}
+
+
+class EnvelopeRecorder(Recorder):
+    """Inviluppi (min/max) delle forze negli elementi e massimo |u| per DOF"""
+
+    name = 'envelope'
+
+    def __init__(self):
+        self._f_min = None
+        self._f_max = None
+        self._u_max = None
+        self._steps_at_max = None
+        self._count = 0
+
+    def start(self, info: Optional[Dict] = None) -> None:
+        self.__init__()
+
+    def record(self, step: Dict, state: Dict) -> None:
+        forces = state.get('element_forces')
+        if forces is not None:
+            f = element_forces_array(forces)
+            if self._f_max is None:
+                self._f_min = f.copy()
+                self._f_max = f.copy()
+                self._steps_at_max = np.full(f.shape, step.get('step', self._count))
+            else:
+                grow = np.abs(f) > np.maximum(np.abs(self._f_min), np.abs(self._f_max))
+                self._steps_at_max[grow] = step.get('step', self._count)
+                np.minimum(self._f_min, f, out=self._f_min)
+                np.maximum(self._f_max, f, out=self._f_max)
+        u = state.get('displacements')
+        if u is not None:
+            u = np.abs(np.asarray(u, dtype=float))
+            self._u_max = u.copy() if self._u_max is None else np.maximum(self._u_max, u)
+        self._count += 1
+
+    def finish(self) -> Dict:
+        out = {'n_steps': self._count, 'components': FORCE_COMPONENTS}
+        if self._f_max is not None:
+            out['element_min'] = self._f_min
+            out['element_max'] = self._f_max
+            out['element_step_at_max'] = self._steps_at_max
+        if self._u_max is not None:
+            out['max_abs_displacement'] = self._u_max
+        return out
+
+
+def _is_chunk(filename: str) -> bool:
+    return filename.startswith('chunk_') and filename.endswith('.npz')
+
+
+class NPZRecorder(Recorder):
+    """
+    Stato su disco in blocchi .npz (chunk_XXXXX.npz nella cartella `path`).
+
+    In memoria resta al più un blocco di `chunk_size` record; load()
+    ricompone gli array completi. start() elimina i blocchi di una
+    registrazione precedente nella stessa cartella.
+    """
+
+    name = 'npz'
+
+    def __init__(self, path: str, every: int = 1, chunk_size: int = 50,
+                 fields: Sequence[str] = STATE_FIELDS, dtype=np.float64):
+        self.path = path
+        self.every = max(1, int(every))
+        self.chunk_size = max(1, int(chunk_size))
+        self.fields = tuple(fields)
+        self.dtype = dtype
+        self._buffer: Dict[str, List] = {}
+        self._count = 0
+        self._n_records = 0
+        self._chunks: List[str] = []
+
+    def start(self, info: Optional[Dict] = None) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        for filename in os.listdir(self.path):
+            if _is_chunk(filename):
+                os.remove(os.path.join(self.path, filename))
+        self._buffer = {'step': [], 'lambda': []}
+        for field in self.fields:
+            self._buffer[field] = []
+        self._count = 0
+        self._n_records = 0
+        self._chunks = []
+
+    def record(self, step: Dict, state: Dict) -> None:
+        if not self._buffer:
+            self.start()
+        if self._count % self.every == 0:
+            self._buffer['step'].append(step.get('step', self._count))
+            self._buffer['lambda'].append(step.get('lambda', np.nan))
+            for field in self.fields:
+                value = state.get(field)
+                if field == 'element_forces':
+                    value = element_forces_array(value or [])
+                self._buffer[field].append(np.asarray(value, dtype=self.dtype))
+            self._n_records += 1
+            if len(self._buffer['step']) >= self.chunk_size:
+                self._flush()
+        self._count += 1
+
+    def _flush(self) -> None:
+        if not self._buffer.get('step'):
+            return
+        filename = os.path.join(self.path, f"chunk_{len(self._chunks):05d}.npz")
+        arrays = {key: np.asarray(values) for key, values in self._buffer.items()}
+        np.savez(filename, **arrays)
+        self._chunks.append(filename)
+        for values in self._buffer.values():
+            values.clear()
+        logger.debug(f"Recorder NPZ: scritto {filename}")
+
+    def finish(self) -> Dict:
+        self._flush()
+        return {'path': self.path, 'chunks': list(self._chunks),
+                'n_records': self._n_records, 'every': self.every, 'fields': self.fields}
+
+    @staticmethod
+    def load(path: str) -> Dict[str, np.ndarray]:
+        """Ricompone gli array registrati concatenando i blocchi"""
+        files = sorted(f for f in os.listdir(path) if _is_chunk(f))
+        parts: Dict[str, List[np.ndarray]] = {}
+        for filename in files:
+            with np.load(os.path.join(path, filename)) as data:
+                for key in data.files:
+                    parts.setdefault(key, []).append(data[key])
+        return {key: np.concatenate(values) for key, values in parts.items()}
+
+
+def make_recorders(record: str, path: Optional[str] = None, every: int = 1) -> List[Recorder]:
+    """
+    Recorder predefiniti per nome:
+    'curve' (solo curva), 'full' (stato completo in memoria), 'every'
+    (stato ogni `every` passi), 'envelope', 'npz' (su disco in `path`)
+    """
+    if record == 'curve':
+        return []
+    if record == 'full':
+        return [StepRecorder()]
+    if record == 'every':
+        return [StepRecorder(every=every)]
+    if record == 'envelope':
+        return [EnvelopeRecorder()]
+    if record == 'npz':
+        if not path:
+            raise ValueError("Recorder 'npz' richiede un percorso")
+        return [NPZRecorder(path, every=every)]
+    raise ValueError(f"Recorder non riconosciuto: {record}")
@@ -0,0 +1,293 @@
+# analyses/result_cache.py
+"""
+Cache persistente su disco dei risultati delle analisi.
+
+La chiave è l'impronta (stable_hash) di metodo, versione dell'engine,
+wall_data, campi di MaterialProperties, carichi e opzioni: riaprendo un
+progetto e ripetendo le verifiche senza modifiche i risultati sono letti
+dal disco invece di essere ricalcolati.
+
+Ogni voce è un file <chiave>.npz compresso nella cartella della cache:
+gli array NumPy sono salvati come tali, il resto del dizionario come
+JSON. La cartella è limitata in dimensione (max_bytes) con eliminazione
+delle voci usate meno di recente (LRU sul tempo di modifica, aggiornato
+a ogni lettura).
+
+La cache è disattivata di default; si attiva per il singolo motore
+
+    engine.result_cache = ResultCache('progetto/cache')
+
+oppure per il processo con set_result_cache(ResultCache(...)), e viene
+consultata in modo trasparente da MasonryFEMEngine.analyze_structure,
+analyze_por, analyze_sam e LimitAnalysis.analyze_all_mechanisms (queste
+ultime solo con la cache di processo). Nelle chiamate annidate
+(engine -> analyze_por) conta solo la più esterna. Il connettore Muratura
+usa una cache propria nella cartella del progetto, passata ai motori che
+crea, senza modificare quella di processo.
+I risultati sono memorizzati senza gli oggetti di runtime (il modello
+del telaio equivalente 'model' e le altre chiavi rimosse da
+comparison.strip_results): una lettura dalla cache restituisce il
+dizionario senza 'model'. Non sono memorizzati i risultati che contengono
+altri oggetti non serializzabili, quelli con opzioni non riconducibili al
+contenuto e le analisi che scrivono file (grafici, recorder,
+esportazioni).
+
+La versione dell'engine (MasonryFEMEngine.VERSION) fa parte della chiave:
+ogni modifica che cambia i risultati di un'analisi deve incrementarla,
+altrimenti la cache continua a restituire le voci calcolate prima.
+"""
+
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from enum import Enum
+from importlib import import_module
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+import numpy as np
+
+from .model_cache import stable_hash
+
+logger = logging.getLogger(__name__)
+
+# Formato delle voci: cambiandolo si invalidano le voci esistenti
+CACHE_FORMAT = 1
+
+# Servizi di runtime passati nelle opzioni: non fanno parte della chiave
+RUNTIME_OPTIONS = ('modal_solver', 'model_cache')
+
+# Opzioni con effetti su disco: l'analisi va sempre eseguita
+SIDE_EFFECT_OPTIONS = ('plot_results', 'plot_filename', 'export_filename',
+                       'record_path', 'output_path')
+
+
+class Uncacheable(TypeError):
+    """Risultato o input non memorizzabile nella cache"""
+
+
+# ============================================================================
+# SERIALIZZAZIONE
+# ============================================================================
+
+def _encode(obj: Any, arrays: Dict[str, np.ndarray]) -> Any:
+    """Forma JSON del risultato; gli array sono spostati in `arrays`"""
+    if obj is None or isinstance(obj, (bool, int, str)):
+        return obj
+    if isinstance(obj, float):
+        return obj
+    if isinstance(obj, Enum):
+        cls = type(obj)
+        return {'__enum__': f"{cls.__module__}:{cls.__qualname__}", 'value': _encode(obj.value, arrays)}
+    if isinstance(obj, np.generic):
+        return _encode(obj.item(), arrays)
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            raise Uncacheable("array di oggetti")
+        name = f"a{len(arrays)}"
+        arrays[name] = obj
+        return {'__ndarray__': name}
+    if isinstance(obj, dict):
+        if all(isinstance(k, str) for k in obj):
+            return {k: _encode(v, arrays) for k, v in obj.items()}
+        return {'__items__': [[_encode(k, arrays), _encode(v, arrays)] for k, v in obj.items()]}
+    if isinstance(obj, tuple):
+        return {'__tuple__': [_encode(v, arrays) for v in obj]}
+    if isinstance(obj, list):
+        return [_encode(v, arrays) for v in obj]
+    raise Uncacheable(f"tipo non serializzabile: {type(obj).__qualname__}")
+
+
+def _decode(obj: Any, arrays) -> Any:
+    if isinstance(obj, list):
+        return [_decode(v, arrays) for v in obj]
+    if not isinstance(obj, dict):
+        return obj
+    if '__ndarray__' in obj:
+        return arrays[obj['__ndarray__']]
+    if '__tuple__' in obj:
+        return tuple(_decode(v, arrays) for v in obj['__tuple__'])
+    if '__items__' in obj:
+        return {_decode(k, arrays): _decode(v, arrays) for k, v in obj['__items__']}
+    if '__enum__' in obj:
+        module, qualname = obj['__enum__'].split(':')
+        cls = import_module(module)
+        for part in qualname.split('.'):
+            cls = getattr(cls, part)
+        return cls(_decode(obj['value'], arrays))
+    return {k: _decode(v, arrays) for k, v in obj.items()}
+
+
+# ============================================================================
+# CACHE SU DISCO
+# ============================================================================
+
+class ResultCache:
+    """
+    Risultati delle analisi indicizzati per contenuto degli input.
+
+    Args:
+        path: Cartella della cache (creata se assente)
+        max_bytes: Dimensione massima della cartella (LRU oltre il limite)
+    """
+
+    def __init__(self, path: Union[str, Path], max_bytes: int = 256 * 1024 ** 2):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes deve essere > 0")
+        self.path = Path(path)
+        self.max_bytes = int(max_bytes)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'uncacheable': 0}
+
+    def key(self, method: str, version: str, wall_data: Any, material: Any,
+            loads: Any, options: Any = None) -> Optional[str]:
+        """Chiave della voce, None se gli input non sono riconducibili al contenuto"""
+        if isinstance(options, dict):
+            if any(options.get(k) for k in SIDE_EFFECT_OPTIONS):
+                return None
+            options = {k: v for k, v in options.items() if k not in RUNTIME_OPTIONS}
+        try:
+            return stable_hash({'format': CACHE_FORMAT, 'method': method, 'version': version,
+                                'wall_data': wall_data, 'material': material,
+                                'loads': loads, 'options': options}, strict=True)
+        except TypeError as e:
+            logger.debug(f"Cache risultati: chiave non calcolabile ({e})")
+            return None
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}.npz"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Risultato memorizzato (nuova copia) o None"""
+        filename = self._file(key)
+        try:
+            with np.load(filename, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files if name != '__json__'}
+                result = _decode(json.loads(data['__json__'].tobytes().decode('utf-8')), arrays)
+        except FileNotFoundError:
+            self.stats['misses'] += 1
+            return None
+        except Exception as e:
+            # Voce danneggiata o di formato diverso: eliminata
+            logger.warning(f"Cache risultati: voce {filename.name} non leggibile ({e})")
+            filename.unlink(missing_ok=True)
+            self.stats['misses'] += 1
+            return None
+        os.utime(filename)
+        self.stats['hits'] += 1
+        return result
+
+    def put(self, key: str, result: Any) -> bool:
+        """Memorizza il risultato; False se non serializzabile"""
+        arrays: Dict[str, np.ndarray] = {}
+        try:
+            text = json.dumps(_encode(result, arrays))
+        except (Uncacheable, ValueError) as e:
+            logger.debug(f"Cache risultati: risultato non memorizzato ({e})")
+            self.stats['uncacheable'] += 1
+            return False
+        filename = self._file(key)
+        tmp = filename.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp.npz")
+        try:
+            np.savez_compressed(tmp, __json__=np.frombuffer(text.encode('utf-8'), dtype=np.uint8),
+                                **arrays)
+            os.replace(tmp, filename)
+        except OSError as e:
+            logger.warning(f"Cache risultati: scrittura fallita ({e})")
+            tmp.unlink(missing_ok=True)
+            return False
+        self.stats['stores'] += 1
+        self._evict()
+        return True
+
+    def _evict(self) -> None:
+        """Elimina le voci meno recenti oltre max_bytes"""
+        entries = []
+        for filename in self.path.glob('*.npz'):
+            if filename.name.endswith('.tmp.npz'):
+                continue
+            try:
+                st = filename.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, filename))
+        total = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            filename.unlink(missing_ok=True)
+            total -= size
+            self.stats['evictions'] += 1
+
+    def size(self) -> int:
+        """Dimensione attuale della cache [byte]"""
+        return sum(f.stat().st_size for f in self.path.glob('*.npz'))
+
+    def clear(self) -> None:
+        for filename in self.path.glob('*.npz'):
+            filename.unlink(missing_ok=True)
+
+
+# ============================================================================
+# CACHE DI PROCESSO
+# ============================================================================
+
+_default_cache: Optional[ResultCache] = None
+_local = threading.local()
+
+
+def set_result_cache(cache: Optional[ResultCache]) -> Optional[ResultCache]:
+    """Imposta la cache usata dalle analisi (None per disattivarla); restituisce la precedente"""
+    global _default_cache
+    previous, _default_cache = _default_cache, cache
+    return previous
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    return _default_cache
+
+
+@contextmanager
+def _nested():
+    _local.depth = getattr(_local, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _local.depth -= 1
+
+
+def cached_analysis(method: str, version: str, compute: Callable[[], Any],
+                    wall_data: Any, material: Any, loads: Any, options: Any = None,
+                    cache: Optional[ResultCache] = None) -> Any:
+    """
+    Risultato di compute() letto dalla cache o calcolato e memorizzato.
+
+    cache: cache da usare (default quella di processo); le chiamate
+    annidate in un'analisi già in corso calcolano senza consultarla.
+    Il risultato calcolato è restituito completo, quello memorizzato (e
+    quindi quello letto dalla cache) è privo degli oggetti di runtime.
+    """
+    from ..comparison import strip_results
+
+    cache = cache if cache is not None else _default_cache
+    if cache is None or getattr(_local, 'depth', 0) > 0:
+        return compute()
+    key = cache.key(method, version, wall_data, material, loads, options)
+    if key is not None:
+        result = cache.get(key)
+        if result is not None:
+            logger.info(f"Cache risultati: {method} letto da disco ({key[:12]})")
+            return result
+    with _nested():
+        result = compute()
+    if key is not None and not (isinstance(result, dict) and 'error' in result):
+        cache.put(key, strip_results(result))
+    return result
+
+
+def engine_version() -> str:
+    """Versione dell'engine (parte della chiave anche per le analisi chiamate direttamente)"""
+    from ..engine import MasonryFEMEngine
+    return MasonryFEMEngine.VERSION
@@ -32,6 +32,7 @@ from enum import Enum
 
 # Import centralizzato da enums.py
 from ..enums import LoadDistribution, LoadDistributionMethod
+from .result_cache import cached_analysis, engine_version
 
 # Configurazione logger con NullHandler per uso come libreria
 logger = logging.getLogger(__name__)
@@ -1444,8 +1445,17 @@ def analyze_sam(wall_data: Dict, material: MaterialProperties,
         options: Opzioni di analisi
         
     Returns:
-        Dizionario con risultati dell'analisi
+        Dizionario con risultati dell'analisi (dalla cache risultati, se
+        attiva, per input identici)
     """
+    return cached_analysis('SAM', engine_version(),
+                           lambda: _compute_sam(wall_data, material, loads, options),
+                           wall_data, material, loads, options)
+
+
+def _compute_sam(wall_data: Dict, material: MaterialProperties,
+                 loads: Dict, options: Dict = None) -> Dict:
+    """Calcolo SAM (analyze_sam senza cache)"""
     # Configurazione analisi
     config = AnalysisConfig()
     if options:
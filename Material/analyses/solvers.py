@@ -0,0 +1,405 @@
+# analyses/solvers.py
+"""
+Backend di risoluzione per sistemi lineari sparsi (FEM, telaio, fibre, micro).
+
+LinearSolver fattorizza una matrice una sola volta e riusa la fattorizzazione
+finché la matrice non cambia: la cache è indicizzata sull'identità
+dell'oggetto e su un contatore di versione che va incrementato con
+mark_modified() quando i dati vengono modificati sul posto.
+Per sistemi simmetrici definiti positivi usa Cholesky (scikit-sparse /
+CHOLMOD) se disponibile, altrimenti SuperLU (splu).
+
+La numerazione dei DOF segue gli id dei nodi; per ridurre il fill-in il
+solver può riordinare il sistema (reverse Cuthill-McKee o minimo grado)
+una volta per topologia e restituisce la soluzione nella numerazione
+originale.
+
+LowRankSolver mantiene la fattorizzazione di una matrice base e applica
+modifiche di rango limitato (es. cerniere plastiche) con la formula di
+Sherman-Morrison-Woodbury, rifattorizzando solo oltre un rango massimo.
+"""
+
+import logging
+import weakref
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from scipy.linalg import lu_factor, lu_solve
+from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, issparse
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+from scipy.sparse.linalg import splu, spsolve
+
+try:
+    from sksparse.cholmod import cholesky as _cholmod_cholesky
+    from sksparse.cholmod import CholmodNotPositiveDefiniteError
+    HAS_CHOLMOD = True
+except ImportError:
+    _cholmod_cholesky = None
+    CholmodNotPositiveDefiniteError = None
+    HAS_CHOLMOD = False
+
+logger = logging.getLogger(__name__)
+
+_VERSION_ATTR = '_solver_version'
+
+# 'default': ordinamento interno del fattorizzatore (COLAMD per SuperLU)
+# 'natural': nessun riordino; 'rcm': reverse Cuthill-McKee esplicito;
+# 'amd': minimo grado su A+A^T (AMD in CHOLMOD, MMD in SuperLU)
+ORDERINGS = ('default', 'natural', 'rcm', 'amd')
+_SUPERLU_PERMC = {'default': 'COLAMD', 'natural': 'NATURAL', 'rcm': 'NATURAL',
+                  'amd': 'MMD_AT_PLUS_A'}
+_CHOLMOD_ORDERING = {'default': 'default', 'natural': 'natural', 'rcm': 'natural',
+                     'amd': 'amd'}
+
+
+def mark_modified(A) -> None:
+    """Segnala che i dati di A sono stati modificati sul posto (invalida la cache)"""
+    setattr(A, _VERSION_ATTR, getattr(A, _VERSION_ATTR, 0) + 1)
+
+
+def matrix_version(A) -> int:
+    return getattr(A, _VERSION_ATTR, 0)
+
+
+def topology_key(A) -> Tuple:
+    """Firma economica della struttura di sparsità (forma, nnz, crc di indptr/indices)"""
+    A = A if isinstance(A, csr_matrix) else csr_matrix(A)
+    crc = zlib.crc32(np.ascontiguousarray(A.indptr).view(np.uint8))
+    crc = zlib.crc32(np.ascontiguousarray(A.indices).view(np.uint8), crc)
+    return (A.shape, A.nnz, crc)
+
+
+def bandwidth(A) -> int:
+    """Semi-banda massima |i - j| sui termini non nulli"""
+    coo = A.tocoo()
+    return int(np.max(np.abs(coo.row - coo.col))) if coo.nnz else 0
+
+
+def rcm_permutation(A) -> np.ndarray:
+    """Permutazione reverse Cuthill-McKee sul grafo simmetrizzato di A"""
+    A = csr_matrix(A)
+    pattern = csr_matrix((np.ones(A.nnz), A.indices, A.indptr), shape=A.shape)
+    return np.asarray(reverse_cuthill_mckee(pattern + pattern.T, symmetric_mode=True),
+                      dtype=np.int64)
+
+
+def is_symmetric(A, rtol: float = 1e-10) -> bool:
+    """Verifica di simmetria numerica per matrici sparse"""
+    diff = A - A.T
+    if diff.nnz == 0:
+        return True
+    scale = np.max(np.abs(A.data)) if A.nnz else 0.0
+    return float(np.max(np.abs(diff.data))) <= rtol * max(scale, 1e-300)
+
+
+class Factorization:
+    """Fattorizzazione di una matrice con metodo e statistiche"""
+
+    def __init__(self, solve: Callable[[np.ndarray], np.ndarray], method: str, n: int,
+                 nnz_L: Optional[int] = None, perm: Optional[np.ndarray] = None,
+                 ordering: str = 'default'):
+        self._solve = solve
+        self.method = method
+        self.n = n
+        self.nnz_L = nnz_L  # termini non nulli del fattore (L per Cholesky, L+U per LU)
+        self.perm = perm    # permutazione simmetrica applicata prima della fattorizzazione
+        self.ordering = ordering
+        self.n_solves = 0
+
+    def solve(self, b: np.ndarray) -> np.ndarray:
+        """Risolve per uno o più termini noti (b di forma (n,) o (n, k))"""
+        self.n_solves += 1
+        b = np.asarray(b, dtype=float)
+        if self.perm is None:
+            return self._solve(b)
+        x = np.empty_like(b)
+        x[self.perm] = self._solve(b[self.perm])
+        return x
+
+
+class LinearSolver:
+    """
+    Risolutore diretto sparso con riuso delle fattorizzazioni.
+
+    Args:
+        method: 'auto' (Cholesky se SPD e CHOLMOD disponibile, altrimenti LU),
+                'cholesky', 'lu' o 'spsolve' (nessuna cache, comportamento storico)
+        cache_size: Numero massimo di fattorizzazioni mantenute
+        ordering: Riordino dei DOF prima della fattorizzazione (vedi ORDERINGS)
+    """
+
+    def __init__(self, method: str = 'auto', cache_size: int = 4,
+                 ordering: str = 'default'):
+        if method not in ('auto', 'cholesky', 'lu', 'spsolve'):
+            raise ValueError(f"Metodo solver non riconosciuto: {method}")
+        if ordering not in ORDERINGS:
+            raise ValueError(f"Ordinamento non riconosciuto: {ordering}")
+        self.method = method
+        self.cache_size = cache_size
+        self.ordering = ordering
+        self._cache: 'OrderedDict[int, Dict]' = OrderedDict()
+        self._permutations: 'OrderedDict[Tuple, np.ndarray]' = OrderedDict()
+        self.stats = {'factorizations': 0, 'solves': 0, 'cache_hits': 0,
+                      'orderings': 0, 'nnz_L': None}
+
+    def factorize(self, A, spd: Optional[bool] = None) -> Factorization:
+        """Restituisce la fattorizzazione di A, calcolandola solo se non in cache"""
+        key = id(A)
+        entry = self._cache.get(key)
+        if (entry is not None and entry['ref']() is A
+                and entry['version'] == matrix_version(A)
+                and entry['nnz'] == A.nnz and entry['shape'] == A.shape):
+            self._cache.move_to_end(key)
+            self.stats['cache_hits'] += 1
+            return entry['factor']
+
+        factor = self._factorize(A, spd)
+        self.stats['factorizations'] += 1
+        self.stats['nnz_L'] = factor.nnz_L
+
+        self._cache[key] = {
+            'ref': weakref.ref(A),
+            'version': matrix_version(A),
+            'nnz': A.nnz,
+            'shape': A.shape,
+            'factor': factor
+        }
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return factor
+
+    def solve(self, A, b: np.ndarray, spd: Optional[bool] = None) -> np.ndarray:
+        """
+        Risolve A x = b riusando la fattorizzazione di A se già calcolata.
+
+        Args:
+            A: Matrice sparsa quadrata
+            b: Termine noto (n,) oppure più termini noti (n, k)
+            spd: True/False se nota la definitezza; None per rilevamento automatico
+        """
+        self.stats['solves'] += 1
+        if self.method == 'spsolve':
+            return spsolve(csr_matrix(A), b)
+        return self.factorize(A, spd).solve(b)
+
+    def invalidate(self, A=None) -> None:
+        """Svuota la cache (tutta o per la sola matrice A)"""
+        if A is None:
+            self._cache.clear()
+            self._permutations.clear()
+        else:
+            self._cache.pop(id(A), None)
+
+    def ordering_report(self, A, spd: Optional[bool] = None) -> Dict:
+        """
+        Confronta il fill-in del fattore senza riordino e con l'ordinamento del solver.
+
+        Returns:
+            Dict con nnz(A), banda e nnz del fattore prima ('natural') e dopo
+            (ordinamento corrente), e rapporto di riduzione della memoria.
+        """
+        A = csr_matrix(A)
+        natural = LinearSolver(self.method, cache_size=1, ordering='natural')
+        f_nat = natural._factorize(A, spd)
+        f_ord = self._factorize(A, spd)
+        perm = self._permutations.get(topology_key(A)) if self.ordering in ('rcm', 'amd') else None
+        if perm is None:
+            perm = np.arange(A.shape[0])
+        report = {
+            'n': A.shape[0],
+            'nnz_A': int(A.nnz),
+            'ordering': self.ordering,
+            'method': f_ord.method,
+            'bandwidth_before': bandwidth(A),
+            'bandwidth_after': bandwidth(A[perm][:, perm]),
+            'nnz_L_before': f_nat.nnz_L,
+            'nnz_L_after': f_ord.nnz_L,
+        }
+        if f_nat.nnz_L and f_ord.nnz_L:
+            report['fill_reduction'] = f_nat.nnz_L / f_ord.nnz_L
+        logger.info(f"Riordino DOF '{self.ordering}': nnz(L) {f_nat.nnz_L} -> {f_ord.nnz_L}, "
+                    f"banda {report['bandwidth_before']} -> {report['bandwidth_after']}")
+        return report
+
+    def _store_permutation(self, key: Tuple, perm: np.ndarray) -> None:
+        self.stats['orderings'] += 1
+        self._permutations[key] = perm
+        while len(self._permutations) > self.cache_size:
+            self._permutations.popitem(last=False)
+
+    def _factorize(self, A, spd: Optional[bool]) -> Factorization:
+        if not issparse(A):
+            A = csr_matrix(A)
+        n = A.shape[0]
+
+        # Permutazione esplicita calcolata una sola volta per topologia:
+        # 'rcm' da csgraph, 'amd' ricavata dalla prima fattorizzazione
+        perm = None
+        key = None
+        internal = self.ordering
+        if self.ordering in ('rcm', 'amd'):
+            key = topology_key(A)
+            perm = self._permutations.get(key)
+            if perm is None and self.ordering == 'rcm':
+                perm = rcm_permutation(A)
+                self._store_permutation(key, perm)
+            if perm is not None:
+                self._permutations.move_to_end(key)
+                A = csr_matrix(A)[perm][:, perm]
+                internal = 'natural'
+        learn = self.ordering == 'amd' and perm is None
+
+        use_cholesky = self.method == 'cholesky' or (
+            self.method == 'auto' and HAS_CHOLMOD and
+            (spd if spd is not None else self._looks_spd(A))
+        )
+        if use_cholesky:
+            if not HAS_CHOLMOD:
+                logger.warning("scikit-sparse non disponibile: uso fattorizzazione LU")
+            else:
+                try:
+                    chol = _cholmod_cholesky(csc_matrix(A),
+                                             ordering_method=_CHOLMOD_ORDERING[internal])
+                    if learn:
+                        self._store_permutation(key, np.asarray(chol.P(), dtype=np.int64))
+                    return Factorization(chol, 'cholesky', n, chol.L().nnz, perm, self.ordering)
+                except CholmodNotPositiveDefiniteError:
+                    logger.debug("Matrice non definita positiva: uso fattorizzazione LU")
+
+        try:
+            lu = splu(csc_matrix(A), permc_spec=_SUPERLU_PERMC[internal])
+            if learn:
+                # Pr A Pc = LU: la permutazione simmetrica equivalente è l'inversa di perm_c
+                self._store_permutation(key, np.argsort(lu.perm_c).astype(np.int64))
+            return Factorization(lu.solve, 'lu', n, lu.L.nnz + lu.U.nnz - n, perm, self.ordering)
+        except RuntimeError as e:
+            # Matrice singolare: ripiega su spsolve (stesso esito del codice storico)
+            logger.warning(f"Fattorizzazione LU fallita ({e}), uso spsolve")
+            A_csr = csr_matrix(A)
+            return Factorization(lambda b: spsolve(A_csr, b), 'spsolve', n, None, perm, self.ordering)
+
+    @staticmethod
+    def _looks_spd(A) -> bool:
+        """Euristica economica: simmetrica con diagonale positiva"""
+        diag = A.diagonal()
+        return bool(np.all(diag > 0)) and is_symmetric(A)
+
+
+class LowRankSolver:
+    """
+    Risolutore per A = A0 + P D P^T con A0 fattorizzata una sola volta.
+
+    P seleziona i DOF toccati dalle modifiche e D è il blocco denso
+    accumulato. La soluzione usa Woodbury nella forma che non richiede
+    D invertibile:
+
+        x = y - Z (I + D P^T Z)^-1 D P^T y,   y = A0^-1 b,   Z = A0^-1 P
+
+    Le colonne di Z si calcolano una volta per DOF (soluzioni triangolari
+    con la fattorizzazione di A0). Quando i DOF toccati superano max_rank
+    la matrice corrente diventa la nuova base e viene rifattorizzata.
+
+    Args:
+        linear_solver: LinearSolver usato per fattorizzare la base
+        max_rank: Numero massimo di DOF modificati prima della rifattorizzazione
+    """
+
+    def __init__(self, linear_solver: Optional[LinearSolver] = None, max_rank: int = 64):
+        self.linear_solver = linear_solver or LinearSolver()
+        self.max_rank = max_rank
+        self.A0 = None
+        self._factor: Optional[Factorization] = None
+        self.stats = {'refactorizations': 0, 'updates': 0, 'solves': 0, 'max_rank': 0}
+        self._reset_update()
+
+    def _reset_update(self) -> None:
+        self._dofs = np.zeros(0, dtype=np.int64)
+        self._pos: Dict[int, int] = {}
+        self._D = np.zeros((0, 0))
+        self._Z = None
+        self._capacitance = None
+
+    @property
+    def rank(self) -> int:
+        """DOF attualmente coinvolti nella modifica a basso rango"""
+        return len(self._dofs)
+
+    def set_base(self, A) -> None:
+        """Fattorizza A come nuova matrice base e azzera le modifiche accumulate"""
+        self.A0 = A
+        self._factor = self.linear_solver.factorize(A)
+        self.stats['refactorizations'] += 1
+        self._reset_update()
+
+    def current_matrix(self) -> csr_matrix:
+        """Matrice corrente A0 + P D P^T (sparsa)"""
+        A = csr_matrix(self.A0)
+        if self.rank == 0:
+            return A
+        r, c = np.nonzero(self._D)
+        delta = coo_matrix((self._D[r, c], (self._dofs[r], self._dofs[c])), shape=A.shape)
+        return (A + delta).tocsr()
+
+    def update(self, dofs, delta: np.ndarray) -> None:
+        """
+        Accumula la modifica A += P_dofs delta P_dofs^T.
+
+        Args:
+            dofs: Indici globali (k,) delle righe/colonne modificate
+            delta: Blocco denso (k, k) da sommare
+        """
+        if self._factor is None:
+            raise RuntimeError("LowRankSolver: matrice base non impostata")
+        dofs = np.asarray(dofs, dtype=np.int64)
+        delta = np.asarray(delta, dtype=float)
+        if dofs.size == 0:
+            return
+
+        new = [d for d in dict.fromkeys(dofs.tolist()) if d not in self._pos]
+        if self.rank + len(new) > self.max_rank:
+            # Rango eccessivo: la matrice aggiornata diventa la nuova base
+            A = self.current_matrix()
+            k = len(dofs)
+            A = (A + coo_matrix((delta.ravel(), (np.repeat(dofs, k), np.tile(dofs, k))),
+                                shape=A.shape)).tocsr()
+            logger.debug(f"Rango {self.rank + len(new)} > {self.max_rank}: rifattorizzazione")
+            self.set_base(A)
+            self.stats['updates'] += 1
+            return
+
+        if new:
+            k_old = self.rank
+            for d in new:
+                self._pos[d] = len(self._pos)
+            self._dofs = np.concatenate([self._dofs, np.asarray(new, dtype=np.int64)])
+            D = np.zeros((self.rank, self.rank))
+            D[:k_old, :k_old] = self._D
+            self._D = D
+            # Nuove colonne Z = A0^-1 e_d
+            E = np.zeros((self._factor.n, len(new)))
+            E[new, np.arange(len(new))] = 1.0
+            Z_new = self._factor.solve(E).reshape(self._factor.n, len(new))
+            self._Z = Z_new if self._Z is None else np.hstack([self._Z, Z_new])
+
+        local = np.array([self._pos[d] for d in dofs.tolist()], dtype=np.int64)
+        np.add.at(self._D, (local[:, None], local[None, :]), delta)
+
+        k = self.rank
+        C = np.eye(k) + self._D @ self._Z[self._dofs]
+        self._capacitance = lu_factor(C)
+        self.stats['updates'] += 1
+        self.stats['max_rank'] = max(self.stats['max_rank'], k)
+
+    def solve(self, b: np.ndarray) -> np.ndarray:
+        """Risolve (A0 + P D P^T) x = b con una soluzione sulla base e un sistema k x k"""
+        if self._factor is None:
+            raise RuntimeError("LowRankSolver: matrice base non impostata")
+        self.stats['solves'] += 1
+        y = self._factor.solve(b)
+        if self.rank == 0:
+            return y
+        w = lu_solve(self._capacitance, self._D @ y[self._dofs])
+        return y - self._Z @ w
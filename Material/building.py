@@ -0,0 +1,292 @@
+# building.py - Analisi dell'intero edificio parete per parete
+"""
+Scheduler delle analisi a livello di edificio.
+
+Le pareti di un edificio sono analizzate con il telaio equivalente
+seguendo un grafo di attività:
+
+    material:<nome>  ->  model:<chiave>  ->  analysis:<chiave>:<tipo>  ->  aggregate
+
+- material: proprietà del materiale (una volta per materiale usato)
+- model:    modello di parete; la chiave è l'hash del contenuto
+            (geometria, masse, materiale), per cui pareti identiche
+            condividono lo stesso modello e le stesse analisi
+- analysis: analisi richieste sul modello (pushover, modale)
+- aggregate: verifica consolidata dell'edificio
+
+I nodi model/analysis della stessa chiave sono eseguiti insieme nello
+stesso processo di lavoro, così le analisi riusano il modello tramite la
+cache dell'engine; chiavi diverse girano in parallelo in un
+ProcessPoolExecutor.
+
+Uso:
+    from Material.building import analyze_building
+    result = analyze_building(walls, materials, analyses=('pushover',),
+                              n_workers=4, progress=callback)
+dove walls = {nome: {'wall_data': {...}, 'material': nome_materiale,
+'storey': piano, 'direction': 'x' | 'y'}} e callback(done, total, message).
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .analyses.model_cache import stable_hash
+from .analyses.result_cache import ResultCache
+from .comparison import strip_results
+from .materials import MaterialProperties
+
+logger = logging.getLogger(__name__)
+
+BUILDING_ANALYSES = ('pushover', 'modal')
+
+ProgressCallback = Callable[[int, int, str], None]
+
+
+def _model_key(wall_data: Dict, material: MaterialProperties) -> str:
+    return stable_hash({'wall_data': wall_data, 'material': material})[:16]
+
+
+def build_task_graph(walls: Dict[str, Dict], materials: Dict[str, MaterialProperties],
+                     analyses: Sequence[str] = ('pushover',)) -> Dict:
+    """
+    Grafo delle attività per le pareti assegnate.
+
+    Returns:
+        {'nodes': {id: {'kind', 'deps', ...}}, 'models': {chiave: [pareti]},
+         'skipped': {parete: motivo}}
+    """
+    for analysis in analyses:
+        if analysis not in BUILDING_ANALYSES:
+            raise ValueError(f"Analisi non supportata a livello di edificio: {analysis}")
+
+    nodes: Dict[str, Dict] = {}
+    models: Dict[str, List[str]] = {}
+    skipped: Dict[str, str] = {}
+
+    for name, wall in walls.items():
+        mat_name = wall.get('material')
+        if not mat_name:
+            skipped[name] = 'materiale non assegnato'
+            continue
+        if mat_name not in materials:
+            skipped[name] = f"materiale '{mat_name}' non definito"
+            continue
+
+        mat_id = f"material:{mat_name}"
+        nodes.setdefault(mat_id, {'kind': 'material', 'deps': [], 'material': mat_name})
+
+        key = _model_key(wall['wall_data'], materials[mat_name])
+        model_id = f"model:{key}"
+        if model_id not in nodes:
+            nodes[model_id] = {'kind': 'model', 'deps': [mat_id], 'key': key,
+                               'wall': name, 'material': mat_name}
+            for analysis in analyses:
+                nodes[f"analysis:{key}:{analysis}"] = {
+                    'kind': 'analysis', 'deps': [model_id], 'key': key, 'analysis': analysis}
+        models.setdefault(key, []).append(name)
+
+    nodes['aggregate'] = {'kind': 'aggregate',
+                          'deps': [n for n, node in nodes.items() if node['kind'] == 'analysis']}
+    return {'nodes': nodes, 'models': models, 'skipped': skipped}
+
+
+def _run_wall(key: str, wall_data: Dict, material: MaterialProperties,
+              analyses: Sequence[str], options: Dict,
+              result_cache: Optional[ResultCache] = None) -> Dict:
+    """Modello e analisi di una chiave (nel processo di lavoro)"""
+    from .engine import MasonryFEMEngine
+    from .enums import AnalysisMethod
+
+    engine = MasonryFEMEngine(AnalysisMethod.FRAME)
+    engine.result_cache = result_cache
+    out = {'key': key, 'analyses': {}, 'times': {}, 'errors': {}}
+    for analysis in analyses:
+        t0 = time.perf_counter()
+        analysis_options = {**options.get(analysis, {}), 'analysis_type': analysis}
+        try:
+            results = engine.analyze_structure(wall_data, material, {}, analysis_options)
+            out['analyses'][analysis] = strip_results(results)
+        except Exception as e:
+            logger.error(f"Edificio: analisi {analysis} fallita ({key}): {e}")
+            out['errors'][analysis] = f"{type(e).__name__}: {e}"
+        out['times'][analysis] = time.perf_counter() - t0
+    return out
+
+
+def wall_verification(results: Dict) -> Dict:
+    """
+    Sintesi di verifica di una parete dai risultati del telaio equivalente.
+
+    Verifica in spostamento (N2): domanda al punto di prestazione
+    confrontata con lo spostamento ultimo della bilineare equivalente.
+    """
+    row = {'V_max': None, 'delta_u': None, 'delta_demand': None, 'DCR': None,
+           'verified': None, 'T1': None}
+    modal = (results.get('modal') or results.get('pushover') or {}).get('analyses', {}).get('modal')
+    if modal and len(modal.get('periods', [])):
+        row['T1'] = float(modal['periods'][0])
+
+    pushover = (results.get('pushover') or {}).get('analyses', {}).get('pushover')
+    if not pushover:
+        return row
+    curve = pushover.get('curve', {})
+    if curve.get('V_base'):
+        row['V_max'] = float(max(curve['V_base']))
+    bilinear = pushover.get('bilinear')
+    if bilinear:
+        row['delta_u'] = float(bilinear['delta_u'])
+    elif curve.get('delta_top'):
+        row['delta_u'] = float(curve['delta_top'][-1])
+    pp = pushover.get('performance_point')
+    if pp:
+        row['delta_demand'] = float(pp['delta_target'])
+    if row['delta_demand'] is not None and row['delta_u']:
+        row['DCR'] = row['delta_demand'] / row['delta_u']
+        row['verified'] = row['DCR'] <= 1.0
+    return row
+
+
+def aggregate_building(walls: Dict[str, Dict], graph: Dict, outputs: Dict[str, Dict]) -> Dict:
+    """
+    Verifica consolidata: righe per parete, totali per piano e direzione.
+
+    verified è False se una parete non è verificata o ha errori, None
+    (non determinato) se nessuna parete è verificabile o se ci sono pareti
+    escluse dal grafo ('skipped'), True altrimenti.
+    """
+    rows = []
+    for key, names in graph['models'].items():
+        output = outputs.get(key, {'analyses': {}, 'errors': {'model': 'non eseguito'}, 'times': {}})
+        check = wall_verification(output['analyses'])
+        for name in names:
+            wall = walls[name]
+            rows.append({'wall': name, 'storey': wall.get('storey', 0),
+                         'direction': wall.get('direction'), 'model_key': key,
+                         'shared_with': [n for n in names if n != name],
+                         'errors': dict(output['errors']), **check})
+    rows.sort(key=lambda r: (r['storey'], r['wall']))
+
+    by_storey: Dict[Any, Dict] = {}
+    for row in rows:
+        storey = by_storey.setdefault(row['storey'], {'n_walls': 0, 'V_max': {}})
+        storey['n_walls'] += 1
+        if row['V_max'] is not None:
+            direction = row['direction'] or 'n.d.'
+            storey['V_max'][direction] = storey['V_max'].get(direction, 0.0) + row['V_max']
+
+    checked = [r for r in rows if r['verified'] is not None]
+    governing = max(checked, key=lambda r: r['DCR']) if checked else None
+    failed = [r['wall'] for r in rows if r['errors']]
+    if failed or any(not r['verified'] for r in checked):
+        verified = False
+    elif checked and not graph['skipped']:
+        verified = all(r['verified'] for r in checked)
+    else:
+        # Pareti escluse (materiale mancante) non verificate: esito non determinato
+        verified = None
+
+    return {
+        'walls': rows,
+        'storeys': by_storey,
+        'skipped': dict(graph['skipped']),
+        'failed': failed,
+        'governing_wall': governing['wall'] if governing else None,
+        'max_DCR': governing['DCR'] if governing else None,
+        'n_checked': len(checked),
+        'verified': verified,
+    }
+
+
+def analyze_building(walls: Dict[str, Dict], materials: Dict[str, MaterialProperties],
+                     analyses: Sequence[str] = ('pushover',),
+                     options: Optional[Dict[str, Dict]] = None,
+                     n_workers: Optional[int] = None,
+                     progress: Optional[ProgressCallback] = None,
+                     result_cache: Optional[ResultCache] = None) -> Dict:
+    """
+    Esegue le analisi su tutte le pareti dell'edificio.
+
+    Args:
+        walls: {nome: {'wall_data', 'material', 'storey', 'direction'}}
+        materials: {nome: MaterialProperties}
+        analyses: analisi per parete ('pushover', 'modal')
+        options: opzioni per tipo di analisi ({'pushover': {'target_drift': 0.02}})
+        n_workers: processi (None = CPU disponibili, 1 = nel processo corrente)
+        progress: callback(completati, totale, messaggio)
+        result_cache: cache risultati su disco per le analisi delle pareti
+            (None = quella di processo)
+
+    Returns:
+        Verifica consolidata (aggregate_building) con in più 'results'
+        (risultati per chiave di modello), 'graph', 'stats' e 'wall_time'
+    """
+    options = options or {}
+    analyses = tuple(dict.fromkeys(analyses))
+    graph = build_task_graph(walls, materials, analyses)
+    nodes = graph['nodes']
+    total = len(nodes)
+    done = 0
+    t_start = time.perf_counter()
+
+    def _progress(message: str, n: int = 1) -> None:
+        nonlocal done
+        done += n
+        logger.info(f"Edificio [{done}/{total}] {message}")
+        if progress is not None:
+            progress(done, total, message)
+
+    # Materiali: risolti nel processo corrente
+    for node in nodes.values():
+        if node['kind'] == 'material':
+            _progress(f"materiale {node['material']}")
+
+    jobs = {node['key']: node for node in nodes.values() if node['kind'] == 'model'}
+    outputs: Dict[str, Dict] = {}
+
+    def _collect(key: str, output: Dict) -> None:
+        outputs[key] = output
+        names = ', '.join(graph['models'][key])
+        status = 'errori' if output['errors'] else 'completata'
+        _progress(f"pareti {names}: {', '.join(analyses)} {status}", 1 + len(analyses))
+
+    workers = min(n_workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1 or len(jobs) <= 1:
+        for key, node in jobs.items():
+            _collect(key, _run_wall(key, walls[node['wall']]['wall_data'],
+                                    materials[node['material']], analyses, options,
+                                    result_cache))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = {
+                executor.submit(_run_wall, key, walls[node['wall']]['wall_data'],
+                                materials[node['material']], analyses, options,
+                                result_cache): key
+                for key, node in jobs.items()
+            }
+            while pending:
+                finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = pending.pop(future)
+                    try:
+                        output = future.result()
+                    except Exception as e:
+                        # Processo di lavoro terminato in modo anomalo
+                        output = {'key': key, 'analyses': {}, 'times': {},
+                                  'errors': {'model': f"{type(e).__name__}: {e}"}}
+                    _collect(key, output)
+
+    result = aggregate_building(walls, graph, outputs)
+    _progress('verifica edificio')
+    n_walls = sum(len(names) for names in graph['models'].values())
+    result.update({
+        'results': outputs,
+        'graph': {n: {'kind': node['kind'], 'deps': list(node['deps'])} for n, node in nodes.items()},
+        'stats': {'n_walls': n_walls, 'n_models': len(jobs),
+                  'shared_models': n_walls - len(jobs), 'n_workers': max(1, workers),
+                  'analysis_time': sum(sum(o['times'].values()) for o in outputs.values())},
+        'wall_time': time.perf_counter() - t_start,
+    })
+    return result
@@ -0,0 +1,309 @@
+# comparison.py - Confronto tra metodi di analisi
+"""
+Esecuzione parallela di più metodi di analisi sulla stessa parete.
+
+Ogni metodo gira in un processo separato (ProcessPoolExecutor) con un
+proprio timeout; i risultati sono ricondotti a una tabella omogenea:
+
+    metodo | capacità | modo governante | DCR | tempo [s] | stato
+
+Uso tipico (controllo incrociato POR / SAM / TELAIO):
+
+    from Material.comparison import compare_methods
+    table = compare_methods(wall_data, material, loads,
+                            methods=['POR', 'SAM', 'FRAME'], timeout=60)
+    print(format_comparison(table))
+
+Note:
+    - Il timeout decorre dall'invio del metodo al pool: con meno processi
+      che metodi include l'eventuale attesa in coda.
+    - Un processo scaduto viene terminato; gli altri metodi proseguono.
+    - Con parallel=False i metodi girano in sequenza nel processo corrente
+      (utile per il debug) e il timeout non è applicato.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Optional, Sequence, Union
+
+import numpy as np
+
+from .enums import AnalysisMethod
+from .materials import MaterialProperties
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METHODS = ('POR', 'SAM', 'FRAME')
+DEFAULT_TIMEOUT = 120.0
+
+# Chiavi non serializzabili/voluminose rimosse dai risultati restituiti dai processi
+_HEAVY_KEYS = ('model', 'frame_model', 'modal_solver', 'model_cache')
+
+
+def resolve_method(method: Union[str, AnalysisMethod]) -> AnalysisMethod:
+    """AnalysisMethod da enum, nome ('FRAME') o valore ('TELAIO_EQUIVALENTE')"""
+    if isinstance(method, AnalysisMethod):
+        return method
+    key = str(method).strip().upper()
+    if key in AnalysisMethod.__members__:
+        return AnalysisMethod[key]
+    for m in AnalysisMethod:
+        if m.value == key:
+            return m
+    raise ValueError(f"Metodo di analisi non riconosciuto: {method}")
+
+
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if np.isfinite(value) else None
+
+
+def _dcr_from_capacity(demand: Any, capacity: Optional[float]) -> Optional[float]:
+    demand = _as_float(demand)
+    if demand is None or not capacity:
+        return None
+    return abs(demand) / capacity
+
+
+def summarize_results(method: Union[str, AnalysisMethod], results: Dict, loads: Dict) -> Dict:
+    """
+    Riga normalizzata della tabella di confronto per un singolo metodo.
+
+    capacity è la capacità a taglio in kN (POR, SAM, TELAIO) o il
+    moltiplicatore di collasso α0 (LIMIT); i metodi senza capacità
+    globale (FEM, FIBER, MICRO) restituiscono None.
+    """
+    method = resolve_method(method)
+    row = {'method': method.name, 'capacity': None, 'capacity_unit': None,
+           'governing_mode': None, 'DCR': None, 'verified': None}
+    if not isinstance(results, dict):
+        return row
+    if 'error' in results:
+        row['error'] = str(results['error'])
+        return row
+
+    V_demand = loads.get('horizontal')
+
+    if method == AnalysisMethod.POR:
+        capacity = results.get('global_capacity', {})
+        verif = results.get('verifications', {})
+        row['capacity'] = _as_float(capacity.get('total_Vu'))
+        row['capacity_unit'] = 'kN'
+        row['governing_mode'] = capacity.get('critical_mode') or verif.get('critical_aspect')
+        row['DCR'] = _as_float(verif.get('dcr', {}).get('max'))
+        if verif.get('verification') is not None:
+            row['verified'] = verif.get('verification') == 'VERIFICATO'
+
+    elif method == AnalysisMethod.SAM:
+        piers = results.get('pier_results', [])
+        shear = [_as_float(p.get('capacity', {}).get('shear')) for p in piers]
+        shear = [v for v in shear if v is not None]
+        row['capacity'] = float(sum(shear)) if shear else None
+        row['capacity_unit'] = 'kN'
+        summary = results.get('summary', {})
+        critical = summary.get('top_3_critical') or []
+        if critical:
+            row['governing_mode'] = f"{critical[0].get('component')}: {critical[0].get('failure_mode')}"
+        else:
+            row['governing_mode'] = summary.get('critical_component')
+        row['DCR'] = _as_float(results.get('global_DCR', summary.get('max_DCR_overall')))
+        row['verified'] = results.get('verified', summary.get('verification_passed'))
+
+    elif method == AnalysisMethod.FRAME:
+        pushover = results.get('summary', {}).get('pushover', {})
+        analysis = results.get('analyses', {}).get('pushover', {})
+        row['capacity'] = _as_float(pushover.get('max_base_shear'))
+        row['capacity_unit'] = 'kN'
+        hinges = analysis.get('hinges') or []
+        if hinges:
+            first = hinges[0]
+            row['governing_mode'] = f"{first.get('type')} (elemento {first.get('element')})"
+        row['DCR'] = _dcr_from_capacity(V_demand, row['capacity'])
+
+    elif method == AnalysisMethod.LIMIT:
+        row['capacity'] = _as_float(results.get('min_alpha'))
+        row['capacity_unit'] = 'alpha0'
+        row['governing_mode'] = results.get('governing_mechanism')
+        sf = _as_float(results.get('safety_factor'))
+        row['DCR'] = 1.0 / sf if sf else None
+        row['verified'] = results.get('verification')
+
+    else:
+        # FEM, FIBER, MICRO: nessuna capacità globale, solo esito ed eventuale DCR
+        row['DCR'] = _as_float(results.get('DCR', results.get('global_DCR')))
+        row['verified'] = results.get('verified')
+
+    if row['verified'] is None and row['DCR'] is not None:
+        row['verified'] = row['DCR'] <= 1.0
+    if row['verified'] is not None:
+        row['verified'] = bool(row['verified'])
+    return row
+
+
+def strip_results(results: Any) -> Any:
+    """Rimuove dal risultato gli oggetti modello (non serializzabili tra processi)"""
+    if not isinstance(results, dict):
+        return results
+    return {k: v for k, v in results.items() if k not in _HEAVY_KEYS}
+
+
+def _run_method(method_name: str, wall_data: Dict, material: MaterialProperties,
+                loads: Dict, options: Dict, keep_results: bool) -> Dict:
+    """Esegue un metodo (nel processo di lavoro) e restituisce la riga normalizzata"""
+    from .engine import MasonryFEMEngine
+
+    method = AnalysisMethod[method_name]
+    t0 = time.perf_counter()
+    try:
+        results = MasonryFEMEngine(method).analyze_structure(wall_data, material, loads, dict(options))
+        elapsed = time.perf_counter() - t0
+        row = summarize_results(method, results, loads)
+        row['status'] = 'error' if 'error' in row else 'ok'
+    except Exception as e:
+        elapsed = time.perf_counter() - t0
+        logger.error(f"Confronto metodi: {method_name} fallito: {e}")
+        results = None
+        row = summarize_results(method, {}, loads)
+        row['status'] = 'error'
+        row['error'] = f"{type(e).__name__}: {e}"
+    row['time_s'] = elapsed
+    if keep_results and results is not None:
+        row['results'] = strip_results(results)
+    return row
+
+
+def _terminate_pool(executor: ProcessPoolExecutor) -> None:
+    """Termina i processi ancora attivi (metodi oltre il timeout)"""
+    processes = list((getattr(executor, '_processes', None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def compare_methods(wall_data: Dict, material: MaterialProperties, loads: Dict,
+                    methods: Optional[Sequence[Union[str, AnalysisMethod]]] = None,
+                    options: Optional[Dict] = None,
+                    method_options: Optional[Dict[str, Dict]] = None,
+                    timeout: Union[float, Dict[str, float], None] = DEFAULT_TIMEOUT,
+                    n_workers: Optional[int] = None,
+                    parallel: bool = True,
+                    keep_results: bool = False) -> Dict:
+    """
+    Esegue i metodi selezionati sulla stessa parete e ne confronta gli esiti.
+
+    Args:
+        wall_data, material, loads: come MasonryFEMEngine.analyze_structure
+        methods: metodi da confrontare (enum, nome o valore); default POR, SAM, FRAME
+        options: opzioni comuni a tutti i metodi
+        method_options: opzioni specifiche per metodo ({'FRAME': {...}}), unite a options
+        timeout: secondi per metodo (numero, dict per nome metodo o None)
+        n_workers: processi del pool (default: min(n. metodi, CPU))
+        parallel: False per esecuzione sequenziale nel processo corrente
+        keep_results: include in ogni riga i risultati completi del metodo
+
+    Returns:
+        {'rows': [...], 'governing': metodo con DCR massimo, 'max_DCR',
+         'all_verified', 'wall_time'}; ogni riga contiene method, status
+        ('ok' | 'error' | 'timeout'), capacity, capacity_unit,
+        governing_mode, DCR, verified, time_s
+    """
+    selected = [resolve_method(m) for m in (methods or DEFAULT_METHODS)]
+    names = list(dict.fromkeys(m.name for m in selected))
+    if not names:
+        raise ValueError("Nessun metodo da confrontare")
+    options = dict(options or {})
+    method_options = {resolve_method(k).name: v for k, v in (method_options or {}).items()}
+
+    def _timeout(name: str) -> Optional[float]:
+        value = timeout.get(name, DEFAULT_TIMEOUT) if isinstance(timeout, dict) else timeout
+        if value is not None and value <= 0:
+            raise ValueError(f"Timeout non valido per {name}: {value}")
+        return value
+
+    def _options(name: str) -> Dict:
+        return {**options, **method_options.get(name, {})}
+
+    timeouts = {name: _timeout(name) for name in names}
+    rows: Dict[str, Dict] = {}
+    t_start = time.perf_counter()
+
+    if not parallel or len(names) == 1 and all(t is None for t in timeouts.values()):
+        for name in names:
+            rows[name] = _run_method(name, wall_data, material, loads, _options(name), keep_results)
+    else:
+        workers = n_workers or min(len(names), os.cpu_count() or 1)
+        executor = ProcessPoolExecutor(max_workers=max(1, workers))
+        expired = False
+        try:
+            submitted = time.perf_counter()
+            pending = {
+                executor.submit(_run_method, name, wall_data, material, loads,
+                                _options(name), keep_results): name
+                for name in names
+            }
+            deadlines = {name: submitted + t for name, t in timeouts.items() if t is not None}
+            while pending:
+                now = time.perf_counter()
+                waiting = [deadlines[n] - now for n in pending.values() if n in deadlines]
+                done, _ = wait(list(pending), timeout=max(0.0, min(waiting)) if waiting else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        rows[name] = future.result()
+                    except Exception as e:
+                        # Processo di lavoro terminato in modo anomalo
+                        row = summarize_results(name, {}, loads)
+                        row.update(status='error', error=f"{type(e).__name__}: {e}",
+                                   time_s=time.perf_counter() - submitted)
+                        rows[name] = row
+                now = time.perf_counter()
+                for future, name in list(pending.items()):
+                    if name in deadlines and now >= deadlines[name]:
+                        future.cancel()
+                        pending.pop(future)
+                        expired = True
+                        row = summarize_results(name, {}, loads)
+                        row.update(status='timeout', time_s=timeouts[name],
+                                   error=f"Timeout dopo {timeouts[name]:g} s")
+                        rows[name] = row
+                        logger.warning(f"Confronto metodi: {name} oltre il timeout di {timeouts[name]:g} s")
+        finally:
+            if expired:
+                _terminate_pool(executor)
+            else:
+                executor.shutdown(wait=True)
+
+    ordered = [rows[name] for name in names]
+    with_dcr = [r for r in ordered if r['status'] == 'ok' and r['DCR'] is not None]
+    governing = max(with_dcr, key=lambda r: r['DCR']) if with_dcr else None
+    verified = [r['verified'] for r in ordered if r['status'] == 'ok' and r['verified'] is not None]
+
+    return {
+        'rows': ordered,
+        'governing': governing['method'] if governing else None,
+        'max_DCR': governing['DCR'] if governing else None,
+        'all_verified': all(verified) if verified else None,
+        'wall_time': time.perf_counter() - t_start,
+    }
+
+
+def format_comparison(comparison: Dict) -> str:
+    """Tabella di testo del confronto (per log e report)"""
+    header = f"{'Metodo':<8} {'Capacità':>12} {'DCR':>7} {'Tempo [s]':>10}  {'Stato':<8} Modo governante"
+    lines = [header, '-' * len(header)]
+    for row in comparison['rows']:
+        capacity = '-' if row['capacity'] is None else f"{row['capacity']:.3g} {row['capacity_unit']}"
+        dcr = '-' if row['DCR'] is None else f"{row['DCR']:.3f}"
+        mode = row.get('error') if row['status'] != 'ok' else row['governing_mode']
+        lines.append(f"{row['method']:<8} {capacity:>12} {dcr:>7} {row['time_s']:>10.2f}  "
+                     f"{row['status']:<8} {mode or '-'}")
+    if comparison.get('governing'):
+        lines.append(f"Governante: {comparison['governing']} (DCR = {comparison['max_DCR']:.3f})")
+    return '\n'.join(lines)
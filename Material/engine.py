@@ -1,4 +1,4 @@
-# engine.py - VERSIONE 6.1 FINALE
+# engine.py - VERSIONE 6.3
 """
 MasonryFEMEngine v6.1
 Motore di calcolo FEM completo per muratura secondo NTC 2018
@@ -157,6 +157,10 @@ try:
 except ImportError:
     _FrameElement = None
 
+from .analyses.modal import ModalSolver, influence_vectors, participation
+from .analyses.model_cache import ModelCache
+from .analyses.result_cache import cached_analysis
+
 # Import utils
 from .utils import (
     sensitivity_analysis_limit,
@@ -222,6 +226,7 @@ if EquivalentFrame is None:
             self.constraints = {}
             self._static_solver_prepared = False
             self._K_eff_fact = None  # Per riuso solver in pushover
+            self.modal_solver = ModalSolver()  # sostituito da quello del motore
             
         def add_node(self, node_id: int, x: float, y: float):
             self.nodes[node_id] = {'x': x, 'y': y}
@@ -487,9 +492,7 @@ if EquivalentFrame is None:
             return reactions
         
         def solve_modal(self, n_modes: int = 6) -> Dict:
-            """Analisi modale con matrici ridotte ai DOF liberi"""
-            from scipy.sparse.linalg import eigsh
-            
+            """Analisi modale con matrici ridotte ai DOF liberi (shift-invert con cache)"""
             if self.K_global is None:
                 self.assemble_stiffness_matrix()
             if self.M_global is None:
@@ -525,47 +528,23 @@ if EquivalentFrame is None:
             Kff = self.K_global[free][:, free].tocsr()
             Mff = self.M_global[free][:, free].tocsr()
             
-            # Robustezza per sistemi piccoli
-            Nf = Kff.shape[0]
-            k_modes = min(int(n_modes), max(1, Nf - 1))
-            
-            # Vettori d'influenza
-            r_x = np.zeros(n); r_x[0::3] = 1.0
-            r_y = np.zeros(n); r_y[1::3] = 1.0
-            r_xf = r_x[free]
-            r_yf = r_y[free]
-            
             try:
-                evals, evecs_f = eigsh(Kff, k=k_modes, M=Mff, which='SM')
-                evals = np.clip(evals, 1e-20, None)
-                w = np.sqrt(evals)
+                modal = self.modal_solver.solve(Kff, Mff, n_modes)
+                w = np.clip(modal['omega'], 1e-10, None)
                 frequencies = (w / (2*np.pi)).astype(float)
                 periods = (1.0 / frequencies).astype(float)
+                evecs_f = modal['modes']
                 
                 # Ricostruzione dei modi in spazio globale
                 evecs = np.zeros((n, evecs_f.shape[1]))
                 evecs[free, :] = evecs_f
                 
-                # Masse totali
-                total_mass_x = float(r_xf @ (Mff @ r_xf))
-                total_mass_y = float(r_yf @ (Mff @ r_yf))
-                
-                mass_participation_x, mass_participation_y, modal_masses = [], [], []
-                
-                for i in range(evecs_f.shape[1]):
-                    phi_f = evecs_f[:, i]
-                    Mphi = Mff @ phi_f
-                    M_star = float(phi_f @ Mphi)
-                    modal_masses.append(M_star)
-                    
-                    Lx = float(phi_f @ (Mff @ r_xf))
-                    Ly = float(phi_f @ (Mff @ r_yf))
-                    
-                    mx = (Lx**2) / (M_star * total_mass_x) if (total_mass_x > 0 and M_star > 0) else 0.0
-                    my = (Ly**2) / (M_star * total_mass_y) if (total_mass_y > 0 and M_star > 0) else 0.0
-                    
-                    mass_participation_x.append(mx)
-                    mass_participation_y.append(my)
+                # Masse modali, masse totali e rapporti di massa X/Y (forma vettoriale)
+                part = participation(evecs_f, Mff, influence_vectors(n)[free])
+                total_mass_x, total_mass_y = (float(m) for m in part['total_masses'])
+                modal_masses = part['modal_masses'].tolist()
+                mass_participation_x = part['mass_ratios'][:, 0].tolist()
+                mass_participation_y = part['mass_ratios'][:, 1].tolist()
                 
                 return {
                     'frequencies': frequencies.tolist(),
@@ -852,6 +831,22 @@ else:
         
         FrameElementCtor = FrameElementMinimal
 
+class _LocalFrameBuilder:
+    """Telaio locale del motore per ModelCache (ricostruito a ogni modifica del modello)"""
+    
+    kind = 'frame_local'
+    
+    def __init__(self, engine: 'MasonryFEMEngine'):
+        self.engine = engine
+        
+    @staticmethod
+    def parts(wall_data: Dict, material: MaterialProperties, loads: Optional[Dict]) -> Dict:
+        # floor_masses determina anche il numero di piani: resta nella geometria
+        return {'geometry': wall_data, 'material': material, 'masses': None, 'loads': loads}
+    
+    def build(self, wall_data: Dict, material: MaterialProperties) -> EquivalentFrame:
+        return self.engine._build_frame_model(wall_data, material)
+
 # ============================================================================
 # CLASSE PRINCIPALE MasonryFEMEngine
 # ============================================================================
@@ -859,7 +854,7 @@ else:
 class MasonryFEMEngine:
     """Motore di calcolo FEM completo per muratura secondo NTC 2018"""
     
-    VERSION = "6.1-FINAL"
+    VERSION = "6.3"
     
     def __init__(self, method: AnalysisMethod = AnalysisMethod.FEM):
         """
@@ -885,6 +880,16 @@ class MasonryFEMEngine:
         
         # Modelli specializzati
         self.frame_model = None
+        # Servizio modale condiviso dai telai ricostruiti a ogni analisi
+        # (risultati riusati e riavvio dai modi precedenti negli studi parametrici)
+        self.modal_solver = ModalSolver()
+        # Telai in cache per contenuto: cambiando solo tipo di analisi o carichi
+        # K, M e fattorizzazioni sono riusate (use_model_cache=False per disattivare)
+        self.model_cache = ModelCache()
+        self.use_model_cache = True
+        # Cache risultati su disco di questo motore (None = quella di processo,
+        # disattivata di default)
+        self.result_cache = None
         self.limit_model = None
         self.fiber_model = None
         self.micro_model = None
@@ -912,13 +917,21 @@ class MasonryFEMEngine:
             options: Opzioni specifiche per metodo
             
         Returns:
-            Risultati dell'analisi
+            Risultati dell'analisi (dalla cache risultati, se attiva, per
+            input identici)
         """
         logger.info(f"=== ANALISI STRUTTURA - Metodo: {self.method.value} ===")
         
         if options is None:
             options = {}
             
+        return cached_analysis(self.method.name, self.VERSION,
+                               lambda: self._run_method(wall_data, material, loads, options),
+                               wall_data, material, loads, options, cache=self.result_cache)
+        
+    def _run_method(self, wall_data: Dict, material: MaterialProperties,
+                    loads: Dict, options: Dict) -> Dict:
+        """Esegue il metodo selezionato (analyze_structure senza cache)"""
         # Verifica disponibilità del metodo e chiama la funzione appropriata
         if self.method == AnalysisMethod.FEM:
             if _analyze_fem is not None:
@@ -943,7 +956,10 @@ class MasonryFEMEngine:
                 
         elif self.method == AnalysisMethod.FRAME:
             if _analyze_frame is not None:
-                return _analyze_frame(wall_data, material, loads, options)
+                frame_options = {**options, 'modal_solver': options.get('modal_solver', self.modal_solver)}
+                if self.use_model_cache:
+                    frame_options.setdefault('model_cache', self.model_cache)
+                return _analyze_frame(wall_data, material, loads, frame_options)
             else:
                 # Usa implementazione locale
                 return self._analyze_frame(wall_data, material, loads, options)
@@ -980,7 +996,13 @@ class MasonryFEMEngine:
         pattern = options.get('lateral_pattern', 'triangular')
         
         # Costruisci modello telaio
-        self.frame_model = self._build_frame_model(wall_data, material)
+        model_info = None
+        if self.use_model_cache:
+            self.frame_model, model_info = self.model_cache.get(
+                _LocalFrameBuilder(self), wall_data, material, loads)
+        else:
+            self.frame_model = self._build_frame_model(wall_data, material)
+        self.frame_model.modal_solver = self.modal_solver
         
         # Analisi richiesta
         analysis_type = options.get('analysis_type', 'pushover')
@@ -994,6 +1016,8 @@ class MasonryFEMEngine:
                 'n_spandrels': sum(1 for e in self.frame_model.elements if e.type == 'spandrel')
             }
         }
+        if model_info is not None:
+            results['model_cache'] = model_info
         
         if analysis_type == 'static':
             static_results = self.frame_model.solve_static(loads)
@@ -1044,13 +1068,30 @@ class MasonryFEMEngine:
             accel_units = options.get('accel_units', 'mps2')
             
             results['time_history'] = self._time_history_analysis(
-                self.frame_model, accelerogram, dt, excitation_dir, accel_units
+                self.frame_model, accelerogram, dt, excitation_dir, accel_units,
+                integrator=options.get('integrator', 'auto'),
+                n_modes=options.get('n_modes', 12),
+                output_dofs=options.get('output_dofs'),
+                output=options.get('output', 'lists'),
+                output_dtype=options.get('output_dtype', 'float64'),
+                output_every=options.get('output_every', 1),
+                output_path=options.get('output_path'),
+                nonlinear_options=options.get('nonlinear')
             )
             # Aggiorna displacements con step critico
             if results['time_history'].get('critical_step'):
-                crit_idx = results['time_history']['critical_step']['index']
-                if results['time_history'].get('displacements'):
-                    self.displacements = np.array(results['time_history']['displacements'][crit_idx])
+                self.displacements = np.array(results['time_history']['critical_step']['displacements'])
+                    
+        elif analysis_type == 'time_history_batch':
+            accelerograms = options.get('accelerograms')
+            if accelerograms is None or len(accelerograms) == 0:
+                raise ValueError("Accelerogrammi richiesti per analisi time-history batch")
+            results['time_history_batch'] = self._time_history_batch(
+                self.frame_model, accelerograms, options.get('dt', 0.01),
+                options.get('excitation_dir', 'y'), options.get('accel_units', 'mps2'),
+                integrator=options.get('integrator', 'auto'),
+                n_workers=options.get('n_workers')
+            )
             
         # Verifiche elementi (le forze sono già calcolate per ogni tipo di analisi)
         results['element_checks'] = self._check_frame_elements(self.frame_model, material)
@@ -1243,16 +1284,31 @@ class MasonryFEMEngine:
                                accelerogram: List[float],
                                dt: float,
                                excitation_dir: str = 'y',
-                               accel_units: str = 'mps2') -> Dict:
+                               accel_units: str = 'mps2',
+                               integrator: str = 'auto',
+                               n_modes: int = 12,
+                               output_dofs: Optional[Union[List[int], str]] = None,
+                               output: str = 'lists',
+                               output_dtype: str = 'float64',
+                               output_every: int = 1,
+                               output_path: Optional[str] = None,
+                               nonlinear_options: Optional[Dict] = None) -> Dict:
         """Analisi time-history (Newmark β=0.25, γ=0.5) con Rayleigh su DOF liberi
-        e calcolo forze interne allo step critico."""
-        beta = 0.25
-        gamma = 0.5
-        
-        # Direzione coerente per tutto (0=X, 1=Y)
-        dir_idx = 0 if excitation_dir.lower().startswith('x') else 1
+        e calcolo forze interne allo step critico.
+        
+        integrator: 'sparse' (K_eff sparsa fattorizzata una volta), 'dense'
+        (cho_factor, modelli piccoli), 'auto' (densa fino a DENSE_DOF_LIMIT DOF)
+        o 'modal' (sovrapposizione dei primi n_modes modi di solve_modal,
+        ricorrenza esatta di Nigam-Jennings, smorzamento di Rayleigh per modo)
+        o 'nonlinear' (Newton-Raphson a ogni passo, cerniere isteretiche a
+        flessione e taglio con le capacità della pushover, carichi verticali
+        prima del sisma; nonlinear_options: campi di NonlinearDynamicsOptions).
+        Storie restituite: output 'lists' (storico), 'arrays' (NumPy), 'peaks'
+        (solo massimi, nessuna storia) o 'memmap' (.npy in output_path), con
+        output_dofs (lista o 'storeys'), output_dtype e decimazione output_every.
+        """
+        from .analyses.dynamics import frame_time_history
 
-        n_steps = len(accelerogram) if accelerogram else 100
         if not accelerogram:
             logger.warning("Nessun accelerogramma fornito, uso sinusoide di test")
             # Sinusoide di test 1Hz, 0.1g per 10 secondi
@@ -1260,183 +1316,28 @@ class MasonryFEMEngine:
             n_steps = 1000
             t = np.arange(n_steps) * dt
             accelerogram = 0.1 * 9.80665 * np.sin(2 * np.pi * 1.0 * t)
-        n = len(frame.nodes) * 3
-
-        from scipy.sparse import eye as speye
-        K = frame.K_global.tocsr()
-        M = frame.M_global.tocsr() if frame.M_global is not None else (speye(n, format='csr') * 1000.0)
+            accel_units = 'mps2'
 
-        # ---- Riduzione ai DOF liberi (come nella modale)
-        fixed = []
-        for node_id, c in frame.constraints.items():
-            if c == 'fixed':
-                fixed.extend(frame.node_dofs[node_id])
-        fixed = sorted(set(fixed))
-        free = np.array([i for i in range(n) if i not in fixed], dtype=int)
+        return frame_time_history(frame, accelerogram, dt, excitation_dir, accel_units,
+                                  integrator=integrator, n_modes=n_modes,
+                                  output_dofs=output_dofs, output=output,
+                                  output_dtype=output_dtype, output_every=output_every,
+                                  output_path=output_path,
+                                  nonlinear_options=nonlinear_options)
 
-        if free.size == 0:
-            raise RuntimeError("Nessun DOF libero per l'analisi dinamica.")
-
-        Kff = K[free][:, free].tocsr()
-        Mff = M[free][:, free].tocsr()
-
-        # ---- Smorzamento di Rayleigh (ξ=5%) stimato sui primi due modi ridotti
-        try:
-            from scipy.sparse.linalg import eigsh
-            lam, _ = eigsh(Kff, k=min(2, max(1, Kff.shape[0]-1)), M=Mff, which='SM')
-            w = np.sqrt(np.clip(lam, 1e-12, None))
-            w1 = float(w[0])
-            w2 = float(w[1]) if len(w) > 1 else float(w[0]) * 1.5
-        except Exception:
-            w1, w2 = 2*np.pi*1.0, 2*np.pi*3.0  # fallback realistico per muratura
-
-        xi = 0.05
-        # Protezione contro divisione per zero
-        den = (w1 + w2) if (w1 + w2) > 1e-12 else 1e-12
-        alpha0 = 2*xi*w1*w2/den   # coeff. massa
-        alpha1 = 2*xi/den         # coeff. rigidezza
-        Cff = alpha0*Mff + alpha1*Kff
-
-        # ---- Conversione accelerogramma
-        if accel_units.lower() in ('g', 'grav'):
-            acc = np.asarray(accelerogram, dtype=float) * 9.80665
-        elif accel_units.lower() in ('gal',):
-            acc = np.asarray(accelerogram, dtype=float) * 0.01  # 1 Gal = 0.01 m/s^2
-        else:
-            acc = np.asarray(accelerogram, dtype=float)
-
-        # ---- Vettore di influenza ridotto (solo traslazioni)
-        r = np.zeros(n)
-        if dir_idx == 0:  # X
-            r[0::3] = 1.0
-        else:  # Y
-            r[1::3] = 1.0
-        rf = r[free]
-        Mrf = (Mff @ rf)
-
-        # ---- Stati (ridotti)
-        uf = np.zeros((n_steps, free.size))
-        vf = np.zeros((n_steps, free.size))
-        af = np.zeros((n_steps, free.size))
-
-        # ---- Integrazione Newmark sui DOF liberi (forma canonica)
-        # Coefficienti Newmark (β=0.25, γ=0.5)
-        a0 = 1.0/(beta*dt*dt)
-        a1 = gamma/(beta*dt)
-        a2 = 1.0/(beta*dt)
-        a3 = 1.0/(2.0*beta) - 1.0
-        a4 = gamma/beta - 1.0
-        a5 = dt*(gamma/(2.0*beta) - 1.0)
-        
-        K_eff = (Kff + a1*Cff + a0*Mff).toarray()
-        try:
-            from scipy.linalg import cho_factor, cho_solve
-            K_eff_fact = cho_factor(K_eff, overwrite_a=False, check_finite=False)
-            def solve_keff(rhs):
-                return cho_solve(K_eff_fact, rhs, check_finite=False)
-        except Exception:
-            def solve_keff(rhs):
-                return np.linalg.solve(K_eff, rhs)
-
-        # Stati iniziali
-        u_prev = uf[0].copy()
-        v_prev = vf[0].copy()
-        a_prev = af[0].copy()
-
-        for i in range(1, n_steps):
-            # Forza sismica al passo i
-            Fg = - (acc[i] if i < len(acc) else 0.0) * Mrf
-            
-            # Carico efficace Newmark (forma canonica)
-            P_eff = (Fg
-                     + Mff @ (a0*u_prev + a2*v_prev + a3*a_prev)
-                     + Cff @ (a1*u_prev + a4*v_prev + a5*a_prev))
-            
-            # Risoluzione
-            u_i = solve_keff(P_eff)
-            
-            # Aggiornamento accelerazione e velocità
-            a_i = a0*(u_i - u_prev) - a2*v_prev - a3*a_prev
-            v_i = v_prev + dt*((1.0 - gamma)*a_prev + gamma*a_i)
-            
-            # Salva stati
-            uf[i], vf[i], af[i] = u_i, v_i, a_i
-            u_prev, v_prev, a_prev = u_i, v_i, a_i
-
-        # ---- Ricostruzione a spazio completo (base = 0)
-        u = np.zeros((n_steps, n));  u[:, free] = uf
-        v = np.zeros((n_steps, n));  v[:, free] = vf
-        a = np.zeros((n_steps, n));  a[:, free] = af
-
-        # ---- Identificazione step critico e calcolo forze interne
-        # Nodo di copertura (sempre quello con Y max, ma DOF dipende da direzione)
-        node_ids = sorted(frame.nodes.keys())
-        y_coords = np.array([frame.nodes[i]['y'] for i in node_ids])
-        roof_node = node_ids[int(np.argmax(y_coords))]
-        roof_dof = frame.node_dofs[roof_node][dir_idx]  # DOF coerente con direzione
-        
-        # Step critico basato sullo spostamento nella direzione coerente
-        i_crit = int(np.argmax(np.abs(u[:, roof_dof])))
-
-        # Calcola forze interne allo step critico
-        u_crit = u[i_crit]
-        for elem in frame.elements:
-            dof_i = frame.node_dofs[elem.i_node]
-            dof_j = frame.node_dofs[elem.j_node]
-            u_elem = np.concatenate([u_crit[dof_i], u_crit[dof_j]])
-            elem.compute_internal_forces(u_elem)
-        
-        # Salva forze per output
-        element_forces_crit = [e.forces for e in frame.elements]
-        
-        # ---- Base shear allo step critico (dinamico: K_cf u_f + C_cf v_f + M_cf a_f)
-        fixed_arr = np.array(sorted(set(fixed)), dtype=int)
-        free_arr = np.array(free, dtype=int)
-        
-        Kcf = K[fixed_arr][:, free_arr]
-        Mcf = M[fixed_arr][:, free_arr]
-        # C globale via Rayleigh sugli stessi alpha0/alpha1
-        Ccf = alpha0*M[fixed_arr][:, free_arr] + alpha1*K[fixed_arr][:, free_arr]
-        
-        u_f_crit = u_crit[free_arr]
-        v_f_crit = v[i_crit, free_arr]
-        a_f_crit = a[i_crit, free_arr]
-        
-        R_c = (Kcf @ u_f_crit) + (Ccf @ v_f_crit) + (Mcf @ a_f_crit)  # F_c = 0
-        
-        # Somma delle reazioni nella direzione coerente (Rx se X, Ry se Y)
-        Vb_crit = 0.0
-        for node_id, constraint in frame.constraints.items():
-            if constraint == 'fixed':
-                dofs = frame.node_dofs[node_id]
-                # mapping da DOF globale a indice in 'fixed_arr'
-                idxs = np.where(fixed_arr == dofs[dir_idx])[0]
-                if idxs.size:
-                    Vb_crit += R_c[idxs[0]]
-        Vb_crit = abs(float(Vb_crit))
-
-        # ---- Metriche finali
-        height = frame._get_building_height()
-        # Drift massimo coerente con direzione (0::3 per X, 1::3 per Y)
-        max_drift = float(np.max(np.abs(u[:, dir_idx::3]))) / max(height, 1e-6)
-
-        return {
-            'time': (np.arange(n_steps)*dt).tolist(),
-            'displacements': u.tolist(),
-            'velocities': v.tolist(),
-            'accelerations': a.tolist(),
-            'max_drift': max_drift,
-            'max_acceleration': float(np.max(np.abs(a))),
-            'max_velocity': float(np.max(np.abs(v))),
-            'max_displacement': float(np.max(np.abs(u))),
-            'critical_step': {
-                'index': int(i_crit),
-                'time': float(i_crit * dt),
-                'roof_displacement': float(u_crit[roof_dof]),
-                'base_shear': float(Vb_crit),
-                'element_forces': element_forces_crit
-            }
-        }
+    def _time_history_batch(self, frame: EquivalentFrame,
+                            accelerograms,
+                            dt: float,
+                            excitation_dir: str = 'y',
+                            accel_units: str = 'mps2',
+                            integrator: str = 'auto',
+                            n_workers: Optional[int] = None) -> Dict:
+        """Insieme di accelerogrammi sullo stesso modello: Rayleigh e K_eff calcolati
+        una volta, record avanzati insieme (o ripartiti su n_workers processi).
+        Restituisce una tabella di picchi per record."""
+        from .analyses.dynamics import frame_time_history_batch
+        return frame_time_history_batch(frame, accelerograms, dt, excitation_dir, accel_units,
+                                        integrator=integrator, n_workers=n_workers)
         
     def _check_frame_elements(self, frame: EquivalentFrame, 
                              material: MaterialProperties) -> List[Dict]:
@@ -1111,6 +1111,122 @@ def generate_mesh_Q4(geometry: GeometryWall, nx: int, ny: int) -> Dict:
     
     return mesh
 
+def _q4_edge_keys(connectivity: np.ndarray, n_nodes: int) -> np.ndarray:
+    """Chiavi a*n+b (a<b) dei lati di ogni elemento Q4: array (n_elem, 4)"""
+    a = connectivity
+    b = np.roll(connectivity, -1, axis=1)
+    return np.minimum(a, b) * n_nodes + np.maximum(a, b)
+
+
+def find_hanging_nodes(connectivity: np.ndarray, edge_midpoints: Dict) -> Dict[int, Tuple[int, int]]:
+    """
+    Nodi sospesi: punti medi di lati che sono ancora lati interi di un elemento.
+    
+    Returns:
+        Dict nodo -> (a, b) estremi del lato su cui il nodo è vincolato
+    """
+    if not edge_midpoints:
+        return {}
+    n = int(max(connectivity.max(initial=0), max(max(e) for e in edge_midpoints), 
+                max(edge_midpoints.values()))) + 1
+    current = np.unique(_q4_edge_keys(connectivity, n))
+    edges = np.array(list(edge_midpoints.keys()), dtype=np.int64)
+    mids = np.array(list(edge_midpoints.values()), dtype=np.int64)
+    hanging = np.isin(edges[:, 0] * n + edges[:, 1], current)
+    return {int(m): (int(e[0]), int(e[1])) for m, e in zip(mids[hanging], edges[hanging])}
+
+
+def split_q4_elements(coords: np.ndarray, connectivity: np.ndarray, flagged,
+                      edge_midpoints: Optional[Dict] = None) -> Dict:
+    """
+    Suddivide gli elementi Q4 selezionati in 4 sotto-elementi (bisezione dei lati).
+    
+    Vale la regola 1-irregolare: un elemento con un nodo sospeso viene
+    raffinato solo insieme all'elemento più grande che lo vincola, quindi su
+    ogni lato c'è al più un nodo sospeso. I punti medi già creati sono
+    riusati tramite edge_midpoints (aggiornato sul posto).
+    
+    Args:
+        coords: Coordinate nodali (n_nodes, 2)
+        connectivity: Connettività antioraria (n_elem, 4)
+        flagged: Indici o maschera booleana degli elementi da raffinare
+        edge_midpoints: Dict (a, b) con a<b -> nodo medio, dai raffinamenti precedenti
+        
+    Returns:
+        Dict con 'coords', 'connectivity' (elementi non raffinati nell'ordine
+        originale, poi i figli), 'parent' (elemento di origine), 'refined'
+        (elementi effettivamente raffinati), 'hanging' (nodo -> lato),
+        'edge_midpoints', 'new_nodes' (nodo -> nodi genitori per interpolazione)
+    """
+    edge_midpoints = {} if edge_midpoints is None else edge_midpoints
+    coords = np.asarray(coords, dtype=float)
+    connectivity = np.asarray(connectivity, dtype=np.int64)
+    n_elem = len(connectivity)
+    
+    flags = np.zeros(n_elem, dtype=bool)
+    flags[np.asarray(flagged)] = True
+    
+    # Bilanciamento: propaga il raffinamento agli elementi che vincolano nodi sospesi
+    hanging = find_hanging_nodes(connectivity, edge_midpoints)
+    if hanging:
+        edge_owner: Dict[Tuple[int, int], List[int]] = {}
+        for e, conn in enumerate(connectivity.tolist()):
+            for k in range(4):
+                a, b = conn[k], conn[(k + 1) % 4]
+                edge_owner.setdefault((min(a, b), max(a, b)), []).append(e)
+        queue = list(np.flatnonzero(flags))
+        while queue:
+            e = queue.pop()
+            for node in connectivity[e].tolist():
+                for owner in edge_owner.get(hanging.get(node), ()):
+                    if not flags[owner]:
+                        flags[owner] = True
+                        queue.append(owner)
+    
+    refined = np.flatnonzero(flags)
+    new_coords: List[np.ndarray] = []
+    new_nodes: Dict[int, Tuple[int, ...]] = {}
+    next_id = len(coords)
+    
+    def node_at(parents: Tuple[int, ...]) -> int:
+        nonlocal next_id
+        nid = next_id
+        next_id += 1
+        new_coords.append(coords[list(parents)].mean(axis=0))  # genitori sempre nodi esistenti
+        new_nodes[nid] = parents
+        return nid
+    
+    def midpoint(a: int, b: int) -> int:
+        key = (min(a, b), max(a, b))
+        if key not in edge_midpoints:
+            edge_midpoints[key] = node_at(key)
+        return edge_midpoints[key]
+    
+    children = []
+    for e in refined:
+        n0, n1, n2, n3 = connectivity[e].tolist()
+        m01, m12, m23, m30 = midpoint(n0, n1), midpoint(n1, n2), midpoint(n2, n3), midpoint(n3, n0)
+        c = node_at((n0, n1, n2, n3))
+        children.extend([[n0, m01, c, m30], [m01, n1, m12, c],
+                         [c, m12, n2, m23], [m30, c, m23, n3]])
+    
+    if new_coords:
+        coords = np.vstack([coords, np.array(new_coords)])
+    keep = np.flatnonzero(~flags)
+    out_conn = np.vstack([connectivity[keep], np.array(children, dtype=np.int64).reshape(-1, 4)])
+    parent = np.concatenate([keep, np.repeat(refined, 4)])
+    
+    return {
+        'coords': coords,
+        'connectivity': out_conn,
+        'parent': parent,
+        'refined': refined,
+        'hanging': find_hanging_nodes(out_conn, edge_midpoints),
+        'edge_midpoints': edge_midpoints,
+        'new_nodes': new_nodes
+    }
+
+
 def refine_mesh_adaptive(mesh: Dict, error_estimate: Dict, target_elements: int) -> Dict:
     """
     Raffina mesh adattivamente basandosi su stima errore.
@@ -1121,7 +1237,7 @@ def refine_mesh_adaptive(mesh: Dict, error_estimate: Dict, target_elements: int)
         target_elements: Numero target elementi
         
     Returns:
-        Mesh raffinata
+        Mesh raffinata (con 'hanging_nodes' da vincolare: nodo -> [n_a, n_b])
     """
     refined_mesh = copy.deepcopy(mesh)
     
@@ -1133,42 +1249,52 @@ def refine_mesh_adaptive(mesh: Dict, error_estimate: Dict, target_elements: int)
     # Ordina per errore
     errors.sort(key=lambda x: x[1], reverse=True)
     
-    # Raffina top N% elementi
-    n_refine = min(len(errors) // 4, target_elements - len(mesh['elements']))
-    elements_to_refine = [e[0] for e in errors[:n_refine]]
+    # Raffina top N% elementi (ogni suddivisione aggiunge 3 elementi)
+    n_refine = min(len(errors) // 4, max(0, (target_elements - len(mesh['elements'])) // 3))
     
-    # Raffinamento (split Q4 in 4 Q4)
-    new_nodes = []
-    new_elements = []
+    # Solo Q4: indici di posizione nella lista elementi
+    position = {elem['id']: i for i, elem in enumerate(refined_mesh['elements'])}
+    elements_to_refine = [position[e[0]] for e in errors[:n_refine]
+                          if refined_mesh['elements'][position[e[0]]]['type'] == 'Q4']
+    if not elements_to_refine:
+        return refined_mesh
     
-    for elem_id in elements_to_refine:
-        elem = refined_mesh['elements'][elem_id]
-        if elem['type'] != 'Q4':
-            continue
-        
-        # Nodi elemento
-        n = elem['nodes']
-        coords = [[refined_mesh['nodes'][ni]['x'], 
-                  refined_mesh['nodes'][ni]['y']] for ni in n]
-        
-        # Crea nodo centrale
-        x_c = np.mean([c[0] for c in coords])
-        y_c = np.mean([c[1] for c in coords])
-        
-        new_node_id = len(refined_mesh['nodes']) + len(new_nodes)
-        new_nodes.append({
-            'id': new_node_id,
-            'x': x_c,
-            'y': y_c,
-            'z': 0.0
-        })
-        
-        # Crea 4 sotto-elementi
-        # ... (implementazione dettagliata omessa per brevità)
+    q4 = [i for i, elem in enumerate(refined_mesh['elements']) if elem['type'] == 'Q4']
+    q4_index = {i: k for k, i in enumerate(q4)}
+    row_of = {node['id']: i for i, node in enumerate(refined_mesh['nodes'])}
+    ids = [node['id'] for node in refined_mesh['nodes']]
+    coords = np.array([[node['x'], node['y']] for node in refined_mesh['nodes']])
+    conn = np.array([[row_of[n] for n in refined_mesh['elements'][i]['nodes']] for i in q4],
+                    dtype=np.int64).reshape(-1, 4)
+    
+    # Raffinamento (split Q4 in 4 Q4)
+    split = split_q4_elements(coords, conn, [q4_index[i] for i in elements_to_refine],
+                              refined_mesh.get('edge_midpoints_rows'))
     
     # Aggiungi nuovi nodi ed elementi
-    refined_mesh['nodes'].extend(new_nodes)
-    refined_mesh['elements'].extend(new_elements)
+    next_id = max(ids) + 1
+    for row in range(len(coords), len(split['coords'])):
+        ids.append(next_id)
+        refined_mesh['nodes'].append({'id': next_id, 'x': float(split['coords'][row, 0]),
+                                      'y': float(split['coords'][row, 1]), 'z': 0.0})
+        next_id += 1
+    
+    others = [elem for i, elem in enumerate(refined_mesh['elements']) if elem['type'] != 'Q4']
+    next_elem = max(elem['id'] for elem in refined_mesh['elements']) + 1
+    new_elements = []
+    for k, (nodes, parent) in enumerate(zip(split['connectivity'], split['parent'])):
+        source = refined_mesh['elements'][q4[parent]]
+        if k < len(conn) - len(split['refined']):
+            new_elements.append(source)
+        else:
+            child = dict(source)
+            child['id'] = next_elem
+            child['nodes'] = [ids[n] for n in nodes]
+            new_elements.append(child)
+            next_elem += 1
+    refined_mesh['elements'] = new_elements + others
+    refined_mesh['edge_midpoints_rows'] = split['edge_midpoints']
+    refined_mesh['hanging_nodes'] = {ids[h]: [ids[a], ids[b]] for h, (a, b) in split['hanging'].items()}
     
     return refined_mesh
 
@@ -1397,6 +1523,33 @@ def extract_bilinear_curve(pushover_curve: List[Dict]) -> Dict:
         'alpha': K_post / K_elastic if K_elastic > 0 else 0
     }
 
+def json_default(obj: Any):
+    """
+    Serializzazione JSON di array e scalari NumPy (campi tensionali FEM,
+    storie temporali, ecc.): i file .npy memory-mapped come riferimento al
+    file, array e scalari come valori, il resto come stringa.
+    """
+    if isinstance(obj, np.memmap) and obj.filename:
+        return {'npy': str(obj.filename), 'shape': list(obj.shape), 'dtype': str(obj.dtype)}
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+def _stress_field_summary(field: Dict) -> Dict:
+    """Valori estremi di un campo tensionale esportato come array"""
+    summary = {
+        'max_von_mises': float(np.max(field['von_mises'])),
+        'max_sigma_1': float(np.max(field['sigma_1'])),
+        'min_sigma_2': float(np.min(field['sigma_2']))
+    }
+    if 'nodal' in field:
+        summary['max_von_mises_nodal'] = float(np.max(field['nodal']['von_mises']))
+    return summary
+
+
 def generate_report(results: Dict, format: str = 'text') -> str:
     """
     Genera report risultati.
@@ -1409,7 +1562,7 @@ def generate_report(results: Dict, format: str = 'text') -> str:
         Report formattato
     """
     if format == 'json':
-        return json.dumps(results, indent=2, default=str)
+        return json.dumps(results, indent=2, default=json_default)
     
     elif format == 'html':
         html = ['<html><head><title>Report Analisi FEM</title></head><body>']
@@ -1431,6 +1584,14 @@ def generate_report(results: Dict, format: str = 'text') -> str:
                 html.append(f'<li>{level}: drift={data.get("top_drift", 0):.3f}</li>')
             html.append('</ul>')
         
+        # Campo tensionale FEM
+        if results.get('stress_field'):
+            html.append('<h2>Tensioni</h2>')
+            html.append('<table border="1">')
+            for key, value in _stress_field_summary(results['stress_field']).items():
+                html.append(f'<tr><td>{key}</td><td>{value:.4g}</td></tr>')
+            html.append('</table>')
+        
         html.append('</body></html>')
         return '\n'.join(html)
     
@@ -1468,6 +1629,14 @@ def generate_report(results: Dict, format: str = 'text') -> str:
                 lines.append(f"  Danno globale: {results['damage']['global'].get('damage_state', 'Unknown')}")
             lines.append("")
         
+        # Campo tensionale FEM
+        if results.get('stress_field'):
+            lines.append("TENSIONI:")
+            lines.append("-"*40)
+            for key, value in _stress_field_summary(results['stress_field']).items():
+                lines.append(f"  {key}: {value:.4g}")
+            lines.append("")
+        
         lines.append("="*70)
         
         return '\n'.join(lines)
@@ -1845,7 +2014,7 @@ def extract_scalar_output(output: Dict) -> float:
 def export_to_json(data: Any, filename: str):
     """Esporta dati in JSON."""
     with open(filename, 'w') as f:
-        json.dump(data, f, indent=2, default=str)
+        json.dump(data, f, indent=2, default=json_default)
 
 def import_from_json(filename: str) -> Dict:
     """Importa dati da JSON."""
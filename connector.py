@@ -56,6 +56,7 @@ class Muratura:
 
         # Crea directory progetto
         self.project_path.mkdir(parents=True, exist_ok=True)
+        self._cache_risultati()
 
         print(f"Muratura Connector v{self.VERSION}")
         print(f"Progetto: {project_name}")
@@ -102,6 +103,19 @@ class Muratura:
             except Exception as e:
                 self._modules[name] = {'status': str(e), 'items': {}}
 
+    def _cache_risultati(self):
+        """
+        Cache dei risultati del connettore nella cartella del progetto
+        (projects/<nome>/cache), attiva per le analisi lanciate da questa
+        istanza; la cache di processo (set_result_cache) non è modificata.
+        """
+        try:
+            from Material.analyses.result_cache import ResultCache
+        except ImportError:
+            self.result_cache = None
+            return
+        self.result_cache = ResultCache(self.project_path / "cache")
+
     # ========================================================================
     # INFORMAZIONI E HELP
     # ========================================================================
@@ -156,6 +170,8 @@ class Muratura:
 ║    m.modale(parete, n_modi)        - Analisi modale          ║
 ║    m.statica(parete, carichi)      - Analisi statica         ║
 ║    m.time_history(parete, acc, dt) - Time history            ║
+║    m.time_history_batch(parete, accs) - Set accelerogrammi   ║
+║    m.analisi_edificio()            - Tutte le pareti         ║
 ║                                                              ║
 ║  RISULTATI                                                   ║
 ║    m.risultati(analisi)            - Mostra risultati        ║
@@ -253,6 +269,18 @@ TIME HISTORY:
   m.time_history(parete, accelerogramma, dt=0.01)
   - accelerogramma: lista accelerazioni [m/s²]
   - dt: passo temporale [s]
+  - output='peaks': solo massimi; 'arrays' con output_dtype='float32',
+    output_dofs='storeys', output_every=10; 'memmap' con output_path
+
+TIME HISTORY (SET DI ACCELEROGRAMMI):
+  m.time_history_batch(parete, [acc1, acc2, ...], dt=0.01, n_processi=None)
+  - modello e fattorizzazione calcolati una volta per tutto il set
+  - n_processi: ripartisce i record su più processi
+
+EDIFICIO (TUTTE LE PARETI):
+  m.analisi_edificio(analisi=('pushover',), n_processi=None)
+  - pareti indipendenti in parallelo, pareti identiche analizzate una volta
+  - verifica consolidata per parete, piano e direzione
 
 ESEMPIO:
   m.parete('W1', 5.0, 6.0, 0.3, piani=2)
@@ -817,7 +845,9 @@ ESEMPIO:
         MasonryFEMEngine = self._modules['engine']['items'].get('MasonryFEMEngine')
         AnalysisMethod = self._modules['enums']['items'].get('AnalysisMethod')
 
-        return MasonryFEMEngine(method=AnalysisMethod.FRAME)
+        engine = MasonryFEMEngine(method=AnalysisMethod.FRAME)
+        engine.result_cache = getattr(self, 'result_cache', None)
+        return engine
 
     def pushover(self, nome_parete: str, pattern: str = 'triangular',
                  target_drift: float = 0.04, direzione: str = 'y') -> Dict:
@@ -1012,7 +1042,8 @@ ESEMPIO:
         return results
 
     def time_history(self, nome_parete: str, accelerogramma: List[float],
-                     dt: float = 0.01, direzione: str = 'y') -> Dict:
+                     dt: float = 0.01, direzione: str = 'y',
+                     output: str = 'lists', **opzioni) -> Dict:
         """
         Esegue analisi time-history.
 
@@ -1021,6 +1052,11 @@ ESEMPIO:
             accelerogramma: Lista accelerazioni [m/s²]
             dt: Passo temporale [s]
             direzione: 'x' o 'y'
+            output: 'lists' (liste), 'arrays' (NumPy), 'peaks' (solo massimi)
+                o 'memmap' (.npy su disco, richiede output_path)
+            **opzioni: output_dofs (lista o 'storeys'), output_dtype ('float32'),
+                output_every (decimazione), output_path, integrator ('nonlinear'
+                per cerniere isteretiche), n_modes, nonlinear (dict di opzioni)
 
         Returns:
             Dict con risultati
@@ -1051,7 +1087,9 @@ ESEMPIO:
             'analysis_type': 'time_history',
             'accelerogram': accelerogramma,
             'dt': dt,
-            'excitation_dir': direzione
+            'excitation_dir': direzione,
+            'output': output,
+            **opzioni
         }
 
         print(f"\nEsecuzione time-history su '{nome_parete}'...")
@@ -1068,14 +1106,179 @@ ESEMPIO:
         }
         self.risultati[analysis_name] = results
 
-        if 'time_history' in results:
-            th = results['time_history']
+        th = results.get('time_history') or results.get('analyses', {}).get('time_history')
+        if th:
             print(f"\nRisultati:")
             print(f"  Drift massimo: {th.get('max_drift', 0)*100:.2f}%")
             print(f"  Spostamento massimo: {th.get('max_displacement', 0)*1000:.2f} mm")
             if 'critical_step' in th:
                 cs = th['critical_step']
                 print(f"  Step critico: t={cs.get('time', 0):.2f}s, Vb={cs.get('base_shear', 0):.1f}kN")
+            if 'nonlinear' in th:
+                nl = th['nonlinear']
+                print(f"  Cerniere formate: {nl['n_hinges']} "
+                      f"({nl['n_yield_events']} plasticizzazioni)")
+                print(f"  Fattorizzazioni: {nl['stats']['factorizations']}, "
+                      f"iterazioni medie per passo: {nl['stats']['mean_iterations']:.2f}")
+
+        print(f"\nRisultati salvati come '{analysis_name}'")
+        return results
+
+    def time_history_batch(self, nome_parete: str, accelerogrammi: List[List[float]],
+                           dt: float = 0.01, direzione: str = 'y',
+                           n_processi: Optional[int] = None) -> Dict:
+        """
+        Esegue time-history su un set di accelerogrammi (es. 7 record NTC).
+
+        Il modello viene costruito e fattorizzato una sola volta; i record
+        avanzano insieme (o ripartiti su n_processi processi).
+
+        Args:
+            nome_parete: Nome della parete
+            accelerogrammi: Lista di accelerogrammi [m/s²] o array (n_record, n_passi)
+            dt: Passo temporale [s]
+            direzione: 'x' o 'y'
+            n_processi: Numero di processi (None = un solo processo)
+
+        Returns:
+            Dict con tabella dei picchi per record e valori medi
+        """
+        if nome_parete not in self.pareti:
+            print(f"Parete '{nome_parete}' non trovata")
+            return {}
+
+        parete = self.pareti[nome_parete]
+        if not parete['materiale']:
+            print("Errore: materiale non assegnato")
+            return {}
+
+        engine = self._get_engine()
+        if not engine:
+            return {}
+
+        materiale = self.materiali[parete['materiale']]
+
+        wall_data = {
+            'length': parete['length'],
+            'height': parete['height'],
+            'thickness': parete['thickness'],
+            'floor_masses': parete['floor_masses']
+        }
+
+        options = {
+            'analysis_type': 'time_history_batch',
+            'accelerograms': accelerogrammi,
+            'dt': dt,
+            'excitation_dir': direzione,
+            'n_workers': n_processi
+        }
+
+        print(f"\nEsecuzione time-history su '{nome_parete}' ({len(accelerogrammi)} accelerogrammi)...")
+
+        results = engine.analyze_structure(wall_data, materiale, {}, options)
+
+        # Salva risultati
+        analysis_name = f"{nome_parete}_th_batch"
+        self.analisi[analysis_name] = {
+            'type': 'time_history_batch',
+            'parete': nome_parete,
+            'options': {'dt': dt, 'direzione': direzione, 'n_record': len(accelerogrammi)}
+        }
+        self.risultati[analysis_name] = results
+
+        batch = results.get('time_history_batch') or results.get('analyses', {}).get('time_history_batch')
+        if batch:
+            print(f"\n  {'Record':>6} {'Drift max':>10} {'Vb max':>10} {'t critico':>10}")
+            for row in batch['records']:
+                print(f"  {row['record']+1:>6} {row['max_drift']*100:>9.3f}% "
+                      f"{row['max_base_shear']:>10.1f} {row['critical_step']['time']:>9.2f}s")
+            print(f"\n  Drift medio: {batch['mean_max_drift']*100:.3f}%")
+            print(f"  Taglio medio: {batch['mean_max_base_shear']:.1f}")
+
+        print(f"\nRisultati salvati come '{analysis_name}'")
+        return results
+
+    def analisi_edificio(self, analisi: tuple = ('pushover',),
+                         n_processi: Optional[int] = None,
+                         progresso: bool = True, **opzioni) -> Dict:
+        """
+        Analizza tutte le pareti del progetto e produce una verifica unica.
+
+        Le pareti sono analizzate in parallelo (un processo per modello);
+        pareti con stessa geometria, masse e materiale condividono modello
+        e risultati.
+
+        Args:
+            analisi: Analisi per parete ('pushover', 'modal')
+            n_processi: Numero di processi (None = CPU disponibili, 1 = seriale)
+            progresso: Stampa l'avanzamento
+            **opzioni: Opzioni per tipo di analisi, es. pushover={'target_drift': 0.02}
+
+        Returns:
+            Dict con verifica per parete, totali per piano e direzione, esito globale
+        """
+        from Material.building import analyze_building
+
+        muri = getattr(self, '_muri', {})
+        walls = {}
+        for nome, parete in self.pareti.items():
+            muro = muri.get(nome)
+            direction = None
+            if muro:
+                dx, dy = abs(muro['x2'] - muro['x1']), abs(muro['y2'] - muro['y1'])
+                direction = 'x' if dx >= dy else 'y'
+            walls[nome] = {
+                'wall_data': {
+                    'length': parete['length'],
+                    'height': parete['height'],
+                    'thickness': parete['thickness'],
+                    'floor_masses': parete['floor_masses']
+                },
+                'material': parete['materiale'],
+                'storey': muro['piano'] if muro else 0,
+                'direction': direction
+            }
+
+        if not walls:
+            print("Nessuna parete definita")
+            return {}
+
+        def _stampa(done, total, message):
+            print(f"  [{done}/{total}] {message}")
+
+        print(f"\nAnalisi edificio: {len(walls)} pareti, analisi {', '.join(analisi)}...")
+        results = analyze_building(walls, self.materiali, analyses=analisi, options=opzioni,
+                                   n_workers=n_processi,
+                                   progress=_stampa if progresso else None,
+                                   result_cache=getattr(self, 'result_cache', None))
+
+        # Salva risultati
+        analysis_name = "edificio"
+        self.analisi[analysis_name] = {
+            'type': 'building',
+            'analisi': list(analisi),
+            'options': opzioni
+        }
+        self.risultati[analysis_name] = results
+
+        print(f"\n  {'Parete':<10} {'Piano':>5} {'Dir':>4} {'Vmax [kN]':>10} {'DCR':>7} {'Esito':>8}")
+        for row in results['walls']:
+            V = f"{row['V_max']:.1f}" if row['V_max'] is not None else '-'
+            dcr = f"{row['DCR']:.3f}" if row['DCR'] is not None else '-'
+            esito = 'ERRORE' if row['errors'] else {True: 'OK', False: 'NON OK', None: 'n.d.'}[row['verified']]
+            print(f"  {row['wall']:<10} {row['storey']:>5} {row['direction'] or '-':>4} {V:>10} {dcr:>7} {esito:>8}")
+        for nome, motivo in results['skipped'].items():
+            print(f"  {nome:<10} escluso: {motivo}")
+
+        stats = results['stats']
+        print(f"\n  Modelli distinti: {stats['n_models']} su {stats['n_walls']} pareti, "
+              f"{stats['n_workers']} processi, {results['wall_time']:.1f} s")
+        esito = {True: 'VERIFICATO', False: 'NON VERIFICATO', None: 'NON DETERMINATO'}[results['verified']]
+        if results['skipped']:
+            esito += f" ({len(results['skipped'])} pareti escluse: {', '.join(results['skipped'])})"
+        print(f"  Edificio: {esito}")
+        if results['governing_wall']:
+            print(f"  Parete governante: {results['governing_wall']} (DCR = {results['max_DCR']:.3f})")
 
         print(f"\nRisultati salvati come '{analysis_name}'")
         return results
@@ -1170,6 +1373,7 @@ ESEMPIO:
             self.project_name = nome
             self.project_path = Path(__file__).parent / "projects" / nome
             self.project_path.mkdir(parents=True, exist_ok=True)
+            self._cache_risultati()
 
         # Prepara dati per salvataggio
         data = {
@@ -1228,6 +1432,7 @@ ESEMPIO:
         self.project_name = project.nome
         self.project_path = Path(__file__).parent / "projects" / project.nome
         self.project_path.mkdir(parents=True, exist_ok=True)
+        self._cache_risultati()
 
         # Crea materiali
         for nome, mat_def in project.materiali.items():
@@ -1472,6 +1677,7 @@ ESEMPIO:
 
             self.project_name = nome
             self.project_path = project_path
+            self._cache_risultati()
 
             print(f"Progetto '{nome}' caricato")
             self.lista()
@@ -1486,6 +1692,7 @@ ESEMPIO:
         self.project_name = nome
         self.project_path = Path(__file__).parent / "projects" / nome
         self.project_path.mkdir(parents=True, exist_ok=True)
+        self._cache_risultati()
 
     def import_edl(self, filepath: str, crea_materiale: bool = True) -> Dict:
         """
@@ -1511,6 +1718,7 @@ ESEMPIO:
         self.project_name = project.nome
         self.project_path = Path(__file__).parent / "projects" / project.nome
         self.project_path.mkdir(parents=True, exist_ok=True)
+        self._cache_risultati()
 
         # Crea materiale di default se richiesto
         if crea_materiale and project.materiali:
@@ -1576,6 +1784,7 @@ ESEMPIO:
         self.project_name = project.nome
         self.project_path = Path(__file__).parent / "projects" / project.nome
         self.project_path.mkdir(parents=True, exist_ok=True)
+        self._cache_risultati()
 
         # Crea materiale
         if crea_materiale:
@@ -1628,6 +1837,7 @@ ESEMPIO:
         self.project_name = project.nome
         self.project_path = Path(__file__).parent / "projects" / project.nome
         self.project_path.mkdir(parents=True, exist_ok=True)
+        self._cache_risultati()
 
         # Crea materiale di default
         if crea_materiale:
@@ -1879,9 +2089,11 @@ ESEMPIO:
         else:
             percorso = Path(percorso)
 
+        from Material.utils import json_default
+
         if formato == 'json':
             with open(percorso, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=2, ensure_ascii=False, default=str)
+                json.dump(results, f, indent=2, ensure_ascii=False, default=json_default)
 
         elif formato == 'csv':
             if 'curve' in results:
@@ -1894,7 +2106,7 @@ ESEMPIO:
             with open(percorso, 'w', encoding='utf-8') as f:
                 f.write(f"RISULTATI ANALISI: {nome_analisi}\n")
                 f.write("=" * 50 + "\n\n")
-                f.write(json.dumps(results, indent=2, ensure_ascii=False, default=str))
+                f.write(json.dumps(results, indent=2, ensure_ascii=False, default=json_default))
 
         print(f"Risultati esportati in: {percorso}")
         return str(percorso)